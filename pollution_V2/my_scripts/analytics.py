@@ -0,0 +1,616 @@
+import argparse
+import glob
+import json
+import math
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from data_combining import sensor_files
+from data_handling import OUTPUT_FOLDER
+from regions import DATA_DIR
+from tiers import fingerprint, read_appended
+
+ANALYTICS_DIR = os.path.join(DATA_DIR, "analytics")
+MANIFEST_NAME = "manifest.json"
+META_NAME = "meta.json"
+LAYOUT = 3  # one directory of appendable column files per sensor, named in its metadata
+WHO_DAILY_GUIDELINE = 15.0  # µg/m³, WHO 2021 24-hour guideline for PM2.5
+ROLLING_WINDOWS = (7, 30, 365)
+# US EPA PM2.5 categories as on the dashboard legend: (highest concentration, lowest AQI, highest AQI, name)
+AQI_BREAKPOINTS = (
+    (12.0, 0, 50, "good"),
+    (35.4, 51, 100, "moderate"),
+    (55.4, 101, 150, "unhealthy_for_sensitive_groups"),
+    (150.4, 151, 200, "unhealthy"),
+    (250.4, 201, 300, "very_unhealthy"),
+    (500.4, 301, 500, "hazardous"),
+)
+AQI_CATEGORIES = tuple(name for _, _, _, name in AQI_BREAKPOINTS)
+
+
+def aqi_category(values):
+    """Returns the position in AQI_CATEGORIES of every concentration; anything above 250.4 is hazardous."""
+    return np.searchsorted([high for high, _, _, _ in AQI_BREAKPOINTS[:-1]], values, side="left")
+
+
+def aqi(value):
+    """Returns the US EPA AQI of a daily PM2.5 concentration, capped at 500."""
+    value = math.floor(max(value, 0.0) * 10) / 10  # the EPA truncates to 0.1 µg/m³
+    low = 0.0
+    for high, aqi_low, aqi_high, _ in AQI_BREAKPOINTS:
+        if value <= high:
+            return round(aqi_low + (aqi_high - aqi_low) * (value - low) / (high - low))
+        low = high + 0.1
+    return 500
+
+
+def to_epoch_days(dates):
+    """Returns the local calendar day of ISO timestamps (``datetime_from_local``) as days since 1970-01-01."""
+    return np.array([str(date)[:10] for date in dates], dtype="datetime64[D]").astype(np.int64)
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with a bounded relative error (DDSketch).
+
+    A value lands in the bucket ``ceil(log(value) / log(gamma))``, so every
+    quantile is answered within ``accuracy`` of the true value. The number of
+    buckets is O(log(max / min)), whatever the number of values. Readings of
+    zero or below share one bucket, reported as 0.
+    """
+
+    def __init__(self, accuracy=0.01, bins=None, zeros=0):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.bins = {int(key): count for key, count in (bins or {}).items()}
+        self.zeros = zeros
+
+    @property
+    def count(self):
+        return self.zeros + sum(self.bins.values())
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        keys, counts = np.unique(np.ceil(np.log(positive) / math.log(self.gamma)).astype(np.int64),
+                                 return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.bins[key] = self.bins.get(key, 0) + count
+        return self
+
+    def remove(self, values):
+        """Takes back values added before, e.g. readings of a day that was revised."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        positive = values[values > 0]
+        self.zeros -= len(values) - len(positive)
+        keys, counts = np.unique(np.ceil(np.log(positive) / math.log(self.gamma)).astype(np.int64),
+                                 return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            remaining = self.bins.get(key, 0) - count
+            if remaining > 0:
+                self.bins[key] = remaining
+            else:
+                self.bins.pop(key, None)
+        return self
+
+    def merge(self, other):
+        self.zeros += other.zeros
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        return self
+
+    def quantile(self, q):
+        """Returns the ``q`` quantile (0 to 1), or None if the sketch is empty."""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self):
+        # Keys and counts as two lists: JSON objects would need every key converted to and from a string
+        return {"zeros": self.zeros, "keys": list(self.bins), "counts": list(self.bins.values())}
+
+    @classmethod
+    def from_dict(cls, data, accuracy=0.01):
+        sketch = cls(accuracy, zeros=data["zeros"])
+        sketch.bins = dict(zip(data["keys"], data["counts"]))
+        return sketch
+
+
+class Column:
+    """Array that grows and shrinks at its end without copying the rows before it.
+
+    Rows live in a buffer with spare capacity, which doubles when it runs out,
+    so appending costs O(new rows) amortized. ``save`` appends the rows added
+    since the column was loaded or last saved to its file. Rows that replace rows
+    already in the file, after a truncation, are never written over them: the
+    column moves to a new file, so readers of the old file keep consistent rows.
+    """
+
+    def __init__(self, dtype, shape=(), data=None, capacity=0):
+        self._length = 0 if data is None else len(data)
+        self._data = np.empty((max(capacity, self._length),) + tuple(shape), dtype=dtype)
+        if data is not None:
+            self._data[:self._length] = data
+        self._saved = 0  # leading rows that match the file
+        self._written = 0  # rows in the file
+        self.path = None
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def array(self):
+        return self._data[:self._length]
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=self._data.dtype)
+        needed = self._length + len(rows)
+        if needed > len(self._data):
+            grown = np.empty((max(needed, 2 * len(self._data)),) + self._data.shape[1:], dtype=self._data.dtype)
+            grown[:self._length] = self._data[:self._length]
+            self._data = grown
+        self._data[self._length:needed] = rows
+        self._length = needed
+
+    def truncate(self, length):
+        self._length = min(self._length, length)
+        self._saved = min(self._saved, length)
+
+    def save(self, new_path):
+        """Writes the unsaved rows to the column's file, or all rows to ``new_path`` if they would overwrite any."""
+        moved = self.path is None or (self._saved < self._written and self._saved < self._length)
+        if moved:
+            self.path, self._saved = new_path, 0
+        with open(self.path, "wb" if moved else "ab") as f:
+            f.write(self._data[self._saved:self._length].tobytes())
+        self._saved = self._written = self._length
+
+    @classmethod
+    def load(cls, path, length, dtype, shape=(), spare=0):
+        """Reads the first ``length`` rows of a column file, leaving room for ``spare`` more."""
+        column = cls(dtype, shape, capacity=length + spare)
+        with open(path, "rb") as f:
+            read = f.readinto(column._data[:length])
+            written = os.fstat(f.fileno()).st_size // column._data[:1].nbytes
+        if read != column._data[:length].nbytes:
+            raise ValueError(f"{path} holds less than {length} rows")
+        column._length = column._saved = length
+        column._written, column.path = written, path
+        return column
+
+
+def _extend_table(table, values, func):
+    """Extends a sparse table (a list of ``Column`` levels) over values appended since it was built.
+
+    Level k holds ``func`` over the 2**k values starting at each position, so
+    the minimum or maximum of any range is ``func`` of two overlapping entries.
+    Entries over the old values never change; only the new tail of each level is
+    computed, in O(new values x levels).
+    """
+    if not table:
+        table.append(Column(values.dtype))
+    table[0].extend(values[len(table[0]):])
+    k = 1
+    while (1 << k) <= len(values):
+        half, size = 1 << (k - 1), len(values) - (1 << k) + 1
+        if k == len(table):
+            table.append(Column(values.dtype))
+        previous, done = table[k - 1].array, len(table[k])
+        table[k].extend(func(previous[done:size], previous[done + half:size + half]))
+        k += 1
+
+
+def _truncate_table(table, length):
+    """Cuts a sparse table back to the first ``length`` values."""
+    del table[max(length.bit_length(), 1):]
+    for k, level in enumerate(table):
+        level.truncate(max(length - (1 << k) + 1, 0))
+
+
+def _range_query(table, first, last, func):
+    """Returns ``func`` over positions first..last (inclusive) of a sparse table in O(1)."""
+    k = (last - first + 1).bit_length() - 1
+    return func(table[k][first], table[k][last - (1 << k) + 1])
+
+
+def _column_property(name):
+    return property(lambda self: self._columns[name].array)
+
+
+def _table_property(name):
+    return property(lambda self: [level.array for level in self._tables[name]])
+
+
+# Per-day columns, and prefix columns with one more row: name -> (dtype, shape of a row)
+DAY_COLUMNS = {"days": (np.int64, ()), "values": (np.float64, ()), "streak": (np.int64, ())}
+PREFIX_COLUMNS = {"cum_sum": (np.float64, ()), "cum_sq": (np.float64, ()), "cum_exceed": (np.int64, ()),
+                  "cum_category": (np.int64, (len(AQI_CATEGORIES),))}
+TABLES = {"min_table": np.float64, "max_table": np.float64, "streak_table": np.int64}
+
+
+class SensorAnalytics:
+    """Daily PM2.5 statistics of one sensor, extended incrementally and queryable by date range.
+
+    Days (one reading per local calendar day, gaps allowed) are kept in order
+    with prefix sums of the values, their squares, the WHO exceedances and each
+    AQI category. Sparse tables answer range minima and maxima. Each day also
+    records the length of the exceedance streak ending on it, counted over
+    consecutive calendar days. Any date range therefore costs two binary
+    searches plus O(1) arithmetic. Quantiles come from one ``QuantileSketch``
+    per calendar month, so they cost O(months in the range) instead of a sort.
+    ``append`` only computes the new rows and ``truncate`` drops the last ones,
+    so a revised last day costs O(1) rows too.
+    """
+
+    days = _column_property("days")
+    values = _column_property("values")
+    streak = _column_property("streak")
+    cum_sum = _column_property("cum_sum")
+    cum_sq = _column_property("cum_sq")
+    cum_exceed = _column_property("cum_exceed")
+    cum_category = _column_property("cum_category")
+    min_table = _table_property("min_table")
+    max_table = _table_property("max_table")
+    streak_table = _table_property("streak_table")
+
+    def __init__(self, guideline=WHO_DAILY_GUIDELINE):
+        self.guideline = guideline
+        self._columns = {name: Column(dtype, shape) for name, (dtype, shape) in DAY_COLUMNS.items()}
+        for name, (dtype, shape) in PREFIX_COLUMNS.items():
+            self._columns[name] = Column(dtype, shape, data=np.zeros((1,) + shape, dtype=dtype))
+        self._tables = {name: [] for name in TABLES}
+        self.months = {}  # "YYYY-MM" -> QuantileSketch
+        self._generation = 0
+        self._files = {}  # column files of the last save or load
+
+    def __len__(self):
+        return len(self._columns["days"])
+
+    def append(self, days, values):
+        """Adds readings of days after the last one; returns the number added."""
+        days = np.asarray(days, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values)
+        days, values = days[keep], values[keep]
+        if not len(days):
+            return 0
+        if (np.diff(days) <= 0).any() or (len(self.days) and days[0] <= self.days[-1]):
+            raise ValueError("appended days must be new and in ascending order")
+
+        exceeds = values > self.guideline
+        categories = np.eye(len(AQI_CATEGORIES), dtype=np.int64)[aqi_category(values)]
+        columns = self._columns
+        columns["cum_sum"].extend(self.cum_sum[-1] + np.cumsum(values))
+        columns["cum_sq"].extend(self.cum_sq[-1] + np.cumsum(values ** 2))
+        columns["cum_exceed"].extend(self.cum_exceed[-1] + np.cumsum(exceeds))
+        columns["cum_category"].extend(self.cum_category[-1] + np.cumsum(categories, axis=0))
+
+        streak = np.empty(len(days), dtype=np.int64)
+        previous_day = self.days[-1] if len(self.days) else None
+        previous_streak = self.streak[-1] if len(self.streak) else 0
+        for i, (day, exceed) in enumerate(zip(days.tolist(), exceeds.tolist())):
+            previous_streak = (previous_streak + 1 if previous_day == day - 1 else 1) if exceed else 0
+            streak[i] = previous_streak
+            previous_day = day
+
+        columns["days"].extend(days)
+        columns["values"].extend(values)
+        columns["streak"].extend(streak)
+        _extend_table(self._tables["min_table"], self.values, np.minimum)
+        _extend_table(self._tables["max_table"], self.values, np.maximum)
+        _extend_table(self._tables["streak_table"], self.streak, np.maximum)
+
+        months = days.astype("datetime64[D]").astype("datetime64[M]").astype(str)
+        for month in np.unique(months):
+            self.months.setdefault(month, QuantileSketch()).add(values[months == month])
+        return len(days)
+
+    def truncate(self, first):
+        """Drops the rows from ``first`` on; returns their (days, values)."""
+        days, values = self.days[first:].copy(), self.values[first:].copy()
+        months = days.astype("datetime64[D]").astype("datetime64[M]").astype(str)
+        for month in np.unique(months):
+            sketch = self.months[month].remove(values[months == month])
+            if not sketch.count:
+                del self.months[month]
+        for name in DAY_COLUMNS:
+            self._columns[name].truncate(first)
+        for name in PREFIX_COLUMNS:
+            self._columns[name].truncate(first + 1)
+        for table in self._tables.values():
+            _truncate_table(table, first)
+        return days, values
+
+    def rows(self, start=None, end=None):
+        """Returns the (first, stop) rows of days ``start`` to ``end``, both included, by binary search."""
+        first = 0 if start is None else int(np.searchsorted(self.days, _day(start), side="left"))
+        stop = len(self.days) if end is None else int(np.searchsorted(self.days, _day(end), side="right"))
+        return first, max(first, stop)
+
+    def summary(self, start=None, end=None):
+        """Returns count, mean, std, min/max, quantiles, WHO exceedances, streaks and AQI categories of a range."""
+        first, stop = self.rows(start, end)
+        count = stop - first
+        if not count:
+            return None
+        total = self.cum_sum[stop] - self.cum_sum[first]
+        mean = total / count
+        variance = max((self.cum_sq[stop] - self.cum_sq[first] - count * mean ** 2) / max(count - 1, 1), 0.0)
+        exceedances = int(self.cum_exceed[stop] - self.cum_exceed[first])
+        sketch = self.sketch(first, stop)
+        return {
+            "first_day": _label(self.days[first]),
+            "last_day": _label(self.days[stop - 1]),
+            "count": count,
+            "mean": round(float(mean), 2),
+            "std": round(math.sqrt(variance), 2),
+            "min": round(float(_range_query(self.min_table, first, stop - 1, min)), 2),
+            "max": round(float(_range_query(self.max_table, first, stop - 1, max)), 2),
+            "q25": round(sketch.quantile(0.25), 2),
+            "median": round(sketch.quantile(0.5), 2),
+            "q75": round(sketch.quantile(0.75), 2),
+            "q95": round(sketch.quantile(0.95), 2),
+            "who_guideline": self.guideline,
+            "exceedance_days": exceedances,
+            "exceedance_share": round(exceedances / count, 4),
+            "longest_exceedance_streak": self.longest_streak(first, stop),
+            "aqi_categories": dict(zip(AQI_CATEGORIES, (self.cum_category[stop] - self.cum_category[first]).tolist())),
+        }
+
+    def sketch(self, first, stop):
+        """Returns a quantile sketch of rows first..stop-1, merged from whole months plus the partial edge months."""
+        sketch = QuantileSketch()
+        if first >= stop:
+            return sketch
+        months = self.days[[first, stop - 1]].astype("datetime64[D]").astype("datetime64[M]")
+        for month in np.arange(months[0], months[1] + 1):
+            month_first, month_stop = self.rows(month.astype("datetime64[D]"),
+                                                (month + 1).astype("datetime64[D]") - 1)
+            if first <= month_first and month_stop <= stop:
+                if str(month) in self.months:
+                    sketch.merge(self.months[str(month)])
+            else:
+                sketch.add(self.values[max(first, month_first):min(stop, month_stop)])
+        return sketch
+
+    def longest_streak(self, first, stop):
+        """Returns the longest run of consecutive exceedance days within rows first..stop-1.
+
+        A run that started before the range only counts its days inside it. Such
+        a run covers a prefix of the range, found by binary search. Every later
+        run lies entirely inside, so the sparse table of streak lengths gives its
+        maximum in O(1).
+        """
+        if first >= stop:
+            return 0
+        start_day = self.days[first]
+        run_starts = self.days[first:stop] - self.streak[first:stop] + 1  # non-decreasing
+        carried = int(np.searchsorted(np.where(self.streak[first:stop] > 0, run_starts, self.days[first:stop] + 1),
+                                      start_day, side="left"))
+        longest = int(self.days[first + carried - 1] - start_day + 1) if carried else 0
+        if first + carried < stop:
+            longest = max(longest, int(_range_query(self.streak_table, first + carried, stop - 1, max)))
+        return longest
+
+    def current_streak(self):
+        """Returns the exceedance streak ending on the last day."""
+        return int(self.streak[-1]) if len(self.streak) else 0
+
+    def rolling_mean(self, window, end=None):
+        """Returns the mean over the ``window`` calendar days ending on ``end`` (default: the last day)."""
+        if end is None and not len(self.days):
+            return None
+        end_day = self.days[-1] if end is None else _day(end)
+        first, stop = self.rows(end_day - window + 1, end_day)
+        if first == stop:
+            return None
+        return round(float((self.cum_sum[stop] - self.cum_sum[first]) / (stop - first)), 2)
+
+    def rolling_series(self, window):
+        """Returns the trailing ``window``-day mean at every day, in O(days)."""
+        first = np.searchsorted(self.days, self.days - window + 1, side="left")
+        rows = np.arange(1, len(self.days) + 1)
+        return ((self.cum_sum[rows] - self.cum_sum[first]) / (rows - first)).round(2)
+
+    def labels(self, first=0, stop=None):
+        return np.datetime_as_string(self.days[first:stop].astype("datetime64[D]")).tolist()
+
+    def save(self, path):
+        """Writes the changed rows of every column next to ``path``, then the metadata to ``path`` atomically.
+
+        Appended rows go to the end of the column files and revised rows to new
+        files of the next generation; the metadata names the file of each column.
+        Readers go by the metadata, so they never see rows of a save in progress.
+        Files named by neither the new nor the previous metadata are removed.
+        """
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        generation = self._generation + 1
+        files = {}
+        for name, column in self._named_columns():
+            column.save(os.path.join(directory, f"{name}.{generation}.bin"))
+            files[name] = os.path.basename(column.path)
+        meta = {"guideline": self.guideline, "days": len(self), "generation": generation, "files": files,
+                "months": {month: sketch.to_dict() for month, sketch in self.months.items()}}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(meta))  # the C encoder; json.dump encodes in Python
+        os.replace(tmp_path, path)
+
+        # A reader may still be loading the previous generation
+        keep = set(files.values()) | set(self._files.values())
+        for name in os.listdir(directory):
+            if name.endswith(".bin") and name not in keep:
+                os.remove(os.path.join(directory, name))
+        self._generation, self._files = generation, files
+
+    def _named_columns(self):
+        yield from self._columns.items()
+        for name, table in self._tables.items():
+            for k, level in enumerate(table):
+                yield f"{name}_{k}", level
+
+    @classmethod
+    def load(cls, path, spare=0):
+        """Reads a sensor saved at ``path``, with room for ``spare`` more days without copying."""
+        with open(path) as f:
+            meta = json.load(f)
+        directory, length, files = os.path.dirname(path), meta["days"], meta["files"]
+        analytics = cls(meta["guideline"])
+        for name, (dtype, shape) in DAY_COLUMNS.items():
+            analytics._columns[name] = Column.load(os.path.join(directory, files[name]), length, dtype, shape, spare)
+        for name, (dtype, shape) in PREFIX_COLUMNS.items():
+            analytics._columns[name] = Column.load(os.path.join(directory, files[name]), length + 1, dtype, shape,
+                                                   spare)
+        for name, dtype in TABLES.items():
+            analytics._tables[name] = [
+                Column.load(os.path.join(directory, files[f"{name}_{k}"]), length - (1 << k) + 1, dtype, spare=spare)
+                for k in range(length.bit_length())]
+        analytics.months = {month: QuantileSketch.from_dict(sketch) for month, sketch in meta["months"].items()}
+        analytics._generation, analytics._files = meta["generation"], files
+        return analytics
+
+
+def _day(value):
+    """Returns a date, date string, datetime64 or epoch day as days since 1970-01-01."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, np.datetime64):
+        return int(value.astype("datetime64[D]").astype(np.int64))
+    return int(np.datetime64(str(value)[:10], "D").astype(np.int64))
+
+
+def _label(day):
+    return str(np.datetime64(int(day), "D"))
+
+
+class AnalyticsStore:
+    """Per-sensor ``SensorAnalytics`` kept up to date with the daily sensor files.
+
+    Like the aggregate tiers, the manifest records how many bytes of each file
+    were ingested, plus a fingerprint of them, so ``update`` parses only
+    appended lines and extends each sensor in place. Appended rows that revise
+    days already ingested (OpenAQ updates the running mean of the current day)
+    replace those days at the end; only a rewritten file rebuilds the sensor.
+    """
+
+    def __init__(self, root=ANALYTICS_DIR, guideline=WHO_DAILY_GUIDELINE):
+        self.root = root
+        self.guideline = guideline
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def path(self, sensor_id):
+        """Returns the metadata file of a sensor; its column files are in the same directory."""
+        return os.path.join(self.root, f"sensor_{sensor_id}", META_NAME)
+
+    def manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def has_sensor(self, sensor_id):
+        return os.path.exists(self.path(sensor_id))
+
+    def load(self, sensor_id):
+        return SensorAnalytics.load(self.path(sensor_id))
+
+    def remove(self, sensor_id):
+        shutil.rmtree(os.path.dirname(self.path(sensor_id)), ignore_errors=True)
+
+    def update(self, folder=OUTPUT_FOLDER, rebuild=False):
+        """Ingests readings appended to the daily sensor files; returns the number of new days."""
+        manifest = None if rebuild else self.manifest()
+        if manifest is not None and (manifest.get("who_guideline") != self.guideline
+                                     or manifest.get("layout") != LAYOUT):
+            manifest = None  # exceedances depend on the guideline, and old files on the layout: start over
+        ingested = dict(manifest["files"]) if manifest else {}
+        os.makedirs(self.root, exist_ok=True)
+        if manifest is None:
+            for path in glob.glob(os.path.join(self.root, "sensor_*.npz")):
+                os.remove(path)  # written by the single-file layout
+
+        files = {str(sensor_id): file_path for sensor_id, file_path in sensor_files(folder)}
+        for sensor_id in set(ingested) - set(files):
+            del ingested[sensor_id]
+            self.remove(sensor_id)
+
+        added = 0
+        for sensor_id, file_path in files.items():
+            entry = ingested.get(sensor_id)
+            size = os.path.getsize(file_path)
+            if entry is not None and entry["offset"] == size and self.has_sensor(sensor_id):
+                continue
+            appendable = (entry is not None and entry["offset"] <= size and self.has_sensor(sensor_id)
+                          and fingerprint(file_path, entry["offset"]) == entry["fingerprint"])
+            df, size = read_appended(file_path, entry["offset"] if appendable else 0)
+            days, values = self._daily(df)
+            if appendable:
+                analytics = SensorAnalytics.load(self.path(sensor_id), spare=len(days))
+            else:
+                self.remove(sensor_id)
+                analytics = SensorAnalytics(self.guideline)
+            before = len(analytics)
+            if len(days) and before and days[0] <= analytics.days[-1]:
+                # Appended rows revise ingested days, usually the last one: drop those rows and append them again
+                first = int(np.searchsorted(analytics.days, days[0]))
+                old_days, old_values = analytics.truncate(first)
+                kept = pd.Series(old_values, index=old_days)
+                revised = pd.Series(values, index=days)
+                merged = pd.concat([kept[~kept.index.isin(revised.index)], revised]).sort_index()
+                days, values = merged.index.to_numpy(dtype=np.int64), merged.to_numpy()
+            analytics.append(days, values)
+            added += len(analytics) - min(before, len(analytics))
+            analytics.save(self.path(sensor_id))
+            ingested[sensor_id] = {"offset": size, "fingerprint": fingerprint(file_path, size),
+                                   "days": len(analytics)}
+
+        # Written last: readers see the new sensor files together with the new version
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"layout": LAYOUT, "who_guideline": self.guideline, "files": ingested}, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        return added
+
+    @staticmethod
+    def _daily(df):
+        """Returns (epoch days, values) with one reading per day, the last one of a repeated day."""
+        values = pd.to_numeric(df["value"], errors="coerce").to_numpy(dtype=np.float64)
+        days = to_epoch_days(df["datetime_from_local"])
+        daily = pd.Series(values, index=days).dropna()
+        daily = daily[~daily.index.duplicated(keep="last")].sort_index()
+        return daily.index.to_numpy(dtype=np.int64), daily.to_numpy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the per-sensor rolling, AQI and exceedance statistics.")
+    parser.add_argument("--folder", default=OUTPUT_FOLDER, help="daily sensor files")
+    parser.add_argument("--output", default=ANALYTICS_DIR)
+    parser.add_argument("--guideline", type=float, default=WHO_DAILY_GUIDELINE,
+                        help="daily PM2.5 limit counted as an exceedance, in µg/m³")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every sensor from scratch")
+    args = parser.parse_args()
+
+    store = AnalyticsStore(args.output, args.guideline)
+    added = store.update(args.folder, rebuild=args.rebuild)
+    print(f"Ingested {added} new days for {len(store.manifest()['files'])} sensors into {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+import storage
+from forecasting import GROUPINGS, HORIZON, MODELS, TrainingEngine, group_columns, load_data
+from imputation import STRATEGIES, make_imputer
+
+MIN_TRAIN_DAYS = 60
+
+
+def make_configs(models, groupings, params=None):
+    """Returns the configurations to compare.
+
+    Groupings only apply to the pooled models; the others fit every sensor on its
+    own anyway and are vectorized across sensors, so they run as one block.
+    """
+    configs = []
+    for name in models:
+        for grouping in (groupings if MODELS[name].pooled else [None]):
+            configs.append({"name": f"{name}/{grouping}" if grouping else name, "model": name,
+                            "grouping": grouping or "global", "params": (params or {}).get(name, {})})
+    return configs
+
+
+def origins(n_rows, horizon, n_origins, step):
+    """Returns the training cut-offs of a rolling-origin backtest, oldest first.
+
+    The last origin leaves exactly ``horizon`` days to forecast; every earlier
+    one is ``step`` days before the next.
+    """
+    cutoffs = [n_rows - horizon - i * step for i in reversed(range(n_origins))]
+    if cutoffs[0] < MIN_TRAIN_DAYS:
+        raise ValueError(f"{n_origins} origins {step} days apart leave less than {MIN_TRAIN_DAYS} days of training "
+                         f"data; use fewer origins or a smaller step")
+    return cutoffs
+
+
+def training_sets(values, cutoffs, imputer=None):
+    """Returns the training rows of every cut-off.
+
+    With an ``imputer``, ``values`` holds the raw readings and the rows before
+    each cut-off are imputed on their own, so no reading after the cut-off
+    leaks into the training data through the imputation.
+    """
+    if imputer is None:
+        values = np.asarray(values, dtype=np.float64)
+        return [values[:cutoff] for cutoff in cutoffs]
+    frame = values if isinstance(values, pd.DataFrame) else pd.DataFrame(values)
+    return [imputer.fit_transform(frame.iloc[:cutoff]).round(1).to_numpy(dtype=np.float64) for cutoff in cutoffs]
+
+
+def backtest(values, configs, actual=None, horizon=HORIZON, n_origins=4, step=HORIZON, n_clusters=8, workers=None,
+             imputer=None):
+    """Scores every configuration on forecasts from several training cut-offs.
+
+    Each configuration is trained on the rows before each cut-off and forecasts
+    the next ``horizon`` rows. ``values`` is either an imputed matrix or, with
+    an ``imputer``, the raw readings, imputed again for each cut-off (see
+    ``training_sets``). Errors are measured against ``actual`` (by default
+    ``values``), skipping its NaN cells, so imputed values can be left out of
+    the score. All fits of all configurations and origins run in one process
+    pool. Returns one result per configuration, best RMSE first.
+    """
+    cutoffs = origins(len(values), horizon, n_origins, step)
+    training = training_sets(values, cutoffs, imputer)
+    values = np.asarray(values, dtype=np.float64)
+    actual = values if actual is None else np.asarray(actual, dtype=np.float64)
+
+    tasks, slots = [], []
+    for c, config in enumerate(configs):
+        for o, train in enumerate(training):
+            for group in group_columns(train, config["grouping"], n_clusters):
+                tasks.append((config["model"], config["params"], train[:, group], horizon))
+                slots.append((c, o, group))
+
+    started = time.perf_counter()
+    results = TrainingEngine(workers).run(tasks)
+    wall_seconds = time.perf_counter() - started
+
+    predictions = np.empty((len(configs), len(cutoffs), horizon, values.shape[1]))
+    fit_seconds = np.zeros(len(configs))
+    predict_seconds = np.zeros(len(configs))
+    fits = np.zeros(len(configs), dtype=int)
+    for (c, o, group), (block, fit_time, predict_time) in zip(slots, results):
+        predictions[c, o][:, group] = block
+        fit_seconds[c] += fit_time
+        predict_seconds[c] += predict_time
+        fits[c] += 1
+
+    targets = np.stack([actual[cutoff:cutoff + horizon] for cutoff in cutoffs])
+    observed = ~np.isnan(targets)
+    report = []
+    for c, config in enumerate(configs):
+        errors = np.where(observed, predictions[c] - targets, np.nan)
+        by_day = np.sqrt(np.nanmean(errors ** 2, axis=(0, 2)))
+        report.append({"name": config["name"], "model": config["model"], "grouping": config["grouping"],
+                       "params": config["params"], "models_fitted": int(fits[c]),
+                       "rmse": float(np.sqrt(np.nanmean(errors ** 2))), "mae": float(np.nanmean(np.abs(errors))),
+                       "rmse_by_day": [round(float(value), 3) for value in by_day],
+                       "fit_cpu_seconds": round(float(fit_seconds[c]), 4),
+                       "predict_cpu_seconds": round(float(predict_seconds[c]), 4)})
+
+    reference = next((r["rmse"] for r in report if r["model"] == "snaive"), None)
+    for result in report:
+        result["skill"] = None if reference is None else round(1 - result["rmse"] / reference, 4)
+        # Worth considering only if no other configuration is both more accurate and cheaper
+        result["pareto"] = not any(other["rmse"] < result["rmse"]
+                                   and other["fit_cpu_seconds"] <= result["fit_cpu_seconds"] for other in report)
+    report.sort(key=lambda r: r["rmse"])
+    return {"origins": len(cutoffs), "horizon": horizon, "step": step, "evaluated_cells": int(observed.sum()),
+            "wall_seconds": round(wall_seconds, 3), "results": report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the forecasting models: RMSE/MAE "
+                                                 "against training CPU time for each configuration.")
+    parser.add_argument("--models", nargs="+", choices=sorted(MODELS), default=["snaive", "ses", "ridge", "lstm"])
+    parser.add_argument("--groupings", nargs="+", choices=GROUPINGS, default=list(GROUPINGS),
+                        help="groupings of the pooled models (ridge, lstm)")
+    parser.add_argument("--origins", type=int, default=4, help="training cut-offs")
+    parser.add_argument("--step", type=int, default=HORIZON, help="days between cut-offs")
+    parser.add_argument("--horizon", type=int, default=HORIZON, help="days forecast from each cut-off")
+    parser.add_argument("--clusters", type=int, default=8, help="number of clusters of the cluster grouping")
+    parser.add_argument("--epochs", type=int, default=50, help="epochs of the lstm model")
+    parser.add_argument("--lags", type=int, default=14, help="lagged days of the ridge model")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="training processes")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="knn",
+                        help="imputation of the training rows before each cut-off, as in data_analysis.py")
+    parser.add_argument("--imputed", action="store_true",
+                        help="also score against imputed values, not only against actual readings")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    df = load_data()
+    # The imputed matrix was filled using every day, so training rows are imputed again from the raw readings
+    raw = storage.read_frame(storage.find_dataset("aligned_raw")).reindex(index=df.index, columns=df.columns)
+    actual = df.to_numpy(dtype=np.float64) if args.imputed else None
+    configs = make_configs(args.models, args.groupings,
+                           {"lstm": {"epochs": args.epochs}, "ridge": {"lags": args.lags}})
+    print(f"Backtesting {len(configs)} configurations on {df.shape[0]} days x {df.shape[1]} sensors, "
+          f"{args.origins} origins, {args.horizon}-day horizon, {args.workers} workers...")
+    report = backtest(raw, configs, actual, args.horizon, args.origins, args.step, args.clusters, args.workers,
+                      imputer=make_imputer(args.strategy))
+
+    print(f"\n{'configuration':<16} {'models':>6} {'RMSE':>8} {'MAE':>8} {'skill':>7} {'fit CPU s':>9}  pareto")
+    for r in report["results"]:
+        skill = "-" if r["skill"] is None else f"{r['skill']:.1%}"
+        print(f"{r['name']:<16} {r['models_fitted']:6d} {r['rmse']:8.2f} {r['mae']:8.2f} {skill:>7} "
+              f"{r['fit_cpu_seconds']:9.2f}  {'*' if r['pareto'] else ''}")
+    print(f"\n{report['evaluated_cells']} readings scored in {report['wall_seconds']:.1f} s wall time. "
+          f"Skill is the RMSE reduction over snaive; * marks configurations no other beats on both RMSE and time.")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
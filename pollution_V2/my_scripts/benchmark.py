@@ -0,0 +1,178 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import synthetic_data
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+GROUPS = ("combine", "impute", "model", "loader", "dashboard", "pages")
+NOISE_FLOOR_SECONDS = 0.005
+
+
+def measure(func, repeat):
+    """Returns timings of ``repeat`` runs and the peak traced memory of one more, untimed run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": statistics.median(times), "min_seconds": min(times), "runs": repeat,
+            "peak_mb": round(peak / 1024 ** 2, 3)}
+
+
+def benchmarks(groups, epochs):
+    """Yields (name, function) pairs; run with the synthetic data at ../data."""
+    import numpy as np
+    import storage
+
+    if "combine" in groups:
+        import data_combining
+        yield "data_combining.combine", lambda: data_combining.combine()
+
+    raw = storage.read_frame(storage.find_dataset("aligned_raw"))
+    if "impute" in groups:
+        from imputation import make_imputer
+        yield "imputation.knn", lambda: make_imputer("knn").fit_transform(raw)
+
+    if "model" in groups:
+        import model
+        df = model.load_data()
+        _, scaled = model.fit_scaler(df)
+        yield "model.create_sequences", lambda: model.create_sequences(scaled, model.SEQ_LENGTH)
+        yield "model.create_sequences+copy", lambda: np.ascontiguousarray(
+            model.create_sequences(scaled, model.SEQ_LENGTH)[0])
+
+        def train():
+            X, y = model.create_sequences(scaled, model.SEQ_LENGTH)
+            model.build_model(model.SEQ_LENGTH, df.shape[1]).fit(
+                X, y, epochs=epochs, batch_size=model.BATCH_SIZE, verbose=0)
+
+        yield f"model.train_{epochs}_epochs", train
+
+    from home import AirQualityApp, DashboardDataProcessor, DataLoader, DatasetCache
+    if "loader" in groups:
+        yield "DataLoader.load_data.cold", lambda: DataLoader(cache=DatasetCache()).load_data()
+        warm_loader = DataLoader(cache=DatasetCache())
+        warm_loader.load_data()
+        yield "DataLoader.load_data.warm", warm_loader.load_data
+
+    if "dashboard" in groups:
+        store, _ = DataLoader(cache=DatasetCache()).load_data()
+        processor = DashboardDataProcessor(store)
+        yield "DashboardDataProcessor.get_7day_trend_data", processor.get_7day_trend_data
+        yield "DashboardDataProcessor.get_current_readings", processor.get_current_readings
+        yield "DashboardDataProcessor.get_heatmap_data", processor.get_heatmap_data
+        yield "DashboardDataProcessor.get_historical_records", processor.get_historical_records
+
+    if "pages" in groups:
+        air_quality_app = AirQualityApp()
+        client = air_quality_app.app.test_client()
+
+        def get(path):
+            response = client.get(path)
+            assert response.status_code == 200, f"{path} returned {response.status_code}"
+
+        yield "render /", lambda: air_quality_app._render_dashboard(air_quality_app.region())
+        for path in ("/", "/history", "/forecast"):
+            yield f"GET {path}", lambda path=path: get(path)
+
+
+def run(sensors, days, missing, seed, repeat, groups, epochs):
+    """Generates the synthetic data set and returns {benchmark name: measurement}."""
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as root:
+        synthetic_data.write_data_dir(os.path.join(root, "data"), sensors, days, missing, seed)
+        # The code under test resolves ../data from its working directory
+        os.makedirs(os.path.join(root, "my_scripts"))
+        os.chdir(os.path.join(root, "my_scripts"))
+        try:
+            for name, func in benchmarks(groups, epochs):
+                results[name] = measure(func, repeat)
+                print(f"{name:<48} {results[name]['seconds']:9.4f} s  peak {results[name]['peak_mb']:9.2f} MB")
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns the regressions: benchmarks slower or using more memory than the baseline by > threshold."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for key, floor in (("seconds", NOISE_FLOOR_SECONDS), ("peak_mb", 0.1)):
+            if result[key] > base[key] * (1 + threshold) and result[key] - base[key] > floor:
+                regressions.append({"benchmark": name, "metric": key, "baseline": base[key], "current": result[key],
+                                    "ratio": round(result[key] / base[key], 2) if base[key] else None})
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and memory-profile every pipeline stage and page on "
+                                                 "synthetic data, optionally against a baseline.")
+    parser.add_argument("--sensors", type=int, default=100)
+    parser.add_argument("--days", type=int, default=2 * 365)
+    parser.add_argument("--missing", type=float, default=0.1, help="missing-data ratio")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, the median is kept")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=list(GROUPS), help="benchmark groups to run")
+    parser.add_argument("--epochs", type=int, default=1, help="epochs of the training benchmark")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    # Keep the imports of the code under test working from any directory
+    sys.path.insert(0, SCRIPT_DIR)
+    report = {
+        "meta": {"sensors": args.sensors, "days": args.days, "missing": args.missing, "seed": args.seed,
+                 "repeat": args.repeat, "commit": git_commit(), "python": platform.python_version(),
+                 "machine": platform.machine(), "cpus": os.cpu_count(),
+                 "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat()},
+        "results": run(args.sensors, args.days, args.missing, args.seed, args.repeat, args.only, args.epochs),
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if {k: baseline["meta"].get(k) for k in ("sensors", "days", "missing", "seed")} != \
+                {k: report["meta"][k] for k in ("sensors", "days", "missing", "seed")}:
+            print("WARNING the baseline was run on a different data set size.")
+        report["regressions"] = compare(report["results"], baseline, args.threshold)
+        for regression in report["regressions"]:
+            print(f"REGRESSION {regression['benchmark']} {regression['metric']}: "
+                  f"{regression['baseline']} -> {regression['current']} (x{regression['ratio']})")
+        if not report["regressions"]:
+            print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%}).")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if report.get("regressions"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
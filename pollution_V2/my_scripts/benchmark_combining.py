@@ -0,0 +1,70 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from functools import reduce
+import pandas as pd
+import data_combining
+import synthetic_data
+
+
+def combine_with_reduce(folder, min_days=data_combining.min_days):
+    """The previous implementation: full reads and pairwise outer merges."""
+    sensor_dfs = {}
+    for file in os.listdir(folder):
+        if file.endswith(".csv") and file.startswith("sensor_"):
+            sensor_id = int(file.split("_")[1].split(".")[0])
+            df = pd.read_csv(os.path.join(folder, file))
+            if "parameter" not in df.columns or df["parameter"].iloc[0].lower() != "pm25":
+                continue
+            df["datetime_from_local"] = pd.to_datetime(df["datetime_from_local"])
+            df["datetime_to_local"] = pd.to_datetime(df["datetime_to_local"])
+            sensor_dfs[sensor_id] = df
+
+    all_data = []
+    for sensor_id, df in sensor_dfs.items():
+        if (df["datetime_to_local"].max() - df["datetime_from_local"].min()).days >= min_days:
+            df = df[["datetime_from_local", "value"]].rename(columns={"value": f"sensor_{sensor_id}"})
+            all_data.append(df.set_index("datetime_from_local"))
+
+    wide_df = reduce(lambda left, right: pd.merge(left, right, left_index=True, right_index=True, how='outer'),
+                     all_data)
+    return wide_df.sort_index()
+
+
+def profile(func, *args):
+    """Returns (result, seconds, peak MB); memory is traced in a second, untimed run."""
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the reduce(pd.merge) and single-matrix aligners.")
+    parser.add_argument("--sensors", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=5 * 365)
+    parser.add_argument("--missing", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        synthetic_data.write_sensor_files(folder, args.sensors, args.days, args.missing)
+
+        new_df, new_time, new_peak = profile(lambda f: data_combining.combine(f)[0], folder)
+        old_df, old_time, old_peak = profile(combine_with_reduce, folder)
+
+    same = old_df.sort_index(axis=1).equals(new_df.sort_index(axis=1))
+    print(f"Dataset: {args.sensors} sensors x {args.days} days, result {new_df.shape}, identical: {same}")
+    print(f"reduce(pd.merge): {old_time:8.2f} s  peak {old_peak:8.1f} MB")
+    print(f"single matrix:    {new_time:8.2f} s  peak {new_peak:8.1f} MB")
+    print(f"speedup x{old_time / new_time:.1f}, memory x{old_peak / new_peak:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import storage
+import synthetic_data
+from imputation import IncrementalImputation, STRATEGIES, make_imputer
+
+
+def mask_observed(df, ratio, seed=0):
+    """Hides ``ratio`` of the observed cells; returns (masked frame, boolean mask of hidden cells)."""
+    rng = np.random.default_rng(seed)
+    hidden = df.notna().to_numpy() & (rng.random(df.shape) < ratio)
+    return df.mask(hidden), hidden
+
+
+def score(df, imputed, hidden):
+    """Returns (RMSE, MAE) over the hidden cells."""
+    errors = imputed.to_numpy()[hidden] - df.to_numpy()[hidden]
+    return float(np.sqrt(np.mean(errors ** 2))), float(np.mean(np.abs(errors)))
+
+
+def time_incremental(strategy, df, new_days):
+    """Returns the seconds taken to impute the last ``new_days`` rows against the earlier output."""
+    with tempfile.TemporaryDirectory() as folder:
+        incremental = IncrementalImputation(make_imputer(strategy), state_path=os.path.join(folder, "state.json"))
+        previous, _ = incremental.update(df.iloc[:-new_days])
+        incremental.save_state(df.iloc[:-new_days])
+        start = time.perf_counter()
+        incremental.update(df, previous)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare imputation strategies on artificially hidden values.")
+    parser.add_argument("--sensors", type=int, help="use a synthetic matrix with this many sensors")
+    parser.add_argument("--days", type=int, default=3 * 365, help="days of the synthetic matrix")
+    parser.add_argument("--mask", type=float, default=0.1, help="fraction of observed values to hide")
+    parser.add_argument("--new-days", type=int, default=1, help="days appended for the incremental timing")
+    parser.add_argument("--strategies", nargs="+", choices=sorted(STRATEGIES), default=sorted(STRATEGIES))
+    args = parser.parse_args()
+
+    if args.sensors:
+        df = synthetic_data.aligned_frame(args.sensors, args.days)
+    else:
+        df = storage.read_frame(storage.find_dataset("aligned_raw"))
+    masked, hidden = mask_observed(df, args.mask)
+    print(f"Matrix {df.shape[0]} days x {df.shape[1]} sensors, {df.isna().to_numpy().mean():.1%} missing, "
+          f"{hidden.sum()} values hidden")
+    print(f"{'strategy':<12} {'full (s)':>9} {'+' + str(args.new_days) + ' day(s) (s)':>16} {'RMSE':>8} {'MAE':>8}")
+
+    for strategy in args.strategies:
+        start = time.perf_counter()
+        imputed = make_imputer(strategy).fit_transform(masked)
+        elapsed = time.perf_counter() - start
+        rmse, mae = score(df, imputed, hidden)
+        incremental = time_incremental(strategy, masked, args.new_days)
+        print(f"{strategy:<12} {elapsed:9.3f} {incremental:16.3f} {rmse:8.2f} {mae:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
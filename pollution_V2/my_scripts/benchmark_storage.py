@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+import storage
+
+# Runs in a fresh interpreter so peak RSS reflects a single load only
+LOAD_SNIPPET = """
+import json, resource, sys, time
+import storage
+path, column = sys.argv[1], sys.argv[2] or None
+start = time.perf_counter()
+df = storage.read_frame(path, columns=[column] if column else None)
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "rows": len(df), "columns": df.shape[1],
+                  "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def build_frame(sensor_scale, day_scale):
+    """Tiles the filled dataset to simulate more sensors and a longer history."""
+    df = storage.read_frame(storage.find_dataset("aligned_filled"))
+    if sensor_scale > 1:
+        df = pd.concat([df] * sensor_scale, axis=1)
+        df.columns = [f"sensor_{i}" for i in range(df.shape[1])]
+    if day_scale > 1:
+        values = np.tile(df.to_numpy(), (day_scale, 1))
+        index = pd.date_range(end=df.index[-1], periods=len(values), freq="D", name=df.index.name)
+        df = pd.DataFrame(values, index=index, columns=df.columns)
+    return df
+
+
+def measure(path, column=None):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, "-c", LOAD_SNIPPET, path, column or ""],
+                            cwd=script_dir, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare load time and peak RSS of storage formats.")
+    parser.add_argument("--sensor-scale", type=int, default=1, help="multiply the number of sensors")
+    parser.add_argument("--day-scale", type=int, default=1, help="multiply the number of days")
+    parser.add_argument("--formats", nargs="+", default=list(storage.BACKENDS))
+    args = parser.parse_args()
+
+    df = build_frame(args.sensor_scale, args.day_scale)
+    column = df.columns[0]
+    print(f"Dataset: {df.shape[0]} days x {df.shape[1]} sensors")
+    print(f"{'format':<10}{'size MB':>10}{'full s':>10}{'full RSS MB':>14}{'1 col s':>10}{'1 col RSS MB':>14}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for fmt in args.formats:
+            path = os.path.join(tmp_dir, "bench" + storage.BACKENDS[fmt].extension)
+            storage.write_frame(df, path)
+            full = measure(path)
+            projected = measure(path, column)
+            size_mb = os.path.getsize(path) / 1024 ** 2
+            print(f"{fmt:<10}{size_mb:>10.2f}{full['seconds']:>10.3f}{full['peak_rss_mb']:>14.1f}"
+                  f"{projected['seconds']:>10.3f}{projected['peak_rss_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,43 @@
-import pandas as pd
-from sklearn.impute import KNNImputer
+import argparse
+import os
+import storage
+from imputation import IncrementalImputation, STRATEGIES, make_imputer
 
-# Load the original aligned PM2.5 data
-df = pd.read_csv("../data/aligned_sensors_data_pm25_only.csv", index_col=0, parse_dates=True)
 
-print("Original shape:", df.shape)
+def impute(strategy="knn", full=False):
+    """Imputes the aligned data into the filled dataset; returns the number of days imputed."""
+    # Load the original aligned PM2.5 data
+    df = storage.read_frame(storage.find_dataset("aligned_raw"))
+    print("Original shape:", df.shape)
 
-# KNN Imputation (use 5 nearest sensors)
-imputer = KNNImputer(n_neighbors=5, weights="distance")
+    output_path = storage.dataset_path("aligned_filled")
+    previous_path = storage.find_dataset("aligned_filled")
+    previous = storage.read_frame(previous_path) if os.path.exists(previous_path) else None
 
-df_imputed = pd.DataFrame(
-    imputer.fit_transform(df),
-    index=df.index,
-    columns=df.columns
-)
-df_imputed = df_imputed.round(1)
-print("After imputation:", df_imputed.shape)
+    # KNN by default: each missing day is filled from the 5 most similar days
+    incremental = IncrementalImputation(make_imputer(strategy))
+    df_imputed, imputed_rows = incremental.update(df, previous, full=full)
+    if imputed_rows == 0:
+        print("No new days since the last run, the imputed data is up to date.")
+        return 0
+    df_imputed = df_imputed.round(1)
+    print(f"Imputed {imputed_rows} of {len(df)} days with the {strategy} strategy.")
+    print("After imputation:", df_imputed.shape)
 
-df_imputed.to_csv("../data/aligned_sensors_pm25_filled_knn.csv")
+    storage.write_frame(df_imputed, output_path)
+    incremental.save_state(df)
+    return imputed_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Impute the missing values of the aligned PM2.5 data.")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="knn",
+                        help="knn (default), interpolate (per-sensor in time) or regression (on correlated sensors)")
+    parser.add_argument("--full", action="store_true",
+                        help="impute the whole matrix again instead of only the newly appended days")
+    args = parser.parse_args()
+    impute(args.strategy, args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,120 @@
+import csv
 import os
+import numpy as np
 import pandas as pd
+import storage
+from data_handling import OUTPUT_FOLDER
 
-data_folder = "../data/daily_data"
+data_folder = OUTPUT_FOLDER
 
 min_days = 120
 
-# Step 1: Read all CSVs and store PM2.5 sensors only
-sensor_dfs = {}
-for file in os.listdir(data_folder):
-    if file.endswith(".csv") and file.startswith("sensor_"):
-        sensor_id = int(file.split("_")[1].split(".")[0])
-        df = pd.read_csv(os.path.join(data_folder, file))
+PARAMETER = "pm25"
+USE_COLUMNS = ["datetime_from_local", "datetime_to_local", "value"]
 
-        #  FILTER: KEEP ONLY PM2.5
-        if "parameter" not in df.columns:
-            continue  # skip weird files
 
-        if df["parameter"].iloc[0].lower() != "pm25":
-            continue  # skip UM003, PM10, etc.
+def read_parameter(file_path):
+    """Returns the parameter of a sensor file from its first data row, or None."""
+    with open(file_path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        first_row = next(reader, None)
+    if not header or "parameter" not in header:
+        return None  # skip weird files
+    if first_row is None:
+        return ""
+    return first_row[header.index("parameter")].lower()
 
-        df["datetime_from_local"] = pd.to_datetime(df["datetime_from_local"]) # make the dates into datetime format
-        df["datetime_to_local"] = pd.to_datetime(df["datetime_to_local"])
-        df["sensor_id"] = sensor_id
-        sensor_dfs[sensor_id] = df
 
-print(f"PM2.5 sensors found: {len(sensor_dfs)}")
+def sensor_files(folder, parameter=PARAMETER):
+    """Yields (sensor_id, path) for every file of the given parameter, sorted by file name."""
+    for file in sorted(os.listdir(folder)):
+        if file.endswith(".csv") and file.startswith("sensor_"):
+            file_path = os.path.join(folder, file)
+            # FILTER: KEEP ONLY PM2.5 (skip UM003, PM10, etc.) without parsing the file
+            if read_parameter(file_path) == parameter:
+                yield int(file.split("_")[1].split(".")[0]), file_path
 
-# Step 2: Compute per-sensor coverage
-coverage_stats = {}
-for sensor_id, df in sensor_dfs.items():
-    days = (df["datetime_to_local"].max() - df["datetime_from_local"].min()).days
-    coverage_stats[sensor_id] = days
 
-coverage_df = pd.DataFrame.from_dict(coverage_stats, orient='index', columns=['coverage_days'])
-print("Per-sensor coverage statistics:")
-print(coverage_df.describe())
+class DateCache:
+    """Parses each distinct date string once across all files; sensors share the same days."""
 
-# Step 3: Keep sensors with enough data
-valid_sensors = coverage_df[coverage_df['coverage_days'] >= min_days].index.tolist()
-print(f"Sensors with at least {min_days} days of PM2.5 data: {len(valid_sensors)}")
+    def __init__(self):
+        self.known = pd.Index([], dtype=object)
+        self.parsed = None
 
-# Step 4: Build wide-format DataFrame
-all_data = []
-for sensor_id in valid_sensors:
-    df = sensor_dfs[sensor_id][["datetime_from_local", "value"]].copy()
-    df.rename(columns={"value": f"sensor_{sensor_id}"}, inplace=True)
-    all_data.append(df.set_index("datetime_from_local"))
+    def positions(self, values):
+        """Returns, for every value, its position in ``self.parsed`` (-1 if missing)."""
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Index(uniques)
+        positions = self.known.get_indexer(uniques)
+        new = positions == -1
+        if new.any():
+            parsed = pd.DatetimeIndex(pd.to_datetime(uniques[new]))
+            self.known = self.known.append(uniques[new])
+            self.parsed = parsed if self.parsed is None else self.parsed.append(parsed)
+            positions = self.known.get_indexer(uniques)
+        return np.where(codes >= 0, positions[codes], -1)
 
-from functools import reduce
-wide_df = reduce(lambda left, right: pd.merge(left, right, left_index=True, right_index=True, how='outer'), all_data)
 
-# Sort by date
-wide_df.sort_index(inplace=True)
+def combine(folder=data_folder, min_days=min_days):
+    """Builds the wide days x sensors PM2.5 frame in one pass over the files.
 
-print("Wide-format DataFrame ready for modeling:")
-print(wide_df.head())
+    Each file is read for the needed columns only, its dates are resolved through
+    a shared cache, and only sensors with at least ``min_days`` of coverage are
+    kept, as (date position, value) arrays. All of them are then written straight
+    into a single matrix over the union of their days.
+    """
+    dates = DateCache()
+    coverage_stats = {}
+    kept = []
 
-wide_df.to_csv("../data/aligned_sensors_data_pm25_only.csv")
+    for sensor_id, file_path in sensor_files(folder):
+        df = pd.read_csv(file_path, usecols=USE_COLUMNS)
+        start = dates.positions(df["datetime_from_local"])
+        end = dates.positions(df["datetime_to_local"])
+        valid = start >= 0
+        if not valid.any() or not (end >= 0).any():
+            coverage_stats[sensor_id] = 0
+            continue
+
+        coverage = dates.parsed[end[end >= 0]].max() - dates.parsed[start[valid]].min()
+        coverage_stats[sensor_id] = coverage.days
+        if coverage.days >= min_days:
+            kept.append((sensor_id, start[valid], df["value"].to_numpy(dtype=float)[valid]))
+
+    coverage_df = pd.DataFrame.from_dict(coverage_stats, orient='index', columns=['coverage_days'])
+
+    # Shared daily index: the union of every kept sensor's days, in time order
+    used = np.unique(np.concatenate([start for _, start, _ in kept])) if kept else np.array([], dtype=int)
+    index = pd.DatetimeIndex(dates.parsed[used] if kept else [], name="datetime_from_local")
+    index = index.unique().sort_values()
+    row_of = index.get_indexer(dates.parsed) if kept else np.array([], dtype=int)
+
+    matrix = np.full((len(index), len(kept)), np.nan)
+    for column, (_, start, values) in enumerate(kept):
+        # Later rows overwrite earlier ones, so a repeated day keeps its latest reading
+        matrix[row_of[start], column] = values
+
+    wide_df = pd.DataFrame(matrix, index=index, columns=[f"sensor_{sensor_id}" for sensor_id, _, _ in kept])
+    return wide_df, coverage_df
+
+
+def main(verbose=True):
+    wide_df, coverage_df = combine()
+
+    if verbose:
+        print(f"PM2.5 sensors found: {len(coverage_df)}")
+        print("Per-sensor coverage statistics:")
+        print(coverage_df.describe())
+        print(f"Sensors with at least {min_days} days of PM2.5 data: {wide_df.shape[1]}")
+
+        print("Wide-format DataFrame ready for modeling:")
+        print(wide_df.head())
+
+    storage.write_frame(wide_df, storage.dataset_path("aligned_raw"))
+    return wide_df.shape
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,370 @@
+import argparse
+import csv
 import datetime
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
-from openaq import OpenAQ
-
-client = OpenAQ(api_key="f2ae9f923f46869d0254a8f714b115d8ff9b26ae25178ab506172346f487455b")
-def func(sensor_id): # initilize function for getting data of sensors which correspond to the following conditions
-    response = client.measurements.list(
-    sensors_id=sensor_id,
-    data="days",
-    datetime_from=datetime.datetime(2024,11,16),
-    datetime_to=datetime.datetime(2025,11,16),
-
-    )
-    return response
-
-new_data = pd.read_csv("../data/my_sensors_with_dates.csv")
-sens_data = new_data["sensor_id"]
- 
-for i in sens_data: # here we just create a new dataframe for the sensors and make a .csv file for them with this properties
-    all_data = []
-    response = func(i)
-    for m in response.results:
-        all_data.append({
+from regions import DATA_DIR
+
+API_KEY = os.environ.get("OPENAQ_API_KEY", "f2ae9f923f46869d0254a8f714b115d8ff9b26ae25178ab506172346f487455b")
+SENSORS_PATH = os.path.join(DATA_DIR, "my_sensors_with_dates.csv")
+OUTPUT_FOLDER = os.path.join(DATA_DIR, "daily_data")
+HOURLY_OUTPUT_FOLDER = os.path.join(DATA_DIR, "hourly_data")
+COLUMNS = ["datetime_from_local", "datetime_to_local", "value", "parameter"]
+
+
+class RateLimiter:
+    """Spaces out requests shared by all worker threads to a maximum rate."""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+    def penalize(self, seconds):
+        """Pushes every thread's next request back, e.g. after an HTTP 429."""
+        with self._lock:
+            self._next_time = max(self._next_time, time.monotonic() + seconds)
+
+
+def is_rate_limited(error):
+    """Returns True if an exception from the OpenAQ client signals a rate limit."""
+    return type(error).__name__ == "RateLimitError" or getattr(error, "status_code", None) == 429
+
+
+def to_utc(value):
+    """Returns a UTC timestamp, treating naive values as UTC."""
+    ts = pd.Timestamp(value)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def read_last_row(path):
+    """Returns the last row of a sensor file as {column: text} without parsing the whole file."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        lines = [line for line in f.read().decode("utf-8").splitlines() if line.strip()]
+    if len(lines) < 2 or not lines[-1][:1].isdigit():
+        return None  # header only
+    return dict(zip(COLUMNS, next(csv.reader([lines[-1]]))))
+
+
+class OpenAQSource:
+    """Fetches pages of measurements through the OpenAQ client, daily or with data="hours" hourly."""
+
+    def __init__(self, client=None, data="days"):
+        if client is None:
+            from openaq import OpenAQ
+            client = OpenAQ(api_key=API_KEY)
+        self.client = client
+        self.data = data
+
+    def fetch_page(self, sensor_id, datetime_from, datetime_to, page, limit):
+        """Returns one page of measurements as a list of row dicts."""
+        response = self.client.measurements.list(
+            sensors_id=sensor_id,
+            data=self.data,
+            datetime_from=datetime_from,
+            datetime_to=datetime_to,
+            page=page,
+            limit=limit,
+        )
+        return [{
             "datetime_from_local": m.period.datetime_from.local,
             "datetime_to_local": m.period.datetime_to.local,
             "value": m.value,
             "parameter": m.parameter.name
-        })
+        } for m in response.results]
+
+
+class LocalSource:
+    """Serves pages from existing sensor CSV files, standing in for the OpenAQ API offline."""
+
+    def __init__(self, folder=OUTPUT_FOLDER):
+        self.folder = folder
+
+    def fetch_page(self, sensor_id, datetime_from, datetime_to, page, limit):
+        path = os.path.join(self.folder, f"sensor_{sensor_id}.csv")
+        if not os.path.exists(path):
+            return []
+        df = pd.read_csv(path)
+        start = pd.to_datetime(df["datetime_from_local"], utc=True)
+        in_range = (start >= to_utc(datetime_from)) & (start < to_utc(datetime_to))
+        rows = df[in_range].to_dict("records")
+        return rows[(page - 1) * limit:page * limit]
+
+
+class Checkpoint:
+    """Per-sensor state in a small JSON file that is rewritten atomically on every update."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.state = {}
+
+    def get(self, sensor_id):
+        return self.state.get(str(sensor_id), {})
+
+    def set(self, sensor_id, **entry):
+        with self._lock:
+            self.state[str(sensor_id)] = entry
+            self._save()
+
+    def discard(self, sensor_id):
+        with self._lock:
+            if self.state.pop(str(sensor_id), None) is not None:
+                self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        with self._lock:
+            self.state = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class Downloader:
+    """Downloads every sensor's measurements concurrently, resuming interrupted runs.
+
+    Pages are streamed into a per-sensor ``.part`` file and the checkpoint records
+    the next page to fetch, so a restarted run continues where it stopped. Each
+    sensor's CSV is written once, atomically, when all its pages have arrived.
+    """
+
+    def __init__(self, source, output_folder=OUTPUT_FOLDER, max_workers=4, page_limit=1000,
+                 requests_per_second=1.0, max_retries=5, backoff=2.0):
+        self.source = source
+        self.output_folder = output_folder
+        self.max_workers = max_workers
+        self.page_limit = page_limit
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.checkpoint = Checkpoint(os.path.join(output_folder, ".download_checkpoint.json"))
+        self.manifest = Checkpoint(os.path.join(output_folder, ".sync_manifest.json"))
+
+    def run(self, sensor_ids, datetime_from, datetime_to):
+        """Downloads all sensors and returns {sensor_id: row count} for those fetched."""
+        os.makedirs(self.output_folder, exist_ok=True)
+        window = [str(datetime_from), str(datetime_to)]
+        pending = [s for s in sensor_ids
+                   if not (self.checkpoint.get(s).get("done") and self.checkpoint.get(s).get("window") == window)]
+
+        counts = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.download_sensor, sensor_id, datetime_from, datetime_to): sensor_id
+                       for sensor_id in pending}
+            for future in as_completed(futures):
+                sensor_id = futures[future]
+                try:
+                    counts[sensor_id] = future.result()
+                except Exception as e:
+                    print(f"ERROR downloading sensor {sensor_id}: {e}")
+
+        if len(counts) == len(pending):
+            self.checkpoint.clear()
+        return counts
+
+    def download_sensor(self, sensor_id, datetime_from, datetime_to):
+        """Streams every page for one sensor and writes its CSV once."""
+        window = [str(datetime_from), str(datetime_to)]
+        part_path = os.path.join(self.output_folder, f"sensor_{sensor_id}.csv.part")
+        progress = self.checkpoint.get(sensor_id)
+
+        page = 1
+        if progress.get("window") == window and os.path.exists(part_path):
+            page = progress.get("next_page", 1)
+        else:
+            pd.DataFrame(columns=COLUMNS).to_csv(part_path, index=False)
+
+        while True:
+            rows = self._fetch_with_retry(sensor_id, datetime_from, datetime_to, page)
+            if rows:
+                pd.DataFrame(rows, columns=COLUMNS).to_csv(part_path, mode="a", header=False, index=False)
+            self.checkpoint.set(sensor_id, window=window, next_page=page + 1)
+            if len(rows) < self.page_limit:
+                break
+            page += 1
+
+        # A crash between appending a page and checkpointing it can repeat that page
+        df = pd.read_csv(part_path).drop_duplicates()
+        if df.empty:
+            # No measurements in the window: like before, no file is written for the sensor
+            os.remove(part_path)
+        else:
+            output_path = os.path.join(self.output_folder, f"sensor_{sensor_id}.csv")
+            df.to_csv(part_path, index=False)
+            os.replace(part_path, output_path)
+            # The file was replaced, so a --sync watermark from before no longer applies
+            self._set_last_row(sensor_id, df.iloc[-1])
+        self.checkpoint.set(sensor_id, window=window, done=True)
+        return len(df)
+
+    def sync(self, sensors, datetime_to, default_from):
+        """Fetches only measurements from the newest day on disk onwards and appends them.
+
+        ``sensors`` maps sensor IDs to their OpenAQ ``datetime_last``; sensors whose
+        newest day on disk had already ended when it was fetched, and whose last
+        measurement is not newer than it, are skipped without any API call.
+        Returns {sensor_id: appended row count} for synced sensors.
+        """
+        os.makedirs(self.output_folder, exist_ok=True)
+        pending = {}
+        for sensor_id, datetime_last in sensors.items():
+            last = self.last_row(sensor_id)
+            if last is None:
+                pending[sensor_id] = default_from
+                continue
+            if (last["final"] and pd.notna(datetime_last)
+                    and to_utc(datetime_last) <= to_utc(last["datetime_to_local"])):
+                continue
+            # The stored day may have been fetched while it was still running, so ask for it again
+            pending[sensor_id] = pd.Timestamp(last["datetime_from_local"])
+
+        counts = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.sync_sensor, sensor_id, datetime_from, datetime_to): sensor_id
+                       for sensor_id, datetime_from in pending.items()}
+            for future in as_completed(futures):
+                sensor_id = futures[future]
+                try:
+                    counts[sensor_id] = future.result()
+                except Exception as e:
+                    print(f"ERROR syncing sensor {sensor_id}: {e}")
+        return counts
+
+    def last_row(self, sensor_id):
+        """Returns the newest measurement stored for a sensor, or None.
+
+        Besides the CSV columns, ``final`` tells whether its day had ended when it
+        was fetched. The manifest entry is only trusted while the file still has
+        the size it recorded; a file rewritten by anything else is read from its
+        tail, and its last day is then not known to be final.
+        """
+        path = os.path.join(self.output_folder, f"sensor_{sensor_id}.csv")
+        if not os.path.exists(path):
+            self.manifest.discard(sensor_id)
+            return None
+        entry = self.manifest.get(sensor_id)
+        if entry.get("datetime_to_local") is not None and entry.get("size") == os.path.getsize(path):
+            return entry
+        row = read_last_row(path)
+        if row is None:
+            return None
+        return {**row, "value": float(row["value"]) if row["value"] else float("nan"), "final": False}
+
+    def _set_last_row(self, sensor_id, row):
+        path = os.path.join(self.output_folder, f"sensor_{sensor_id}.csv")
+        # A daily row of today is OpenAQ's running mean and may still be revised
+        final = to_utc(row["datetime_to_local"]) <= pd.Timestamp.now(tz="UTC")
+        self.manifest.set(sensor_id, datetime_from_local=str(row["datetime_from_local"]),
+                          datetime_to_local=str(row["datetime_to_local"]), value=float(row["value"]),
+                          final=bool(final), size=os.path.getsize(path))
+
+    def sync_sensor(self, sensor_id, datetime_from, datetime_to):
+        """Fetches the window from the newest stored day and appends what is new or revised."""
+        rows = []
+        page = 1
+        while True:
+            page_rows = self._fetch_with_retry(sensor_id, datetime_from, datetime_to, page)
+            rows.extend(page_rows)
+            if len(page_rows) < self.page_limit:
+                break
+            page += 1
+
+        path = os.path.join(self.output_folder, f"sensor_{sensor_id}.csv")
+        fetched = pd.DataFrame(rows, columns=COLUMNS).drop_duplicates(subset=["datetime_from_local"])
+        new_rows = fetched
+        last = self.last_row(sensor_id)
+        if last is not None:
+            starts = pd.to_datetime(fetched["datetime_from_local"], utc=True)
+            fetched = fetched[starts >= to_utc(last["datetime_from_local"])]
+            # The stored day comes back first; readers keep the last row of a day, so a
+            # revision is appended and an unchanged day is not
+            stored = starts[fetched.index] == to_utc(last["datetime_from_local"])
+            new_rows = fetched[~(stored & (fetched["value"] == last["value"]))]
+
+        if not new_rows.empty:
+            exists = os.path.exists(path)
+            new_rows.to_csv(path, mode="a" if exists else "w", header=not exists, index=False)
+        if not fetched.empty:
+            self._set_last_row(sensor_id, fetched.iloc[-1])
+        return len(new_rows)
+
+    def _fetch_with_retry(self, sensor_id, datetime_from, datetime_to, page):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                return self.source.fetch_page(sensor_id, datetime_from, datetime_to, page, self.page_limit)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random())
+                if is_rate_limited(e):
+                    # Rate limits apply to the whole key, so slow every worker down
+                    self.rate_limiter.penalize(delay)
+                time.sleep(delay)
+
+
+def download(date_from, date_to, sync=False, hourly=False, workers=4, rate=1.0, offline=None, output=None):
+    """Downloads (or with ``sync`` tops up) every sensor's file; returns {sensor_id: new rows}."""
+    source = LocalSource(offline) if offline else OpenAQSource(data="hours" if hourly else "days")
+    output = output or (HOURLY_OUTPUT_FOLDER if hourly else OUTPUT_FOLDER)
+    sensors = pd.read_csv(SENSORS_PATH)
+    sensor_ids = sensors["sensor_id"].tolist()
+
+    downloader = Downloader(source, output_folder=output, max_workers=workers, requests_per_second=rate)
+    if sync:
+        datetime_last = dict(zip(sensor_ids, sensors["datetime_last"]))
+        return downloader.sync(datetime_last, date_to, date_from)
+    return downloader.run(sensor_ids, date_from, date_to)
+
+
+def main():
+    today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    parser = argparse.ArgumentParser(description="Download daily (or hourly) PM2.5 data for every sensor.")
+    parser.add_argument("--date-from", type=datetime.datetime.fromisoformat,
+                        default=today - datetime.timedelta(days=365))
+    parser.add_argument("--date-to", type=datetime.datetime.fromisoformat, default=today)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=1.0, help="maximum requests per second")
+    parser.add_argument("--offline", metavar="FOLDER",
+                        help="replay sensor files from FOLDER instead of calling the API")
+    parser.add_argument("--output", help=f"output folder, by default {OUTPUT_FOLDER} or {HOURLY_OUTPUT_FOLDER}")
+    parser.add_argument("--hourly", action="store_true",
+                        help="download hourly measurements instead of daily ones; update the tiers with tiers.py")
+    parser.add_argument("--sync", action="store_true",
+                        help="only fetch measurements newer than the ones already on disk")
+    args = parser.parse_args()
+
+    counts = download(args.date_from, args.date_to, sync=args.sync, hourly=args.hourly, workers=args.workers,
+                      rate=args.rate, offline=args.offline, output=args.output)
+    if args.sync:
+        print(f"Synced {len(counts)} sensors, {sum(counts.values())} new measurements.")
+    else:
+        print(f"Downloaded {len(counts)} sensors, {sum(counts.values())} measurements.")
+
 
-        df = pd.DataFrame(all_data)
-        df.to_csv(f"../data/daily_data/sensor_{i}.csv", index=False)
-df = pd.DataFrame(all_data)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import argparse
+import importlib
+import multiprocessing
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+import storage
+
+HORIZON = 7  # Same as model.FUTURE_DAYS; model.py is not imported here so that TensorFlow loads only when needed
+GROUPINGS = ("global", "cluster", "sensor")
+DATA_PATH = storage.find_dataset("aligned_filled")
+FORECAST_OUTPUT_PATH = storage.dataset_path("forecast")
+
+
+class Forecaster(ABC):
+    """Common interface of the forecasting models for a days x sensors block.
+
+    ``fit`` learns from a float array with one column per sensor and
+    ``predict`` returns the next ``steps`` days of every column as a
+    (steps, columns) array. ``pooled`` models share their parameters across the
+    columns of a block, so grouping sensors changes what they learn; the others
+    treat each column on its own. ``cost`` is a rough relative fitting cost,
+    used to start the slowest fits first, and ``requires`` the modules imported
+    before a fit is timed.
+    """
+
+    name = None
+    pooled = False
+    cost = 1
+    requires = ()
+
+    @abstractmethod
+    def fit(self, values):
+        """Learns from a (days, columns) array; returns self."""
+
+    @abstractmethod
+    def predict(self, steps):
+        """Returns the next ``steps`` days as a (steps, columns) array."""
+
+
+class SeasonalNaiveForecaster(Forecaster):
+    """Repeats the last ``season`` days; the reference every other model has to beat."""
+
+    name = "snaive"
+
+    def __init__(self, season=7):
+        self.season = season
+        self._last = None
+
+    def fit(self, values):
+        self._last = np.asarray(values, dtype=np.float64)[-self.season:]
+        return self
+
+    def predict(self, steps):
+        return self._last[np.arange(steps) % len(self._last)]
+
+
+class ExponentialSmoothingForecaster(Forecaster):
+    """Simple exponential smoothing with the smoothing factor chosen per sensor.
+
+    Every factor in ``alphas`` is run over the history at once, vectorized
+    across sensors, and each sensor keeps the one with the lowest one-step
+    squared error. Fitting is O(days x sensors x len(alphas)).
+    """
+
+    name = "ses"
+
+    def __init__(self, alphas=(0.1, 0.2, 0.3, 0.5, 0.7, 0.9)):
+        self.alphas = np.asarray(alphas, dtype=np.float64)
+        self.alpha = None
+        self._level = None
+
+    def fit(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        alphas = self.alphas[:, np.newaxis]
+        level = np.repeat(values[:1], len(self.alphas), axis=0)  # (alphas, sensors)
+        sse = np.zeros_like(level)
+        for row in values[1:]:
+            error = row - level
+            sse += error ** 2
+            level += alphas * error
+        best = np.argmin(sse, axis=0)
+        columns = np.arange(values.shape[1])
+        self.alpha = self.alphas[best]
+        self._level = level[best, columns]
+        return self
+
+    def predict(self, steps):
+        return np.tile(self._level, (steps, 1))
+
+
+class RidgeLagForecaster(Forecaster):
+    """Ridge regression of the next day on the previous ``lags`` days, forecast recursively.
+
+    A block of several sensors is pooled into one regression, each sensor scaled
+    by its mean level first so that sensors of different levels share the same
+    dynamics.
+    """
+
+    name = "ridge"
+    pooled = True
+    cost = 2
+    requires = ("sklearn.linear_model",)
+
+    def __init__(self, lags=14, alpha=1.0):
+        self.lags = lags
+        self.alpha = alpha
+        self._regression = None
+        self._scale = None
+        self._window = None
+
+    def fit(self, values):
+        from sklearn.linear_model import Ridge
+
+        values = np.asarray(values, dtype=np.float64)
+        scale = np.abs(values.mean(axis=0))
+        self._scale = np.where(scale > 0, scale, 1.0)
+        scaled = values / self._scale
+        lags = min(self.lags, len(scaled) - 1)
+        # (samples, sensors, lags + 1) windows, pooled over sensors
+        windows = sliding_window_view(scaled, lags + 1, axis=0).reshape(-1, lags + 1)
+        self._regression = Ridge(alpha=self.alpha).fit(windows[:, :-1], windows[:, -1])
+        self._window = scaled[-lags:].T.copy()  # (sensors, lags)
+        return self
+
+    def predict(self, steps):
+        window = self._window.copy()
+        predictions = np.empty((steps, window.shape[0]))
+        for step in range(steps):
+            predictions[step] = self._regression.predict(window)
+            window = np.concatenate([window[:, 1:], predictions[step][:, np.newaxis]], axis=1)
+        return predictions * self._scale
+
+
+class LSTMForecaster(Forecaster):
+    """The LSTM of model.py fitted on one block; a block of several sensors is one multivariate model."""
+
+    name = "lstm"
+    pooled = True
+    cost = 100
+    requires = ("model",)
+
+    def __init__(self, seq_length=7, epochs=50, batch_size=16):
+        self.seq_length = seq_length
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self._model = None
+        self._scaler = None
+        self._window = None
+
+    def fit(self, values):
+        import model
+
+        self._scaler, scaled = model.fit_scaler(pd.DataFrame(values))
+        X, y = model.create_sequences(scaled, self.seq_length)
+        self._model = model.build_model(self.seq_length, scaled.shape[1])
+        self._model.fit(X, y, epochs=self.epochs, batch_size=self.batch_size, verbose=0)
+        self._window = scaled[np.newaxis, -self.seq_length:]
+        return self
+
+    def predict(self, steps):
+        import model
+
+        return model.forecast(self._model, self._scaler, self._window, steps)[0]
+
+
+MODELS = {cls.name: cls for cls in (SeasonalNaiveForecaster, ExponentialSmoothingForecaster,
+                                     RidgeLagForecaster, LSTMForecaster)}
+
+
+def make_forecaster(name="ridge", **params):
+    """Returns a forecaster by model name: snaive, ses, ridge or lstm."""
+    try:
+        return MODELS[name](**params)
+    except KeyError:
+        raise ValueError(f"Unknown forecasting model {name!r}, expected one of {sorted(MODELS)}")
+
+
+def group_columns(values, grouping="global", n_clusters=8, seed=0):
+    """Returns the lists of column positions fitted together.
+
+    ``global`` is one block of all sensors, ``sensor`` one block per sensor and
+    ``cluster`` blocks of sensors whose standardized series are close (k-means),
+    i.e. sensors that move together.
+    """
+    n_columns = values.shape[1]
+    if grouping == "global":
+        return [list(range(n_columns))]
+    if grouping == "sensor":
+        return [[i] for i in range(n_columns)]
+    if grouping != "cluster":
+        raise ValueError(f"Unknown grouping {grouping!r}, expected one of {list(GROUPINGS)}")
+
+    from sklearn.cluster import KMeans
+
+    values = np.asarray(values, dtype=np.float64)
+    std = values.std(axis=0)
+    standardized = (values - values.mean(axis=0)) / np.where(std > 0, std, 1.0)
+    labels = KMeans(n_clusters=min(n_clusters, n_columns), n_init=10, random_state=seed).fit_predict(standardized.T)
+    return [np.flatnonzero(labels == label).tolist() for label in np.unique(labels)]
+
+
+def fit_predict(name, params, values, steps):
+    """Fits one model on one block and forecasts it; returns (predictions, fit CPU seconds, predict CPU seconds).
+
+    CPU rather than wall time is measured, so timings stay comparable however
+    many workers share the cores.
+    """
+    forecaster = make_forecaster(name, **params)
+    for module in forecaster.requires:
+        importlib.import_module(module)
+    started = time.process_time()
+    forecaster.fit(values)
+    fitted = time.process_time()
+    predictions = forecaster.predict(steps)
+    return predictions, fitted - started, time.process_time() - fitted
+
+
+def _run_task(task):
+    return fit_predict(*task)
+
+
+def _init_worker(threads):
+    # Before TensorFlow loads in this process; BLAS is already loaded, so limit it at runtime
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(threads)
+
+
+class TrainingEngine:
+    """Runs independent (model, block) fits across CPU cores with a process pool.
+
+    Tasks are ``(model name, params, values, steps)`` tuples and are submitted
+    most expensive first, so a long LSTM fit does not start last and leave
+    the other workers idle. Workers are spawned rather than forked, since
+    forking a process that has TensorFlow loaded is unsafe. Each worker gets
+    an equal share of the cores for its BLAS and TensorFlow threads. With
+    ``workers=1`` everything runs in this process.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+
+    def run(self, tasks):
+        """Returns the (predictions, fit CPU seconds, predict CPU seconds) of every task, in task order."""
+        tasks = list(tasks)
+        if self.workers == 1 or len(tasks) <= 1:
+            return [_run_task(task) for task in tasks]
+
+        order = sorted(range(len(tasks)), key=lambda i: -MODELS[tasks[i][0]].cost)
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        results = [None] * len(tasks)
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)),
+                                 mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(threads,)) as executor:
+            futures = {executor.submit(_run_task, tasks[i]): i for i in order}
+            for future, i in futures.items():
+                results[i] = future.result()
+        return results
+
+
+def forecast_blocks(engine, name, params, values, groups, steps=HORIZON):
+    """Fits one model per block of columns in parallel; returns ((steps, sensors) forecast, fit CPU seconds)."""
+    values = np.asarray(values, dtype=np.float64)
+    results = engine.run((name, params, values[:, group], steps) for group in groups)
+    predictions = np.empty((steps, values.shape[1]))
+    for group, (block, _, _) in zip(groups, results):
+        predictions[:, group] = block
+    return predictions, sum(fit_seconds for _, fit_seconds, _ in results)
+
+
+def load_data(path=DATA_PATH):
+    """Loads the imputed days x sensors matrix, rounded like model.load_data."""
+    return storage.read_frame(path).round(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast the next days with a baseline or per-sensor/per-cluster "
+                                                 "models trained in parallel, see backtest.py to compare them.")
+    parser.add_argument("--model", choices=sorted(MODELS), default="ridge")
+    parser.add_argument("--grouping", choices=GROUPINGS, default="sensor",
+                        help="fit one model for all sensors, per cluster of similar sensors or per sensor")
+    parser.add_argument("--clusters", type=int, default=8, help="number of clusters with --grouping cluster")
+    parser.add_argument("--epochs", type=int, default=50, help="epochs of the lstm model")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="training processes")
+    args = parser.parse_args()
+
+    df = load_data()
+    values = df.to_numpy(dtype=np.float64)
+    params = {"epochs": args.epochs} if args.model == "lstm" else {}
+    groups = group_columns(values, args.grouping if MODELS[args.model].pooled else "global", args.clusters)
+    predictions, fit_seconds = forecast_blocks(TrainingEngine(args.workers), args.model, params, values, groups)
+
+    future_dates = pd.date_range(start=df.index[-1] + pd.Timedelta(days=1), periods=HORIZON, freq="D")
+    future_df = pd.DataFrame(predictions.round(1), columns=df.columns, index=future_dates)
+    storage.write_frame(future_df, FORECAST_OUTPUT_PATH)
+    print(f"Fitted {len(groups)} {args.model} model(s) in {fit_seconds:.1f} CPU seconds; "
+          f"saved the {HORIZON}-day forecast.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import urllib.error
+import urllib.parse
+import urllib.request
+import pandas as pd
+from data_handling import API_KEY, SENSORS_PATH, RateLimiter
+from regions import DATA_DIR
+
+LOCATIONS_PATH = SENSORS_PATH
+GEOCODE_CACHE_PATH = os.path.join(DATA_DIR, "geocode_cache.json")
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+USER_AGENT = "Air_Quality_Monitoring/1.0 (sensor location cache)"
+LOCATION_COLUMNS = ["location_id", "location_name", "sensor_id", "latitude", "longitude"]
+
+
+def location_key(location_id, name):
+    """Returns the cache key of a location: its OpenAQ ID and its name."""
+    return f"{location_id}|{name}"
+
+
+def read_locations(path=LOCATIONS_PATH):
+    """Returns one row per sensor with its location ID, name and, if saved by main.py, coordinates."""
+    df = pd.read_csv(path, usecols=lambda col: col in LOCATION_COLUMNS)
+    for col in ("latitude", "longitude"):
+        if col not in df.columns:
+            df[col] = float("nan")  # files saved before main.py kept coordinates
+    return df[LOCATION_COLUMNS]
+
+
+class GeocodeCache:
+    """Coordinates of sensor locations in a JSON file, keyed by location ID and name.
+
+    Each entry is ``{"lat", "lon", "source"}``. Addresses the geocoder could not
+    find are stored with null coordinates so they are not looked up again.
+    """
+
+    def __init__(self, path=GEOCODE_CACHE_PATH):
+        self.path = path
+        self.entries = self.read(path)
+
+    @staticmethod
+    def read(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, location_id, name):
+        return self.entries.get(location_key(location_id, name))
+
+    def set(self, location_id, name, lat, lon, source):
+        self.entries[location_key(location_id, name)] = {"lat": lat, "lon": lon, "source": source}
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+class NominatimGeocoder:
+    """Looks up free-text addresses on Nominatim, within its one request per second policy."""
+
+    def __init__(self, url=NOMINATIM_URL, user_agent=USER_AGENT, requests_per_second=1.0, timeout=10):
+        self.url = url
+        self.user_agent = user_agent
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.timeout = timeout
+
+    def geocode(self, query):
+        """Returns (lat, lon) of the best match, or None if nothing was found."""
+        self.rate_limiter.wait()
+        params = urllib.parse.urlencode({"format": "json", "limit": 1, "q": query})
+        request = urllib.request.Request(f"{self.url}?{params}", headers={"User-Agent": self.user_agent})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            results = json.load(response)
+        if not results:
+            return None
+        return float(results[0]["lat"]), float(results[0]["lon"])
+
+
+class OpenAQLocator:
+    """Looks up the coordinates of OpenAQ locations by ID, for location tables saved without them."""
+
+    def __init__(self, client=None, requests_per_second=1.0):
+        if client is None:
+            from openaq import OpenAQ
+            client = OpenAQ(api_key=API_KEY)
+        self.client = client
+        self.rate_limiter = RateLimiter(requests_per_second)
+
+    def locate(self, location_id):
+        """Returns (lat, lon) of a location, or None if OpenAQ has no coordinates for it."""
+        self.rate_limiter.wait()
+        for location in self.client.locations.get(int(location_id)).results:
+            if location.coordinates is not None:
+                return location.coordinates.latitude, location.coordinates.longitude
+        return None
+
+
+class StubGeocoder:
+    """Offline geocoder answering from a fixed {query: (lat, lon)} mapping, for tests and CI."""
+
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+        self.queries = []
+
+    def geocode(self, query):
+        self.queries.append(query)
+        return self.known.get(query)
+
+
+def resolve(locations, cache, geocoder=None, retry_missing=False, locator=None):
+    """Fills the cache for every distinct location; returns the number of updated entries.
+
+    Coordinates from the OpenAQ metadata are preferred and always refresh the
+    cache. Locations saved without them are looked up by ID on OpenAQ
+    (``locator``) and only then geocoded by name, once; without either they are
+    left out and the map shows no marker for them.
+    """
+    updated = 0
+    for row in locations.drop_duplicates(["location_id", "location_name"]).itertuples(index=False):
+        if pd.notna(row.latitude) and pd.notna(row.longitude):
+            entry = {"lat": float(row.latitude), "lon": float(row.longitude), "source": "openaq"}
+            if cache.get(row.location_id, row.location_name) != entry:
+                cache.set(row.location_id, row.location_name, **entry)
+                updated += 1
+            continue
+
+        cached = cache.get(row.location_id, row.location_name)
+        if cached is not None and (cached["lat"] is not None or not retry_missing):
+            continue
+        if locator is not None:
+            try:
+                result = locator.locate(row.location_id)
+            except Exception as e:  # the OpenAQ client raises its own error types
+                print(f"ERROR locating {row.location_id} on OpenAQ: {e}")
+                result = None
+            if result is not None:
+                cache.set(row.location_id, row.location_name, float(result[0]), float(result[1]), "openaq")
+                updated += 1
+                continue
+        if geocoder is None:
+            continue
+        try:
+            result = geocoder.geocode(row.location_name)
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            print(f"ERROR geocoding {row.location_name!r}: {e}")
+            continue
+        lat, lon = result if result is not None else (None, None)
+        cache.set(row.location_id, row.location_name, lat, lon, "nominatim")
+        updated += 1
+    return updated
+
+
+def sensor_coordinates(locations, entries):
+    """Returns {sensor_id: {"lat", "lon", "source"}} for every sensor with known coordinates.
+
+    OpenAQ coordinates in the locations table win over cached entries.
+    """
+    coordinates = {}
+    for row in locations.itertuples(index=False):
+        if pd.notna(row.latitude) and pd.notna(row.longitude):
+            entry = {"lat": float(row.latitude), "lon": float(row.longitude), "source": "openaq"}
+        else:
+            entry = entries.get(location_key(row.location_id, row.location_name))
+        if entry is not None and entry["lat"] is not None:
+            coordinates[str(row.sensor_id)] = entry
+    return coordinates
+
+
+def update_cache(offline=False, retry_missing=False, locations_path=LOCATIONS_PATH, cache_path=GEOCODE_CACHE_PATH):
+    """Resolves new locations into the cache file; returns (updated, sensors with coordinates, sensors)."""
+    locations = read_locations(locations_path)
+    cache = GeocodeCache(cache_path)
+    geocoder = None if offline else NominatimGeocoder()
+    locator = None if offline else OpenAQLocator()
+    updated = resolve(locations, cache, geocoder, retry_missing=retry_missing, locator=locator)
+    cache.save()
+    return updated, len(sensor_coordinates(locations, cache.entries)), len(locations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve sensor locations to coordinates once, for the map.")
+    parser.add_argument("--offline", action="store_true",
+                        help="only use coordinates already in the locations file, no OpenAQ or Nominatim lookups")
+    parser.add_argument("--retry-missing", action="store_true",
+                        help="look up again the locations that were not found before")
+    parser.add_argument("--locations", default=LOCATIONS_PATH)
+    parser.add_argument("--cache", default=GEOCODE_CACHE_PATH)
+    args = parser.parse_args()
+
+    updated, resolved, total = update_cache(args.offline, args.retry_missing, args.locations, args.cache)
+    print(f"Updated {updated} locations; {resolved} of {total} sensors have coordinates.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,298 @@
-from flask import Flask, render_template
+from flask import Flask, Response, render_template, request, make_response, jsonify, g, has_request_context
 import pandas as pd
+import numpy as np
 import json
+import math
+import multiprocessing
 import os
+import queue
 import glob
+import gzip
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
 from datetime import datetime
 
+import storage
+import geocoding
+from data_handling import OUTPUT_FOLDER
+from regions import ACTIVE_REGION, DATA_DIR, REGIONS_PATH, load_regions, region_dir, relocate
+from analytics import ANALYTICS_DIR, AQI_CATEGORIES, ROLLING_WINDOWS, AnalyticsStore, SensorAnalytics, aqi, aqi_category
+from tiers import AggregatePyramid, TIERS, TIERS_DIR
+from ingestion import JOURNAL_PATH, Journal
+from sensor_store import LiveSensorStore, SensorStore
+from shared_matrix import SHARED_DIR, SharedMatrix
+from spatial_index import SpatialIndex
+from metrics import RequestProfiler, process_rss_bytes, registry, timed, timer
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+class DatasetCache:
+    """Thread-safe in-memory cache of parsed files, invalidated on mtime/size change."""
+
+    def __init__(self):
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @staticmethod
+    def file_signature(path):
+        """Returns the (mtime_ns, size) pair used to detect changes to a file."""
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path, loader):
+        """Returns the cached result of loader(path), re-running it if the file changed."""
+        key = os.path.abspath(path)
+        signature = self.file_signature(path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        # Parse outside the global lock so different files can load concurrently
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == signature:
+                    self.hits += 1
+                    return entry[1]
+
+            value = loader(path)
+
+            with self._lock:
+                if key in self._entries:
+                    self.reloads += 1
+                else:
+                    self.misses += 1
+                self._entries[key] = (signature, value)
+            return value
+
+    def stats(self):
+        """Returns hit/miss/reload counters."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'reloads': self.reloads,
+                    'entries': len(self._entries)}
+
+    def clear(self):
+        """Drops all cached entries and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.reloads = 0
+
+    def discard(self, path):
+        """Drops the cached entry of one file."""
+        key = os.path.abspath(path)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._locks.pop(key, None)
+
+    def evict(self, directory):
+        """Drops the cached entries of every file below a directory."""
+        prefix = os.path.join(os.path.abspath(directory), '')
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+                self._locks.pop(key, None)
+
+
+# Shared by every DataLoader in the process so requests reuse the parsed frames
+dataset_cache = DatasetCache()
+
+# Most points a chart asks for; longer ranges are read from a coarser tier
+MAX_POINTS = 200
+
+HISTORY_SUMMARY_PATH = os.path.join(DATA_DIR, 'history_summary.json')
+
+# Regions a worker keeps loaded at once besides its default one; the least recently served is dropped first
+MAX_REGIONS = int(os.environ.get('AQ_MAX_REGIONS', 4))
+
+# Apply readings from the ingestion service and push them to browsers (AQ_LIVE=1)
+LIVE_UPDATES = os.environ.get('AQ_LIVE', '0') == '1'
+
+# Open live streams a worker serves at once; each holds a thread, further pages get 503 and poll instead
+MAX_STREAMS = int(os.environ.get('AQ_MAX_STREAMS', 2))
+
+
+class InvalidArgument(ValueError):
+    """A malformed query argument; answered with 400 and the message."""
+
+
+def date_arg(name):
+    """Returns the YYYY-MM-DD query argument ``name`` normalized, or None if it is not given."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        raise InvalidArgument(f'{name} must be a date as YYYY-MM-DD') from None
+
+
+def positive_int_arg(name, default=None):
+    """Returns the query argument ``name`` as a positive integer, or ``default`` if it is not given."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    if not value.isdigit() or int(value) < 1:
+        raise InvalidArgument(f'{name} must be a positive integer')
+    return int(value)
+
+
+def optional_signature(path):
+    """Returns the file signature of path, or None if it does not exist."""
+    return DatasetCache.file_signature(path) if os.path.exists(path) else None
+
+
+def json_values(values):
+    """Returns values rounded to one decimal, with NaN as None so the result is valid JSON."""
+    values = np.asarray(values, dtype=float)
+    return np.where(np.isnan(values), None, values.round(1)).tolist()
+
 
 class DataLoader:
     """Handles loading and preprocessing of sensor data."""
 
-    def __init__(self, pm25_path='../data/aligned_sensors_pm25_filled_knn.csv',
-                 locations_path='../data/my_sensors_with_dates.csv'):
-        self.pm25_path = pm25_path
+    def __init__(self, pm25_path=None, locations_path=geocoding.LOCATIONS_PATH, cache=None,
+                 shared_matrix=None, geocode_path=geocoding.GEOCODE_CACHE_PATH, tiers_dir=TIERS_DIR,
+                 analytics_dir=ANALYTICS_DIR, forecast_path=None, data_dir=DATA_DIR):
+        # Without explicit paths the datasets are looked up on every use, so a
+        # format change by the pipeline (e.g. CSV to Parquet) is picked up live
+        self._pm25_path = pm25_path
+        self._forecast_path = forecast_path
+        self.data_dir = data_dir
         self.locations_path = locations_path
-        self._df_pm25 = None
-        self._sensor_columns = None
+        self.geocode_path = geocode_path
+        self.cache = cache if cache is not None else dataset_cache
+        # Hourly data and its daily/weekly aggregates, once tiers.py has built them
+        self.pyramid = AggregatePyramid(tiers_dir, read_func=lambda path: self.cache.get(path, storage.read_frame))
+        # Rolling, AQI and exceedance statistics per sensor, once analytics.py has built them
+        self.analytics = AnalyticsStore(analytics_dir)
+        # When set, the PM2.5 matrix is memory-mapped so all worker processes share one copy
+        self.shared_matrix = shared_matrix
+        self._store = None
         self._sensor_locations = None
+        self._loaded_pm25_path = None
+        self._spatial_index = (None, None)  # (coordinates version, index)
+        # When set, readings from the ingestion service are applied on top of the matrix
+        self.live_feed = None
 
+    @timed('DataLoader.load_data')
     def load_data(self):
-        """Loads and preprocesses the main PM2.5 and sensor location data."""
-        self._df_pm25 = pd.read_csv(self.pm25_path, parse_dates=['datetime_from_local'])
-        self._df_pm25.set_index('datetime_from_local', inplace=True)
+        """Loads the PM2.5 matrix as a ``SensorStore`` and the sensor location names.
 
-        df_loc = pd.read_csv(self.locations_path)
-        self._sensor_locations = {str(row['sensor_id']): row['location_name']
-                                  for _, row in df_loc.iterrows()}
+        Both are served from the shared cache and only re-read when the
+        underlying file's mtime or size changes. Callers must not mutate them.
+        With a live feed the store also holds the readings ingested since.
+        """
+        self._store = self.base_store()
+        if self.live_feed is not None:
+            self._store = self.live_feed.store(self._store)
+        self._sensor_locations, _ = self.cache.get(self.locations_path, self._read_locations)
 
-        self._sensor_columns = [col for col in self._df_pm25.columns
-                                if col.startswith('sensor_')]
+        return self._store, self._sensor_locations
 
-        return self._df_pm25, self._sensor_columns, self._sensor_locations
+    @property
+    def pm25_path(self):
+        return self._pm25_path or storage.find_dataset('aligned_filled', data_dir=self.data_dir)
 
     @property
-    def df_pm25(self):
-        if self._df_pm25 is None:
-            self.load_data()
-        return self._df_pm25
+    def forecast_path(self):
+        return self._forecast_path or storage.find_dataset('forecast', data_dir=self.data_dir)
+
+    def base_store(self):
+        """Returns the store of the imputed matrix on disk, without live readings."""
+        read_pm25 = self._read_shared_pm25 if self.shared_matrix is not None else self._read_pm25
+        path = self.pm25_path
+        if self._loaded_pm25_path not in (None, path):
+            self.cache.discard(self._loaded_pm25_path)  # the matrix was rewritten in another format
+        self._loaded_pm25_path = path
+        return self.cache.get(path, read_pm25)
+
+    def cache_stats(self):
+        """Returns hit/miss/reload counters of the dataset cache."""
+        return self.cache.stats()
+
+    @timed('DataLoader.sensor_coordinates')
+    def sensor_coordinates(self):
+        """Returns {sensor_id: {lat, lon, source}} from the OpenAQ metadata and the geocode cache.
+
+        Nothing is geocoded here; ``geocoding.py`` fills the cache once, offline of requests.
+        """
+        _, locations = self.cache.get(self.locations_path, self._read_locations)
+        if os.path.exists(self.geocode_path):
+            entries = self.cache.get(self.geocode_path, geocoding.GeocodeCache.read)
+        else:
+            entries = {}
+        return geocoding.sensor_coordinates(locations, entries)
+
+    def sensor_analytics(self, sensor_id):
+        """Returns the ``SensorAnalytics`` of a sensor, or None if analytics.py has not built it."""
+        path = self.analytics.path(sensor_id)
+        if not os.path.exists(path):
+            return None
+        return self.cache.get(path, SensorAnalytics.load)
+
+    def spatial_index(self):
+        """Returns the ``SpatialIndex`` of the sensor coordinates, rebuilt only when their files change."""
+        version = (self.cache.file_signature(self.locations_path), optional_signature(self.geocode_path))
+        index_version, index = self._spatial_index
+        if index is None or index_version != version:
+            with timer('DataLoader.build_spatial_index'):
+                index = SpatialIndex(self.sensor_coordinates())
+            self._spatial_index = (version, index)
+        return index
+
+    def pyramid_for(self, col, start=None, end=None):
+        """Returns the aggregate tiers limited to start/end if they hold the sensor, else None."""
+        if not self.pyramid.has_sensor(col):
+            return None
+        return self.pyramid.bounded(start, end)
+
+    def data_version(self):
+        """Returns a token that changes whenever one of the input files changes or live readings arrive."""
+        version = (self.cache.file_signature(self.pm25_path),
+                   self.cache.file_signature(self.locations_path),
+                   optional_signature(self.geocode_path),
+                   optional_signature(self.pyramid.manifest_path))
+        if self.live_feed is None:
+            return version
+        self.live_feed.refresh()
+        return version + (self.live_feed.revision,)
+
+    @timed('DataLoader.read_shared_pm25')
+    def _read_shared_pm25(self, path):
+        return self.shared_matrix.load(path, self.cache.file_signature(path), self._read_pm25)
+
+    @staticmethod
+    @timed('DataLoader.read_pm25')
+    def _read_pm25(path):
+        return SensorStore.from_frame(storage.read_frame(path))
+
+    @staticmethod
+    @timed('DataLoader.read_locations')
+    def _read_locations(path):
+        df_loc = geocoding.read_locations(path)
+        return dict(zip(df_loc['sensor_id'].astype(str), df_loc['location_name'])), df_loc
 
     @property
-    def sensor_columns(self):
-        if self._sensor_columns is None:
+    def store(self):
+        if self._store is None:
             self.load_data()
-        return self._sensor_columns
+        return self._store
 
     @property
     def sensor_locations(self):
@@ -50,170 +301,665 @@ class DataLoader:
         return self._sensor_locations
 
 
-class DashboardDataProcessor:
-    """Processes data for the main dashboard view."""
+class PagePayload:
+    """A rendered page or JSON body with its pre-compressed variants and ETag."""
+
+    def __init__(self, version, body, compress=True, content_type='text/html; charset=utf-8'):
+        self.version = version
+        self.content_type = content_type
+        self.body = body.encode('utf-8') if isinstance(body, str) else body
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self.encoded = {}
+
+        if compress:
+            with timer('PagePayload.compress'):
+                self.encoded['gzip'] = gzip.compress(self.body, compresslevel=6)
+                if brotli is not None:
+                    self.encoded['br'] = brotli.compress(self.body)
+
+    def to_response(self):
+        """Builds a Flask response honouring If-None-Match and Accept-Encoding."""
+        if request.if_none_match.contains(self.etag):
+            response = make_response('', 304)
+        else:
+            encoding = self._choose_encoding()
+            response = make_response(self.encoded[encoding] if encoding else self.body)
+            response.headers['Content-Type'] = self.content_type
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(self.etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def _choose_encoding(self):
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encoded and request.accept_encodings[encoding]:
+                return encoding
+        return None
 
-    def __init__(self, df_pm25, sensor_columns):
-        self.df_pm25 = df_pm25
-        self.sensor_columns = sensor_columns
 
-    def get_7day_trend_data(self):
-        """Returns 7-day trend data for all sensors."""
-        df_last_7d = self.df_pm25.loc[self.df_pm25.index.max() - pd.Timedelta('7D'):].copy()
-        sensor_ids = [col.replace('sensor_', '') for col in df_last_7d.columns]
-        all_sensors_json = {col.replace('sensor_', ''): df_last_7d[col].tolist()
-                            for col in df_last_7d.columns}
-        labels_7d = df_last_7d.index.strftime('%Y-%m-%d').tolist()
+class PayloadCache:
+    """Builds a page payload once per data version and rebuilds it in the background.
+
+    Requests are always answered from the last built payload; when the data version
+    changes a background thread renders the new one, so no request pays the rebuild
+    cost except the very first one.
+    """
+
+    def __init__(self, version_func, build_func, compress=True, poll_interval=5.0):
+        self.version_func = version_func
+        self.build_func = build_func
+        self.compress = compress
+        self.poll_interval = poll_interval
+        self._payload = None
+        self._lock = threading.Lock()
+        self._building = False
+        self._stop = threading.Event()
+        self._watcher = None
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+
+    def get(self):
+        """Returns the current payload, scheduling a rebuild if the data changed."""
+        version = self.version_func()
+        payload = self._payload
+        current = payload is not None and payload.version == version
+
+        with self._lock:
+            if current:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if payload is None:
+            return self.rebuild(version)
+        if not current:
+            self._rebuild_in_background()
+        return payload
+
+    def stats(self):
+        """Returns how many requests found the payload current or outdated, and the number of builds."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'builds': self.builds}
+
+    def current(self):
+        """Returns the last built payload without checking the data version."""
+        return self._payload
+
+    def rebuild(self, version=None):
+        """Synchronously builds and stores the payload for the given data version."""
+        if version is None:
+            version = self.version_func()
+        payload = PagePayload(version, self.build_func(), compress=self.compress)
+        registry.observe('aq_payload_bytes', len(payload.body), kind='page')
+        with self._lock:
+            self._payload = payload
+            self.builds += 1
+        return payload
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._background_rebuild, daemon=True).start()
+
+    def _background_rebuild(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            print(f"ERROR rebuilding payload: {e}")
+        finally:
+            with self._lock:
+                self._building = False
+
+    def start(self):
+        """Starts a daemon thread that rebuilds the payload as soon as new data lands."""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        """Stops the watcher thread."""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                version = self.version_func()
+            except OSError:
+                continue  # file is being replaced, try again on the next tick
+            payload = self._payload
+            if payload is None or payload.version != version:
+                self._rebuild_in_background()
+
+
+class ResponseCache:
+    """Small LRU of JSON payloads keyed by request and data version."""
+
+    def __init__(self, max_entries=512, min_compress_bytes=1024):
+        self.max_entries = max_entries
+        self.min_compress_bytes = min_compress_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, build_func):
+        """Returns the payload for key at this data version, building it if needed."""
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None and payload.version == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return payload
+
+        data = build_func()
+        with timer('json.dumps'):
+            body = json.dumps(data)
+        registry.observe('aq_payload_bytes', len(body), kind='json')
+        payload = PagePayload(version, body, compress=len(body) >= self.min_compress_bytes,
+                              content_type='application/json')
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return payload
+
+    def stats(self):
+        """Returns hit/miss counters and the number of cached payloads."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+    def evict(self, prefix):
+        """Drops the payloads of every request path starting with prefix."""
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+
+def downsample_series(dates, values, max_points):
+    """Averages consecutive points into at most max_points buckets, labelled by their first date."""
+    if not max_points or len(values) <= max_points:
+        return dates, values
+    step = math.ceil(len(values) / max_points)
+    starts = np.arange(0, len(values), step)
+    sums = np.add.reduceat(np.asarray(values, dtype=float), starts)
+    counts = np.diff(np.append(starts, len(values)))
+    return [dates[i] for i in starts], np.round(sums / counts, 2).tolist()
 
-        return sensor_ids, all_sensors_json, labels_7d
 
-    def get_current_readings(self):
-        """Returns current readings for all sensors."""
-        current_readings_json = {}
-        last_row = self.df_pm25.iloc[-1]
+class DashboardDataProcessor:
+    """Processes data for the main dashboard view.
+
+    Daily values come from a ``SensorStore``. With an ``AggregatePyramid`` the
+    data comes from the hourly, daily or weekly tier that fits ``max_points``
+    for the requested range, so the cost follows the number of points shown
+    rather than the rows stored.
+    """
+
+    def __init__(self, store, pyramid=None, max_points=MAX_POINTS):
+        self.store = store
+        self.sensor_ids = store.sensor_ids
+        self.pyramid = pyramid
+        self.max_points = max_points
+
+    def _recent(self, days, tier=None, stat='mean'):
+        """Returns (index, values, tier) of the last ``days`` days, one column of values per sensor."""
+        if self.pyramid is None:
+            rows = self.store.recent(days)
+            return self.store.index(rows), self.store.values[rows], 'daily'
+        df, tier = self.pyramid.window(days, self.max_points, stat=stat, columns=self.store.columns, tier=tier)
+        return df.index, df.to_numpy(dtype=float), tier
+
+    @timed('DashboardDataProcessor.get_7day_trend_data')
+    def get_7day_trend_data(self, days=7):
+        """Returns 7-day trend data for all sensors."""
+        index, values, tier = self._recent(days)
+        all_sensors_json = dict(zip(self.sensor_ids, json_values(values.T)))
+        labels_7d = index.strftime(TIERS[tier][1]).tolist()
 
-        for col in self.sensor_columns:
-            sensor_id = col.replace('sensor_', '')
-            pm25_value = last_row[col]
+        return list(self.sensor_ids), all_sensors_json, labels_7d
 
-            current_readings_json[sensor_id] = {
-                'pm25': round(pm25_value, 1) if pd.notna(pm25_value) else None,
-                'timestamp': last_row.name.strftime('%Y-%m-%d %H:%M')
-            }
+    @timed('DashboardDataProcessor.get_trend_range')
+    def get_trend_range(self, days=7):
+        """Returns {sensor_id: {'min', 'max'}} per trend point when it aggregates several readings.
 
-        return current_readings_json
+        Only available from the daily and weekly tiers; None otherwise.
+        """
+        if self.pyramid is None:
+            return None
+        _, _, tier = self._recent(days)
+        if tier == 'hourly':
+            return None
+        _, mins, _ = self._recent(days, tier=tier, stat='min')
+        _, maxs, _ = self._recent(days, tier=tier, stat='max')
+        return {sensor_id: {'min': low, 'max': high}
+                for sensor_id, low, high in zip(self.sensor_ids, json_values(mins.T), json_values(maxs.T))}
 
-    def get_heatmap_data(self):
+    @timed('DashboardDataProcessor.get_current_readings')
+    def get_current_readings(self):
+        """Returns the latest reading of every sensor, with None for sensors that have none."""
+        valid = self.store.valid()
+        if not len(valid):
+            return {sensor_id: {'pm25': None, 'timestamp': None} for sensor_id in self.sensor_ids}
+        # Last valid row of each column, found in one pass over the reversed mask
+        last_rows = len(valid) - 1 - valid[::-1].argmax(axis=0)
+        columns = np.arange(len(self.sensor_ids))
+        values = json_values(self.store.values[last_rows, columns])
+        timestamps = self.store.index()[last_rows].strftime('%Y-%m-%d %H:%M').tolist()
+
+        return {sensor_id: {'pm25': value, 'timestamp': timestamp} if has_data
+                else {'pm25': None, 'timestamp': None}
+                for sensor_id, has_data, value, timestamp
+                in zip(self.sensor_ids, valid.any(axis=0), values, timestamps)}
+
+    @timed('DashboardDataProcessor.get_heatmap_data')
+    def get_heatmap_data(self, days=30):
         """Returns 30-day heatmap data for all sensors."""
-        df_heatmap_data = self.df_pm25.loc[self.df_pm25.index.max() - pd.Timedelta('30D'):].copy()
+        # One cell per day, whatever the resolution of the stored data
+        index, values, _ = self._recent(days, tier='daily')
 
-        time_diff = df_heatmap_data.index.date - df_heatmap_data.index.date.min()
-        df_heatmap_data['day_index'] = (time_diff.astype('timedelta64[D]')).astype(int)
-        df_heatmap_data['day_of_week'] = df_heatmap_data.index.dayofweek
+        # Per-day coordinates are shared by every sensor, so compute them once
+        days = pd.DatetimeIndex(index.date)
+        day_index = (days - days.min()).days.tolist()
+        day_of_week = index.dayofweek.tolist()
+        labels = index.strftime('%Y-%m-%d').tolist()
 
-        heatmap_matrix_data = {}
-        for col in self.sensor_columns:
-            sensor_id = col.replace('sensor_', '')
-            sensor_data = []
-            for index, row in df_heatmap_data.iterrows():
-                pm25_value = row[col]
-                if pd.notna(pm25_value):
-                    pm25_value = round(pm25_value, 1)
-                else:
-                    pm25_value = None
+        # One sensors x days matrix, rounded in bulk, with NaN mapped to None
+        cells = json_values(values.T)
 
-                sensor_data.append({
-                    'x': int(row['day_index']),
-                    'y': int(row['day_of_week']),
-                    'v': pm25_value,
-                    'd': index.strftime('%Y-%m-%d')
-                })
-            heatmap_matrix_data[sensor_id] = sensor_data
+        heatmap_matrix_data = {}
+        for sensor_id, sensor_values in zip(self.sensor_ids, cells):
+            heatmap_matrix_data[sensor_id] = [
+                {'x': x, 'y': y, 'v': v, 'd': d}
+                for x, y, v, d in zip(day_index, day_of_week, sensor_values, labels)
+            ]
 
         return heatmap_matrix_data
 
+    @timed('DashboardDataProcessor.get_historical_records')
     def get_historical_records(self):
         """Returns best/worst day records for all sensors."""
-        historical_records = {}
-        df_daily_avg = self.df_pm25.resample('D').mean()
-
-        for col in self.sensor_columns:
-            sensor_id = col.replace('sensor_', '')
-            valid_data = df_daily_avg[col].dropna()
-
-            if not valid_data.empty:
-                best_day_value = valid_data.min()
-                best_day_date = valid_data.idxmin().strftime('%Y-%m-%d')
-                worst_day_value = valid_data.max()
-                worst_day_date = valid_data.idxmax().strftime('%Y-%m-%d')
-
-                historical_records[sensor_id] = {
-                    'best_v': round(best_day_value, 1),
-                    'best_d': best_day_date,
-                    'worst_v': round(worst_day_value, 1),
-                    'worst_d': worst_day_date
-                }
-            else:
-                historical_records[sensor_id] = {
-                    'best_v': None, 'best_d': None,
-                    'worst_v': None, 'worst_d': None
-                }
+        if self.pyramid is not None:
+            df_daily_avg = self.pyramid.read('daily', 'mean', self.store.columns)
+            index, values = df_daily_avg.index, df_daily_avg.to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+        else:
+            index, values, valid = self.store.index(), self.store.values, self.store.valid()
+
+        empty_record = {'best_v': None, 'best_d': None, 'worst_v': None, 'worst_d': None}
+        if not len(index):
+            return {sensor_id: dict(empty_record) for sensor_id in self.sensor_ids}
+
+        # Column-wise reductions over the whole matrix in one pass each; missing
+        # cells never win, and sensors without any reading get an empty record
+        best_rows = np.where(valid, values, np.inf).argmin(axis=0)
+        worst_rows = np.where(valid, values, -np.inf).argmax(axis=0)
+        columns = np.arange(len(self.sensor_ids))
+        best_values = json_values(values[best_rows, columns])
+        worst_values = json_values(values[worst_rows, columns])
+        best_dates = index[best_rows].strftime('%Y-%m-%d').tolist()
+        worst_dates = index[worst_rows].strftime('%Y-%m-%d').tolist()
+
+        return {sensor_id: {'best_v': best_v, 'best_d': best_d, 'worst_v': worst_v, 'worst_d': worst_d}
+                if has_data else dict(empty_record)
+                for sensor_id, has_data, best_v, best_d, worst_v, worst_d
+                in zip(self.sensor_ids, valid.any(axis=0), best_values, best_dates, worst_values, worst_dates)}
+
+
+class LiveFeed:
+    """Applies readings from the ingestion service's journal and pushes them to browsers.
+
+    Every worker process tails the journal from the byte offset it has applied,
+    so the cost of an update follows its size. Readings go into a
+    ``LiveSensorStore`` over the matrix on disk; when the batch pipeline writes a
+    new matrix, the journal is applied again on top of it. Each batch becomes one
+    pre-serialized Server-Sent Event for all subscribed streams of the process.
+    The pipeline compacts the journal once the matrix holds its days, so
+    starting over only applies the readings that are newer than the matrix.
+    The journal is read at most once per ``poll_interval``, by requests or by
+    the open streams themselves, so no extra thread is needed.
+    """
+
+    def __init__(self, base_func, journal_path=JOURNAL_PATH, poll_interval=1.0):
+        self.base_func = base_func
+        self.journal = Journal(journal_path)
+        self.poll_interval = poll_interval
+        self.revision = 0  # journal bytes applied
+        self.readings = 0
+        self._base = None
+        self._live = None
+        self._journal_id = None
+        self._current = {}
+        self._last_poll = 0.0
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def store(self, base):
+        """Returns the store with the journal applied on top of ``base``."""
+        self.refresh(base)
+        with self._lock:
+            return self._live.snapshot() if self._live is not None else self._base
+
+    def current_readings(self):
+        """Returns the latest reading of every sensor, kept up to date batch by batch."""
+        self.refresh()
+        with self._lock:
+            return dict(self._current)
+
+    def refresh(self, base=None):
+        """Polls the journal if the last poll is older than ``poll_interval``."""
+        if (base is not None and base is not self._base) or time.monotonic() - self._last_poll >= self.poll_interval:
+            self.poll(base)
+
+    def poll(self, base=None):
+        """Applies the journal lines written since the last poll; returns the number of readings."""
+        base = base if base is not None else self.base_func()
+        with self._lock:
+            self._last_poll = time.monotonic()
+            journal_id = self.journal.identity()
+            if base is not self._base or journal_id != self._journal_id or self.journal.size() < self.revision:
+                # A new matrix on disk or a compacted or reset journal: start over from the matrix
+                self._base, self._live, self.revision, self._journal_id = base, None, 0, journal_id
+                self._current = DashboardDataProcessor(base).get_current_readings()
+            batches, self.revision = self.journal.read(self.revision)
+            readings = [(sensor_id, day, value) for batch in batches for sensor_id, day, value in batch['readings']]
+            if not readings:
+                return 0
+            if self._live is None:
+                self._live = LiveSensorStore(base)
+            days = np.array([day for _, day, _ in readings], dtype='datetime64[D]').astype(np.int64)
+            updated = self._live.apply((sensor_id, day, value)
+                                       for (sensor_id, _, value), day in zip(readings, days))
+            for sensor_id, day, value in readings:
+                latest = self._current.get(sensor_id)
+                if sensor_id in updated and (latest is None or latest['timestamp'] is None
+                                             or day >= latest['timestamp'][:10]):
+                    self._current[sensor_id] = {'pm25': round(value, 1), 'timestamp': f'{day} 00:00'}
+            self.readings += len(readings)
+            event = json.dumps({'revision': self.revision, 'updated': sorted(updated),
+                                'current': {sensor_id: self._current[sensor_id] for sensor_id in updated}})
+            registry.inc('aq_live_readings_total', len(readings))
+        self._publish(f'id: {self.revision}\nevent: readings\ndata: {event}\n\n')
+        return len(readings)
+
+    def subscribe(self):
+        subscription = queue.Queue(maxsize=100)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
 
-        return historical_records
+    def _publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(event)
+            except queue.Full:
+                pass  # a stalled client; it reloads the selected sensor on its next event
+
+    def stream(self, subscription, keep_alive=15.0):
+        """Yields Server-Sent Events for one subscriber, polling the journal while idle."""
+        try:
+            yield f'retry: 5000\nid: {self.revision}\n\n'
+            idle_since = time.monotonic()
+            while True:
+                try:
+                    yield subscription.get(timeout=self.poll_interval)
+                    idle_since = time.monotonic()
+                except queue.Empty:
+                    self.refresh()
+                    if time.monotonic() - idle_since >= keep_alive:
+                        yield ': keep-alive\n\n'
+                        idle_since = time.monotonic()
+        finally:
+            self.unsubscribe(subscription)
+
+
+class HistorySummaryStore:
+    """Persistent per-file summaries keyed by file path, mtime and size."""
+
+    def __init__(self, store_path=HISTORY_SUMMARY_PATH):
+        self.store_path = store_path
+        self._lock = threading.Lock()
+        self._entries = self._read()
+
+    def _read(self):
+        try:
+            with open(self.store_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def lookup(self, file_path, signature):
+        """Returns the stored summary for file_path if it matches the signature."""
+        entry = self._entries.get(file_path)
+        if entry is not None and tuple(entry['signature']) == tuple(signature):
+            return entry['summary']
+        return None
+
+    def update(self, summaries, keep_paths=None):
+        """Stores new summaries, forgets files not in keep_paths (if given) and saves to disk."""
+        with self._lock:
+            changed = False
+            for file_path in list(self._entries):
+                if keep_paths is not None and file_path not in keep_paths:
+                    del self._entries[file_path]
+                    changed = True
+            for file_path, (signature, summary) in summaries.items():
+                self._entries[file_path] = {'signature': list(signature), 'summary': summary}
+                changed = True
+            if changed:
+                self._save()
+
+    def _save(self):
+        # Write to a temporary file first so a crash never leaves a truncated store
+        tmp_path = f"{self.store_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.store_path)
+
+
+def summarize_sensor_file(file_path):
+    """Parses one sensor CSV and returns (stats, time_series); runs in worker processes."""
+    return HistoryDataProcessor._process_single_sensor(file_path)
 
 
 class HistoryDataProcessor:
-    """Processes individual sensor CSV files for historical analysis."""
+    """Processes individual sensor CSV files for historical analysis.
+
+    Summaries are kept in a HistorySummaryStore, so only files that are new or whose
+    mtime/size changed are parsed again, spread over a pool of worker processes.
+    The pool is started with ``spawn``, never ``fork``: the callers are threads
+    of a process that may hold locks or TensorFlow state. Concurrent callers
+    missing the same file share one parse, and failed parses are not stored.
+    """
 
-    def __init__(self, data_folder='../data/daily_data'):
+    def __init__(self, data_folder=OUTPUT_FOLDER, store=None, max_workers=None):
         self.data_folder = data_folder
+        self.store = store if store is not None else HistorySummaryStore()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = None
+        self._lock = threading.Lock()
+        self._parsing = {}  # file_path -> (signature, Future) of parses in progress
 
+    @timed('HistoryDataProcessor.process_sensor_files')
     def process_sensor_files(self):
         """Processes all sensor CSV files and returns statistics and time series data."""
         sensor_files = glob.glob(os.path.join(self.data_folder, 'sensor_*.csv'))
 
+        summaries = {}
+        pending = {}
+        for file_path in sensor_files:
+            signature = DatasetCache.file_signature(file_path)
+            summary = self.store.lookup(file_path, signature)
+            if summary is None:
+                pending[file_path] = signature
+            else:
+                summaries[file_path] = summary
+        summaries.update(self._summarize(pending))
+        self.store.update({}, keep_paths=set(sensor_files))
+
         sensor_stats = {}
         sensor_data_json = {}
-
-        print(f"\n--- Starting Sensor File Processing ---")
-        print(f"Found {len(sensor_files)} sensor files to process.")
-
         for file_path in sensor_files:
-            filename = os.path.basename(file_path)
-            sensor_id = filename.replace('sensor_', '').replace('.csv', '')
+            stats, time_series = summaries[file_path]
+            if stats:
+                sensor_id = os.path.basename(file_path).replace('sensor_', '').replace('.csv', '')
+                sensor_stats[sensor_id] = stats
+                sensor_data_json[sensor_id] = time_series
 
-            try:
-                stats, time_series = self._process_single_sensor(file_path, sensor_id)
+        return sorted(sensor_stats.keys()), sensor_stats, sensor_data_json
 
-                if stats:
-                    sensor_stats[sensor_id] = stats
-                    sensor_data_json[sensor_id] = time_series
-                    print(f"SUCCESS: Sensor {sensor_id} processed. Data points: {stats['count']}")
+    def sensor_path(self, sensor_id):
+        return os.path.join(self.data_folder, f'sensor_{sensor_id}.csv')
+
+    @timed('HistoryDataProcessor.available_sensors')
+    def available_sensors(self):
+        """Returns the IDs of sensor files holding at least one row, without parsing them."""
+        sensor_ids = []
+        for file_path in glob.glob(os.path.join(self.data_folder, 'sensor_*.csv')):
+            with open(file_path) as f:
+                f.readline()
+                if f.readline().strip():
+                    sensor_ids.append(os.path.basename(file_path).replace('sensor_', '').replace('.csv', ''))
+        return sorted(sensor_ids)
+
+    @timed('HistoryDataProcessor.process_sensor')
+    def process_sensor(self, sensor_id):
+        """Returns (stats, time_series) for one sensor, reusing the stored summary if current."""
+        file_path = self.sensor_path(sensor_id)
+        signature = DatasetCache.file_signature(file_path)
+        summary = self.store.lookup(file_path, signature)
+        if summary is None:
+            summary = self._summarize({file_path: signature})[file_path]
+        return summary
+
+    def close(self):
+        """Stops the worker pool, if one was started."""
+        self._discard_pool(wait=True)
+
+    def _discard_pool(self, wait=False):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def _summarize(self, pending):
+        """Returns {file_path: (stats, time_series)} for the files of ``pending`` ({file_path: signature}).
+
+        Files another thread is already parsing at the same signature are
+        waited for instead of parsed again. Successful parses go to the store.
+        """
+        owned, waiting = {}, {}
+        with self._lock:
+            for file_path, signature in pending.items():
+                running = self._parsing.get(file_path)
+                if running is not None and running[0] == signature:
+                    waiting[file_path] = running[1]
+                else:
+                    owned[file_path] = Future()
+                    self._parsing[file_path] = (signature, owned[file_path])
 
+        summaries, parsed = {}, {}
+        try:
+            for file_path, summary in self._parse_files(list(owned)):
+                if summary is not None:
+                    parsed[file_path] = (pending[file_path], summary)
+                summaries[file_path] = summary or (None, None)
+            self.store.update(parsed)
+        finally:
+            with self._lock:
+                for file_path, future in owned.items():
+                    future.set_result(summaries.get(file_path, (None, None)))
+                    if self._parsing.get(file_path, (None, None))[1] is future:
+                        del self._parsing[file_path]
+
+        for file_path, future in waiting.items():
+            summaries[file_path] = future.result()
+        return summaries
+
+    def _parse_files(self, file_paths):
+        """Yields (file_path, (stats, time_series)) for each file, or (file_path, None) if parsing failed."""
+        if self.max_workers <= 1 or len(file_paths) < 2:
+            for file_path in file_paths:
+                yield file_path, self._safe_summarize(file_path)
+            return
+
+        futures = {self._worker_pool().submit(summarize_sensor_file, file_path): file_path
+                   for file_path in file_paths}
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                yield file_path, future.result()
+            except BrokenProcessPool as e:
+                print(f"ERROR processing {file_path}: {e}")
+                self._discard_pool()  # a worker died; start a new pool next time
+                yield file_path, None
             except Exception as e:
                 print(f"ERROR processing {file_path}: {e}")
-                continue
+                yield file_path, None
 
-        print(f"\n--- Processing Complete ---")
-        print(f"Sensor IDs successfully loaded: {sorted(sensor_stats.keys())}")
+    def _worker_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
 
-        return sorted(sensor_stats.keys()), sensor_stats, sensor_data_json
+    @staticmethod
+    def _safe_summarize(file_path):
+        try:
+            return summarize_sensor_file(file_path)
+        except Exception as e:
+            print(f"ERROR processing {file_path}: {e}")
+            return None
 
-    def _process_single_sensor(self, file_path, sensor_id):
+    @classmethod
+    def _process_single_sensor(cls, file_path):
         """Processes a single sensor CSV file."""
-        # Read CSV with datetime parsing
-        df = pd.read_csv(file_path,
-                         parse_dates=['datetime'] if 'datetime' in pd.read_csv(file_path, nrows=0).columns else [0])
-
-        print(f"\nProcessing: {os.path.basename(file_path)}")
-        print(f"Columns: {list(df.columns)}")
+        df = pd.read_csv(file_path)
 
         # Identify PM2.5 column
-        pm25_col = self._identify_pm25_column(df)
+        pm25_col = cls._identify_pm25_column(df)
 
         if not pm25_col:
-            print(f"WARN: Could not identify PM2.5 column for sensor {sensor_id}")
             return None, None
 
-        print(f"Identified PM2.5 Column: '{pm25_col}'")
-
         # Convert to numeric and clean data
         df[pm25_col] = pd.to_numeric(df[pm25_col], errors='coerce')
         pm25_data = df[pm25_col].dropna()
 
         if pm25_data.empty:
-            print(f"WARN: Sensor {sensor_id} skipped - empty after cleaning")
             return None, None
 
         # Calculate statistics
-        stats = self._calculate_statistics(pm25_data)
+        stats = cls._calculate_statistics(pm25_data)
 
         # Prepare time series data
-        time_series = self._prepare_time_series(df, pm25_col)
+        time_series = cls._prepare_time_series(df, pm25_col)
 
         return stats, time_series
 
-    def _identify_pm25_column(self, df):
+    @staticmethod
+    def _identify_pm25_column(df):
         """Identifies the PM2.5 column in the dataframe."""
         if 'value' in df.columns:
             return 'value'
@@ -225,7 +971,8 @@ class HistoryDataProcessor:
             return df.columns[1]
         return None
 
-    def _calculate_statistics(self, pm25_data):
+    @staticmethod
+    def _calculate_statistics(pm25_data):
         """Calculates statistical measures for PM2.5 data."""
         return {
             'mean': round(pm25_data.mean(), 2),
@@ -239,7 +986,8 @@ class HistoryDataProcessor:
             'count': int(len(pm25_data))
         }
 
-    def _prepare_time_series(self, df, pm25_col):
+    @staticmethod
+    def _prepare_time_series(df, pm25_col):
         """Prepares time series data for visualization."""
         if len(df.columns) == 0:
             return None
@@ -257,113 +1005,629 @@ class HistoryDataProcessor:
 class ForecastDataProcessor:
     """Processes forecast data for the forecast dashboard."""
 
-    def __init__(self, df_pm25, sensor_columns, forecast_path='../data/new_forecast.csv'):
-        self.df_pm25 = df_pm25
-        self.sensor_columns = sensor_columns
-        self.forecast_path = forecast_path
+    def __init__(self, store, forecast_path=None, pyramid=None, max_points=MAX_POINTS):
+        self.store = store
+        self.forecast_path = forecast_path or storage.find_dataset('forecast')
+        # Aggregate tiers for the actual values, see DashboardDataProcessor
+        self.pyramid = pyramid
+        self.max_points = max_points
 
+    @timed('ForecastDataProcessor.get_forecast_data')
     def get_forecast_data(self, n_actual_days=7):
         """Returns actual and forecast data for all sensors."""
-        try:
-            df_forecast = pd.read_csv(self.forecast_path, index_col=0, parse_dates=True)
-        except FileNotFoundError:
-            df_forecast = pd.DataFrame(columns=self.df_pm25.columns)
+        sensor_ids = list(self.store.sensor_ids)
+        df_forecast = self._read_forecast(self.store.columns)
+        actual_labels, actual_values = self._actual_window(n_actual_days, sensor_ids)
 
-        df_actual_compare = self.df_pm25.loc[
-                            self.df_pm25.index.max() - pd.Timedelta(f'{n_actual_days}D'):
-                            ].copy()
+        forecast_data_json = {sensor_id: self._sensor_forecast(sensor_id, actual_labels, values, df_forecast)
+                              for sensor_id, values in zip(sensor_ids, json_values(actual_values.T))}
 
-        forecast_data_json = {}
+        return sensor_ids, forecast_data_json
 
-        for col in self.sensor_columns:
-            sensor_id = col.replace('sensor_', '')
+    @timed('ForecastDataProcessor.get_sensor_forecast')
+    def get_sensor_forecast(self, sensor_id, n_actual_days=7):
+        """Returns actual and forecast data for one sensor, reading only its forecast column."""
+        actual_labels, actual_values = self._actual_window(n_actual_days, [sensor_id])
+        return self._sensor_forecast(sensor_id, actual_labels, json_values(actual_values[:, 0]),
+                                     self._read_forecast([f'sensor_{sensor_id}']))
 
-            actual_values = df_actual_compare[col].round(1).tolist()
-            actual_labels = df_actual_compare.index.strftime('%m-%d').tolist()
+    def _read_forecast(self, columns):
+        try:
+            return storage.read_frame(self.forecast_path, columns=columns)
+        except FileNotFoundError:
+            return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([]))
+
+    def _actual_window(self, n_actual_days, sensor_ids):
+        """Returns the labels and the (time x sensors) values of the recent actual readings."""
+        if self.pyramid is None:
+            rows = self.store.recent(n_actual_days)
+            positions = [self.store.position(sensor_id) for sensor_id in sensor_ids]
+            return self.store.labels(rows, '%m-%d'), self.store.values[rows][:, positions]
+        df_actual, tier = self.pyramid.window(n_actual_days, self.max_points,
+                                              columns=[f'sensor_{sensor_id}' for sensor_id in sensor_ids])
+        label_format = '%m-%d %H:%M' if tier == 'hourly' else '%m-%d'
+        return df_actual.index.strftime(label_format).tolist(), df_actual.to_numpy(dtype=float)
+
+    @staticmethod
+    def _sensor_forecast(sensor_id, actual_labels, actual_values, df_forecast):
+        col = f'sensor_{sensor_id}'
+        if col in df_forecast.columns:
+            future_values = df_forecast[col].round(1).tolist()
+            future_labels = df_forecast.index.strftime('%m-%d').tolist()
+        else:
+            future_values = []
+            future_labels = []
 
-            if col in df_forecast.columns:
-                future_values = df_forecast[col].round(1).tolist()
-                future_labels = df_forecast.index.strftime('%m-%d').tolist()
-            else:
-                future_values = []
-                future_labels = []
-
-            forecast_data_json[sensor_id] = {
-                'actual_values': actual_values,
-                'actual_labels': actual_labels,
-                'future_values': future_values,
-                'future_labels': future_labels
-            }
+        return {
+            'actual_values': actual_values,
+            'actual_labels': actual_labels,
+            'future_values': future_values,
+            'future_labels': future_labels
+        }
 
-        sensor_ids = [col.replace('sensor_', '') for col in self.sensor_columns]
 
-        return sensor_ids, forecast_data_json
+class RegionContext:
+    """Everything a worker keeps for one region: data loader, history processor, live feed and dashboard page.
+
+    The paths are the module defaults moved to the region's data directory,
+    so regions share no files and loading one never reads another's data.
+    """
+
+    def __init__(self, name, render_func, shared_data=False, live=False):
+        self.name = name
+        self.directory = region_dir(name)
+        self.data_loader = DataLoader(data_dir=self.directory,
+                                      locations_path=relocate(geocoding.LOCATIONS_PATH, name),
+                                      geocode_path=relocate(geocoding.GEOCODE_CACHE_PATH, name),
+                                      tiers_dir=relocate(TIERS_DIR, name),
+                                      analytics_dir=relocate(ANALYTICS_DIR, name),
+                                      shared_matrix=SharedMatrix(relocate(SHARED_DIR, name)) if shared_data else None)
+        self.live_feed = LiveFeed(self.data_loader.base_store, relocate(JOURNAL_PATH, name)) if live else None
+        self.data_loader.live_feed = self.live_feed
+        self.history_processor = HistoryDataProcessor(relocate(OUTPUT_FOLDER, name),
+                                                      HistorySummaryStore(relocate(HISTORY_SUMMARY_PATH, name)))
+        # The page also lists the other regions, so it is rebuilt when they change
+        self.dashboard_payload = PayloadCache(self.page_version, lambda: render_func(self))
+        # (data version, latest reading per sensor, spatial index of the sensors with one)
+        self.readings_index = (None, None, None)
+
+    def page_version(self):
+        return self.data_loader.data_version(), optional_signature(REGIONS_PATH)
+
+    def close(self):
+        """Stops the dashboard watcher and drops the region's parsed files from the shared cache."""
+        self.dashboard_payload.stop()
+        self.history_processor.close()
+        self.data_loader.cache.evict(self.directory)
 
 
 class AirQualityApp:
-    """Main application class that orchestrates the Flask app and data processors."""
+    """Main application class that orchestrates the Flask app and data processors.
 
-    def __init__(self):
+    Every route is also served under ``/regions/<region>``. A region's data is
+    loaded on its first request, and beyond ``max_regions`` the least recently
+    served region is dropped again, so memory follows the regions in use.
+    """
+
+    def __init__(self, shared_data=False, live=LIVE_UPDATES, max_regions=MAX_REGIONS, max_streams=MAX_STREAMS):
         self.app = Flask(__name__, template_folder="templates")
-        self.data_loader = DataLoader()
+        self.shared_data = shared_data
+        self.live = live
+        self._stream_slots = threading.BoundedSemaphore(max_streams) if max_streams > 0 else None
+        self.default_region = ACTIVE_REGION
+        self.max_regions = max_regions
+        self._regions = OrderedDict()  # name -> RegionContext, least recently served first
+        self._regions_lock = threading.Lock()
+        self._watching = False
+        self.api_cache = ResponseCache()
+        self.profiler = RequestProfiler()
         self._setup_routes()
+        self._setup_metrics()
+
+    def region(self, name=None):
+        """Returns the context of a region, by default the one of the current request, loading it if needed."""
+        if name is None:
+            name = g.get('region', self.default_region) if has_request_context() else self.default_region
+        with self._regions_lock:
+            context = self._regions.get(name)
+            if context is not None:
+                self._regions.move_to_end(name)
+                return context
+            context = RegionContext(name, self._render_dashboard, self.shared_data, self.live)
+            self._regions[name] = context
+            evicted = []
+            while len(self._regions) > self.max_regions + 1:
+                candidates = [other for other in self._regions if other not in (self.default_region, name)]
+                if not candidates:
+                    break
+                evicted.append(self._regions.pop(candidates[0]))
+        if self._watching:
+            context.dashboard_payload.start()
+        for old in evicted:
+            old.close()
+            self.api_cache.evict(self._url_root(old.name) + '/')
+        return context
+
+    def regions(self):
+        """Returns the configured regions, re-read when regions.json changes."""
+        if not os.path.exists(REGIONS_PATH):
+            return load_regions()
+        return dataset_cache.get(REGIONS_PATH, load_regions)
 
-    def _setup_routes(self):
-        """Sets up Flask routes."""
-        self.app.route('/')(self.dashboard)
-        self.app.route('/history')(self.history_dashboard)
-        self.app.route('/forecast')(self.forecast_dashboard)
+    @property
+    def data_loader(self):
+        return self.region().data_loader
 
-    def dashboard(self):
-        """Renders the main dashboard page."""
-        df_pm25, sensor_columns, sensor_locations_json = self.data_loader.load_data()
+    @property
+    def live_feed(self):
+        return self.region().live_feed
 
-        processor = DashboardDataProcessor(df_pm25, sensor_columns)
+    @property
+    def history_processor(self):
+        return self.region().history_processor
 
-        sensor_ids, all_sensors_json, labels_7d = processor.get_7day_trend_data()
-        current_readings_json = processor.get_current_readings()
-        heatmap_matrix_data = processor.get_heatmap_data()
-        historical_records = processor.get_historical_records()
+    @property
+    def dashboard_payload(self):
+        return self.region().dashboard_payload
+
+    def start_watching(self):
+        """Rebuilds the dashboard page of every loaded region in the background when its data changes."""
+        self._watching = True
+        self.region(self.default_region)
+        with self._regions_lock:
+            contexts = list(self._regions.values())
+        for context in contexts:
+            context.dashboard_payload.start()
+
+    def _url_root(self, name):
+        return '' if name == self.default_region else f'/regions/{name}'
+
+    def _page_context(self, context):
+        """Returns the template variables naming the region of a page and linking to the others."""
+        regions = self.regions()
+        config = regions.get(context.name, {})
+        return {'region': context.name,
+                'region_label': config.get('label', context.name),
+                'region_bbox': config.get('bbox'),
+                'url_root': self._url_root(context.name),
+                'regions': [{'name': name, 'label': config['label'], 'url': self._url_root(name) + '/'}
+                            for name, config in sorted(regions.items())]}
 
-        return render_template('home.html',
-                               sensor_ids=sensor_ids,
-                               all_sensors_json=json.dumps(all_sensors_json),
-                               labels_7d=json.dumps(labels_7d),
-                               current_readings_json=json.dumps(current_readings_json),
-                               historical_records_json=json.dumps(historical_records),
-                               heatmap_matrix_data=json.dumps(heatmap_matrix_data),
-                               sensor_locations_json=json.dumps(sensor_locations_json))
+    def _setup_routes(self):
+        """Sets up Flask routes; the per-region ones are served for the default region and under /regions/<region>."""
+        self.app.register_error_handler(InvalidArgument, lambda error: (jsonify({'error': str(error)}), 400))
+        self.app.route('/metrics')(self.metrics)
+        self.app.route('/api/regions')(self.api_regions)
+        for rule, view in (('/', self.dashboard),
+                           ('/history', self.history_dashboard),
+                           ('/forecast', self.forecast_dashboard),
+                           ('/health', self.health),
+                           ('/api/sensors', self.api_sensors),
+                           ('/api/current', self.api_current),
+                           ('/api/sensors/nearest', self.api_sensors_nearest),
+                           ('/api/sensors/within', self.api_sensors_within),
+                           ('/api/estimate', self.api_estimate),
+                           ('/api/stream', self.api_stream),
+                           ('/api/sensors/<sensor_id>/trend', self.api_sensor_trend),
+                           ('/api/sensors/<sensor_id>/heatmap', self.api_sensor_heatmap),
+                           ('/api/sensors/<sensor_id>/records', self.api_sensor_records),
+                           ('/api/sensors/<sensor_id>/history', self.api_sensor_history),
+                           ('/api/sensors/<sensor_id>/analytics', self.api_sensor_analytics),
+                           ('/api/sensors/<sensor_id>/forecast', self.api_sensor_forecast)):
+            self.app.route(rule)(view)
+            self.app.route(f'/regions/<region>{rule}', endpoint=f'region_{view.__name__}')(view)
+        self.app.url_value_preprocessor(self._pull_region)
+
+    def _pull_region(self, endpoint, values):
+        # The views read the region from g instead of taking it as an argument
+        g.region = values.pop('region', self.default_region) if values else self.default_region
+
+    def _setup_metrics(self):
+        """Times every request and registers the cache and memory gauges read at scrape time."""
+        self.app.before_request(self._start_request)
+        self.app.after_request(self._finish_request)
+
+        def cache_stat(name, ratio=False):
+            def collect():
+                series = {}
+                for cache, stats in (('dataset', self.data_loader.cache_stats()),
+                                     ('api', self.api_cache.stats()),
+                                     ('dashboard_payload', self._payload_stats())):
+                    if ratio:
+                        total = stats['hits'] + stats['misses'] + stats.get('reloads', 0)
+                        series[(('cache', cache),)] = stats['hits'] / total if total else None
+                    elif name in stats:
+                        series[(('cache', cache),)] = stats[name]
+                return series
+            return collect
+
+        registry.callback('aq_cache_hits_total', 'counter', 'Cache lookups answered from memory.', cache_stat('hits'))
+        registry.callback('aq_cache_misses_total', 'counter', 'Cache lookups that did not find the current version.',
+                          cache_stat('misses'))
+        registry.callback('aq_cache_hit_ratio', 'gauge', 'Share of cache lookups answered from memory.',
+                          cache_stat('hits', ratio=True))
+        registry.callback('aq_cache_entries', 'gauge', 'Entries held by each cache.', cache_stat('entries'))
+        registry.callback('aq_dashboard_payload_builds_total', 'counter', 'Renders of the dashboard page.',
+                          lambda: {(): self._payload_stats()['builds']})
+        registry.callback('aq_regions_loaded', 'gauge', 'Regions whose data this worker holds.',
+                          lambda: {(): len(self._regions)})
+        registry.callback('aq_process_resident_memory_bytes', 'gauge', 'Resident memory of this worker process.',
+                          lambda: {(): process_rss_bytes()})
+        if self.live:
+            registry.callback('aq_live_subscribers', 'gauge', 'Open live update streams of this worker.',
+                              lambda: {(): sum(context.live_feed.subscribers for context in self._loaded_regions())})
+
+    def _loaded_regions(self):
+        with self._regions_lock:
+            return list(self._regions.values())
+
+    def _payload_stats(self):
+        """Returns the dashboard payload counters summed over the loaded regions."""
+        totals = {'hits': 0, 'misses': 0, 'builds': 0}
+        for context in self._loaded_regions():
+            for name, value in context.dashboard_payload.stats().items():
+                totals[name] += value
+        return totals
+
+    def _start_request(self):
+        g.request_start = time.perf_counter()
+        if self.profiler.wants(request):
+            g.profile = self.profiler.start()
+        if g.get('region', self.default_region) not in self.regions():
+            return jsonify({'error': f"Unknown region {g.region}, add it with regions.py --add"}), 404
+
+    def _finish_request(self, response):
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        if 'profile' in g:
+            response.headers['X-Profile-File'] = os.path.basename(self.profiler.stop(g.pop('profile'), request))
+        if 'request_start' in g:
+            registry.observe('aq_request_seconds', time.perf_counter() - g.request_start, endpoint=endpoint)
+        registry.inc('aq_requests_total', endpoint=endpoint, status=response.status_code)
+        if response.content_length is not None:
+            registry.observe('aq_response_bytes', response.content_length, endpoint=endpoint)
+        return response
+
+    def _render_template(self, name, **context):
+        with timer(f'render_template:{name}'):
+            return render_template(name, **context)
+
+    def dashboard(self):
+        """Serves the main dashboard page from the precomputed payload."""
+        return self.dashboard_payload.get().to_response()
+
+    def _render_dashboard(self, context):
+        """Renders the main dashboard page of a region; per-sensor data is fetched from the API."""
+        store, sensor_locations_json = context.data_loader.load_data()
+        sensor_ids = store.sensor_ids
+
+        # Background rebuilds run outside any request, so push an app context
+        with self.app.app_context():
+            return self._render_template('home.html',
+                                         sensor_ids=sensor_ids,
+                                         sensor_locations_json=json.dumps(sensor_locations_json),
+                                         sensor_coordinates_json=json.dumps(context.data_loader.sensor_coordinates()),
+                                         live_updates=context.live_feed is not None,
+                                         **self._page_context(context))
 
     def history_dashboard(self):
         """Renders the sensor history dashboard."""
-        _, _, sensor_locations_json = self.data_loader.load_data()
-
-        processor = HistoryDataProcessor()
-        sensor_ids, sensor_stats, sensor_data_json = processor.process_sensor_files()
+        _, sensor_locations_json = self.data_loader.load_data()
 
-        return render_template('history.html',
-                               sensor_ids=sensor_ids,
-                               sensor_stats_json=json.dumps(sensor_stats),
-                               sensor_data_json=json.dumps(sensor_data_json),
-                               sensor_locations_json=json.dumps(sensor_locations_json))
+        return self._render_template('history.html',
+                                     sensor_ids=self.history_processor.available_sensors(),
+                                     sensor_locations_json=json.dumps(sensor_locations_json),
+                                     **self._page_context(self.region()))
 
     def forecast_dashboard(self):
         """Renders the forecast dashboard page."""
-        df_pm25, sensor_columns, sensor_locations_json = self.data_loader.load_data()
+        store, sensor_locations_json = self.data_loader.load_data()
 
-        processor = ForecastDataProcessor(df_pm25, sensor_columns)
-        sensor_ids, forecast_data_json = processor.get_forecast_data()
+        return self._render_template('forecast.html',
+                                     sensor_ids=store.sensor_ids,
+                                     sensor_locations_json=json.dumps(sensor_locations_json),
+                                     **self._page_context(self.region()))
 
-        return render_template('forecast.html',
-                               sensor_ids=sensor_ids,
-                               forecast_data_json=json.dumps(forecast_data_json),
-                               sensor_locations_json=json.dumps(sensor_locations_json))
+    def health(self):
+        """Reports whether the data can be loaded, its version and cache counters."""
+        try:
+            store, _ = self.data_loader.load_data()
+        except Exception as e:
+            return jsonify({'status': 'error', 'error': str(e), 'pid': os.getpid()}), 503
+
+        payload = self.dashboard_payload.current()
+        return jsonify({
+            'status': 'ok',
+            'pid': os.getpid(),
+            'region': self.region().name,
+            'regions_loaded': [context.name for context in self._loaded_regions()],
+            'data_version': [list(signature) if isinstance(signature, tuple) else signature
+                             for signature in self.data_loader.data_version()],
+            'last_date': store.index()[-1].isoformat() if len(store) else None,
+            'days': len(store),
+            'sensors': len(store.sensor_ids),
+            'sensors_with_coordinates': len(self.data_loader.spatial_index()),
+            'matrix_bytes': store.nbytes,
+            'dashboard_payload_current': payload is not None
+                                         and payload.version == self.dashboard_payload.version_func(),
+            'cache': self.data_loader.cache_stats()
+        })
+
+    def metrics(self):
+        """Exposes request timings, operation timings, payload sizes, cache counters and RSS for Prometheus."""
+        response = make_response(registry.render())
+        response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        return response
+
+    def api_regions(self):
+        """Lists the configured regions with their bounding boxes."""
+        regions = self.regions()
+
+        def build():
+            result = [{'name': name, 'label': regions[name]['label'], 'bbox': regions[name]['bbox'],
+                       'url': self._url_root(name) + '/'} for name in sorted(regions)]
+            return {'default': self.default_region, 'regions': result}
+
+        return self._json_response((optional_signature(REGIONS_PATH),), build)
+
+    def api_sensors(self):
+        """Returns the sensor IDs, their location names and known coordinates."""
+        store, sensor_locations = self.data_loader.load_data()
+        return self._json_response(self.data_loader.data_version(), lambda: {
+            'sensor_ids': store.sensor_ids,
+            'locations': sensor_locations,
+            'coordinates': self.data_loader.sensor_coordinates()
+        })
+
+    def api_current(self):
+        """Returns the latest reading of every sensor."""
+        if self.live_feed is not None:
+            return jsonify(self.live_feed.current_readings())
+        store, _ = self.data_loader.load_data()
+        return self._json_response(self.data_loader.data_version(),
+                                   lambda: DashboardDataProcessor(store).get_current_readings())
+
+    def api_sensors_nearest(self):
+        """Returns the ``k`` sensors nearest to ``lat``/``lon`` (default 5), optionally within ``max_km``."""
+        point = self._query_point()
+        if point is None:
+            return jsonify({'error': 'lat and lon are required, in degrees'}), 400
+        k = min(max(request.args.get('k', 5, type=int), 1), 100)
+        max_km = request.args.get('max_km', type=float)
+        if not len(self.data_loader.spatial_index()):
+            return self._no_coordinates()
+        version, readings, _ = self._latest_readings()
+
+        def build():
+            neighbours = self.data_loader.spatial_index().nearest(*point, k=k, max_km=max_km)
+            return {'sensors': [dict(self._sensor_entry(sensor_id, readings), distance_km=round(km, 3))
+                                for sensor_id, km in neighbours]}
+
+        return self._json_response(version, build)
+
+    def api_sensors_within(self):
+        """Returns the sensors inside the ``south``/``west``/``north``/``east`` bounding box of a map view."""
+        bounds = [request.args.get(name, type=float) for name in ('south', 'west', 'north', 'east')]
+        if None in bounds or not (-90 <= bounds[0] <= bounds[2] <= 90) \
+                or not all(-180 <= lon <= 180 for lon in bounds[1::2]):
+            return jsonify({'error': 'south, west, north and east are required, in degrees'}), 400
+        if not len(self.data_loader.spatial_index()):
+            return self._no_coordinates()
+        version, readings, _ = self._latest_readings()
+        return self._json_response(version, lambda: {
+            'sensors': [self._sensor_entry(sensor_id, readings)
+                        for sensor_id in self.data_loader.spatial_index().within(*bounds)]
+        })
+
+    def api_estimate(self):
+        """Estimates PM2.5 at ``lat``/``lon`` by inverse-distance weighting of the latest readings.
+
+        ``k`` (default 8) nearest sensors with a reading are used, optionally
+        only within ``max_km``; ``power`` (default 2) sets how fast weights fall off.
+        """
+        point = self._query_point()
+        if point is None:
+            return jsonify({'error': 'lat and lon are required, in degrees'}), 400
+        k = min(max(request.args.get('k', 8, type=int), 1), 100)
+        power = request.args.get('power', 2.0, type=float)
+        max_km = request.args.get('max_km', type=float)
+        if not len(self.data_loader.spatial_index()):
+            return self._no_coordinates()
+        version, readings, index = self._latest_readings()
+
+        def build():
+            estimate, neighbours = index.idw(*point, readings, k=k, power=power, max_km=max_km)
+            return {'lat': point[0], 'lon': point[1],
+                    'pm25': None if estimate is None else round(estimate, 1),
+                    'sensors': [{'sensor_id': sensor_id, 'distance_km': round(km, 3), 'pm25': value,
+                                 'weight': round(weight, 4)} for sensor_id, km, value, weight in neighbours]}
+
+        return self._json_response(version, build)
+
+    @staticmethod
+    def _no_coordinates():
+        """Answers spatial queries while no sensor has coordinates, rather than with an empty result."""
+        return jsonify({'error': 'no sensor has coordinates yet; run geocoding.py to resolve them'}), 503
+
+    @staticmethod
+    def _query_point():
+        """Returns the (lat, lon) query arguments, or None if missing or out of range."""
+        lat, lon = request.args.get('lat', type=float), request.args.get('lon', type=float)
+        if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return None
+        return lat, lon
+
+    def _latest_readings(self):
+        """Returns (data version, {sensor_id: latest PM2.5}, spatial index of those sensors), once per version."""
+        context = self.region()
+        version = context.data_loader.data_version()
+        cached_version, readings, index = context.readings_index
+        if index is None or cached_version != version:
+            if self.live_feed is not None:
+                current = self.live_feed.current_readings()
+            else:
+                store, _ = self.data_loader.load_data()
+                current = DashboardDataProcessor(store).get_current_readings()
+            readings = {sensor_id: reading['pm25'] for sensor_id, reading in current.items()
+                        if reading['pm25'] is not None}
+            index = self.data_loader.spatial_index().subset(readings)
+            context.readings_index = (version, readings, index)
+        return version, readings, index
+
+    def _sensor_entry(self, sensor_id, readings):
+        lat, lon = self.data_loader.spatial_index().point(sensor_id)
+        return {'sensor_id': sensor_id, 'location': self.data_loader.sensor_locations.get(sensor_id),
+                'lat': lat, 'lon': lon, 'pm25': readings.get(sensor_id)}
+
+    def api_stream(self):
+        """Pushes newly ingested readings to the browser as Server-Sent Events."""
+        if self.live_feed is None:
+            return jsonify({'error': 'Live updates are disabled, start the app with AQ_LIVE=1'}), 404
+        # A stream holds its thread until the page is closed, so only a few may be open per worker
+        if self._stream_slots is None or not self._stream_slots.acquire(blocking=False):
+            registry.inc('aq_live_streams_refused_total')
+            response = jsonify({'error': 'Too many open live streams, poll /api/current instead'})
+            response.headers['Retry-After'] = '60'
+            return response, 503
+        response = Response(self.live_feed.stream(self.live_feed.subscribe()), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        response.call_on_close(self._stream_slots.release)
+        return response
+
+    def api_sensor_trend(self, sensor_id):
+        """Returns the recent daily values of one sensor (``days``, default 7)."""
+        days = positive_int_arg('days', 7)
+
+        def trend(processor):
+            _, values, labels = processor.get_7day_trend_data(days=days)
+            result = {'labels': labels, 'values': values[sensor_id]}
+            value_range = processor.get_trend_range(days=days)
+            if value_range is not None:
+                result.update(value_range[sensor_id])
+            return result
+
+        return self._sensor_dashboard_response(sensor_id, trend)
+
+    def api_sensor_heatmap(self, sensor_id):
+        """Returns the heatmap cells of one sensor (``days``, default 30)."""
+        days = positive_int_arg('days', 30)
+        return self._sensor_dashboard_response(
+            sensor_id, lambda processor: processor.get_heatmap_data(days=days)[sensor_id])
+
+    def api_sensor_records(self, sensor_id):
+        """Returns the best/worst day of one sensor."""
+        return self._sensor_dashboard_response(
+            sensor_id, lambda processor: processor.get_historical_records()[sensor_id])
+
+    def api_sensor_history(self, sensor_id):
+        """Returns statistics and the time series of one sensor file.
+
+        ``start``/``end`` (YYYY-MM-DD) restrict the series and ``max_points``
+        averages it down to at most that many points.
+        """
+        file_path = self.history_processor.sensor_path(sensor_id)
+        if not sensor_id.isdigit() or not os.path.exists(file_path):
+            return jsonify({'error': f'Unknown sensor {sensor_id}'}), 404
+        start, end, max_points = date_arg('start'), date_arg('end'), positive_int_arg('max_points')
+
+        def build():
+            stats, time_series = self.history_processor.process_sensor(sensor_id)
+            if not stats:
+                return None
+            dates, values = time_series['dates'], time_series['values']
+            if start or end:
+                keep = [i for i, d in enumerate(dates) if (not start or d >= start) and (not end or d <= end)]
+                dates, values = [dates[i] for i in keep], [values[i] for i in keep]
+            dates, values = downsample_series(dates, values, max_points)
+            return {'stats': stats, 'dates': dates, 'values': values}
+
+        return self._json_response(DatasetCache.file_signature(file_path), build)
+
+    def api_sensor_analytics(self, sensor_id):
+        """Returns the precomputed rolling means, AQI and WHO exceedance statistics of one sensor.
+
+        ``start``/``end`` (YYYY-MM-DD) or ``days`` (the last N days) restrict the
+        summary, and ``rolling`` adds the trailing mean of that many days at every day.
+        """
+        analytics = self.data_loader.sensor_analytics(sensor_id) if sensor_id.isdigit() else None
+        if analytics is None or not len(analytics):
+            return jsonify({'error': f'No analytics for sensor {sensor_id}, run analytics.py'}), 404
+
+        start, end = date_arg('start'), date_arg('end')
+        days, window = positive_int_arg('days'), positive_int_arg('rolling')
+        if days:
+            start, end = int(analytics.days[-1]) - days + 1, None
+
+        def build():
+            latest = float(analytics.values[-1])
+            result = {
+                'summary': analytics.summary(start, end),
+                'rolling_means': {str(window): analytics.rolling_mean(window) for window in ROLLING_WINDOWS},
+                'current_streak': analytics.current_streak(),
+                'latest': {'day': analytics.labels(-1)[0], 'pm25': round(latest, 2), 'aqi': aqi(latest),
+                           'category': AQI_CATEGORIES[aqi_category(latest)]},
+            }
+            if window:
+                result['rolling'] = {'window': window, 'labels': analytics.labels(),
+                                     'values': analytics.rolling_series(window).tolist()}
+            return result
+
+        return self._json_response(DatasetCache.file_signature(self.data_loader.analytics.path(sensor_id)), build)
+
+    def api_sensor_forecast(self, sensor_id):
+        """Returns actual and predicted values of one sensor (``days`` of actuals, default 7)."""
+        store, _ = self.data_loader.load_data()
+        if sensor_id not in store:
+            return jsonify({'error': f'Unknown sensor {sensor_id}'}), 404
+
+        processor = ForecastDataProcessor(store, forecast_path=self.data_loader.forecast_path,
+                                          pyramid=self.data_loader.pyramid_for(f'sensor_{sensor_id}'),
+                                          max_points=positive_int_arg('max_points', MAX_POINTS))
+        days = positive_int_arg('days', 7)
+        forecast_version = optional_signature(processor.forecast_path)
+        return self._json_response((self.data_loader.data_version(), forecast_version),
+                                   lambda: processor.get_sensor_forecast(sensor_id, n_actual_days=days))
+
+    def _sensor_dashboard_response(self, sensor_id, build_func):
+        """Runs a DashboardDataProcessor method on one sensor, within ``start``/``end`` if given."""
+        store, _ = self.data_loader.load_data()
+        if sensor_id not in store:
+            return jsonify({'error': f'Unknown sensor {sensor_id}'}), 404
+        start, end = date_arg('start'), date_arg('end')
+        max_points = positive_int_arg('max_points', MAX_POINTS)
+
+        def build():
+            sensor_store = store.select([sensor_id], start, end)
+            pyramid = self.data_loader.pyramid_for(f'sensor_{sensor_id}', start, end)
+            if not len(sensor_store) and pyramid is None:
+                return None
+            return build_func(DashboardDataProcessor(sensor_store, pyramid=pyramid, max_points=max_points))
+
+        return self._json_response(self.data_loader.data_version(), build)
+
+    def _json_response(self, version, build_func):
+        return self.api_cache.get(request.full_path, version, build_func).to_response()
 
     def run(self, debug=True):
         """Runs the Flask application."""
+        # With the reloader on, only the serving child process should watch the data
+        if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            self.start_watching()
         self.app.run(debug=debug)
 
 
+def create_app(shared_data=True, watch=True, live=LIVE_UPDATES):
+    """WSGI app factory for production servers: debug off, shared dataset, data watcher.
+
+    Each worker process calls this once; the watcher rebuilds the dashboard in the
+    background when new data lands, so workers pick it up without a restart.
+    With ``live`` every worker also applies and pushes readings from ``ingestion.py``.
+    """
+    air_quality_app = AirQualityApp(shared_data=shared_data, live=live)
+    if watch:
+        air_quality_app.start_watching()
+    return air_quality_app.app
+
+
 if __name__ == '__main__':
     air_quality_app = AirQualityApp()
     air_quality_app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+from regions import DATA_DIR
+
+STATE_PATH = os.path.join(DATA_DIR, "imputation_state.json")
+CONTEXT_DAYS = 365
+
+
+class Imputer(ABC):
+    """Common interface of the imputation strategies for the days x sensors matrix.
+
+    ``fit`` learns from a frame with missing values and ``transform`` returns a
+    copy without any. Cells a strategy cannot fill (e.g. a sensor with no
+    readings at all) fall back to the mean of the other sensors on that day.
+    """
+
+    name = None
+
+    def fit(self, df):
+        return self
+
+    @abstractmethod
+    def transform(self, df):
+        """Returns a copy of ``df`` without missing values."""
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    def impute_new(self, reference, new):
+        """Imputes only the ``new`` rows, using ``reference`` (the preceding raw rows) as context."""
+        window = pd.concat([reference, new])
+        return self.fit_transform(window).iloc[len(reference):]
+
+    @staticmethod
+    def _fill_remaining(df):
+        if not df.isna().to_numpy().any():
+            return df
+        row_mean = df.mean(axis=1)
+        df = df.apply(lambda col: col.fillna(row_mean))
+        return df.fillna(df.mean())
+
+
+class KNNImputer(Imputer):
+    """scikit-learn's KNNImputer: each day is filled from the most similar days.
+
+    Its cost grows with rows x rows x sensors, so ``impute_new`` only transforms
+    the new rows against the reference window instead of the whole history.
+    """
+
+    name = "knn"
+
+    def __init__(self, n_neighbors=5, weights="distance"):
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self._imputer = None
+        self._columns = None
+
+    def fit(self, df):
+        from sklearn.impute import KNNImputer as SklearnKNNImputer
+
+        # KNNImputer drops all-empty columns, leave those to the fallback instead
+        self._columns = df.columns[df.notna().any()]
+        self._imputer = SklearnKNNImputer(n_neighbors=self.n_neighbors, weights=self.weights)
+        self._imputer.fit(df[self._columns])
+        return self
+
+    def transform(self, df):
+        imputed = df.copy()
+        imputed[self._columns] = self._imputer.transform(df[self._columns])
+        return self._fill_remaining(imputed)
+
+    def impute_new(self, reference, new):
+        return self.fit(pd.concat([reference, new])).transform(new)
+
+
+class TimeInterpolationImputer(Imputer):
+    """Interpolates each sensor over time; the cheapest strategy, O(rows x sensors)."""
+
+    name = "interpolate"
+
+    def __init__(self, limit=None):
+        self.limit = limit
+
+    def transform(self, df):
+        imputed = df.interpolate(method="time", limit=self.limit, limit_direction="both")
+        return self._fill_remaining(imputed)
+
+
+class NeighborRegressionImputer(Imputer):
+    """Predicts a missing reading from the most correlated sensors.
+
+    For every sensor, ``fit`` picks the ``n_neighbors`` sensors whose readings
+    correlate best with it (nearby sensors share the regional pollution signal)
+    and fits a line on each of them over the days both have readings. A
+    missing value is the average of the available neighbours' predictions,
+    weighted by their squared correlation. All pairwise statistics come from a
+    few matrix products, so fitting is O(rows x sensors^2) and predicting is
+    O(rows x sensors x n_neighbors). Cells with no neighbour reading fall back
+    to time interpolation.
+    """
+
+    name = "regression"
+
+    def __init__(self, n_neighbors=5, min_overlap=30):
+        self.n_neighbors = n_neighbors
+        self.min_overlap = min_overlap
+        self.neighbors = None
+        self.intercepts = None
+        self.slopes = None
+        self.weights = None
+        self._columns = None
+
+    def fit(self, df):
+        values = df.to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+        x = np.where(present, values, 0.0)
+        m = present.astype(np.float64)
+
+        # Pairwise sums over the days where both sensors i (rows) and j (columns) have readings
+        n = m.T @ m
+        sum_i = x.T @ m
+        sum_sq_i = (x * x).T @ m
+        sum_ij = x.T @ x
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_i = sum_i / n
+            mean_j = sum_i.T / n
+            cov = sum_ij / n - mean_i * mean_j
+            var_i = sum_sq_i / n - mean_i ** 2
+            var_j = var_i.T
+            corr = cov / np.sqrt(var_i * var_j)
+            # Regression of sensor j (target) on sensor i (neighbour)
+            slopes = cov / var_i
+        intercepts = mean_j - slopes * mean_i
+
+        usable = (n >= self.min_overlap) & np.isfinite(corr) & np.isfinite(slopes)
+        np.fill_diagonal(usable, False)
+        score = np.where(usable, corr ** 2, -1.0)
+
+        k = min(self.n_neighbors, max(values.shape[1] - 1, 1))
+        # Best neighbours of every target column, as (targets, k) indices
+        self.neighbors = np.argsort(-score, axis=0)[:k].T
+        targets = np.arange(values.shape[1])[:, None]
+        self.weights = np.clip(score[self.neighbors, targets], 0.0, None)
+        self.slopes = np.where(self.weights > 0, slopes[self.neighbors, targets], 0.0)
+        self.intercepts = np.where(self.weights > 0, intercepts[self.neighbors, targets], 0.0)
+        self._columns = df.columns
+        return self
+
+    def transform(self, df):
+        values = df[self._columns].to_numpy(dtype=np.float64)
+        neighbor_values = values[:, self.neighbors]  # (rows, targets, k)
+        available = ~np.isnan(neighbor_values) & (self.weights > 0)
+        predictions = self.intercepts + self.slopes * np.where(available, neighbor_values, 0.0)
+        weights = np.where(available, self.weights, 0.0)
+        total = weights.sum(axis=2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            predicted = (weights * predictions).sum(axis=2) / total
+
+        missing = np.isnan(values) & (total > 0)
+        filled = np.where(missing, predicted, values)
+        imputed = pd.DataFrame(filled, index=df.index, columns=self._columns)
+        if imputed.isna().to_numpy().any():
+            imputed = TimeInterpolationImputer().transform(imputed)
+        return imputed
+
+
+STRATEGIES = {cls.name: cls for cls in (KNNImputer, TimeInterpolationImputer, NeighborRegressionImputer)}
+
+
+def make_imputer(strategy="knn", **params):
+    """Returns an imputer by strategy name: knn, interpolate or regression."""
+    try:
+        return STRATEGIES[strategy](**params)
+    except KeyError:
+        raise ValueError(f"Unknown imputation strategy {strategy!r}, expected one of {sorted(STRATEGIES)}")
+
+
+def frame_digest(df):
+    """Returns a hash of the index, columns and values, NaNs included."""
+    digest = hashlib.sha1()
+    digest.update(json.dumps(list(df.columns)).encode())
+    digest.update(np.ascontiguousarray(df.index.asi8).tobytes())
+    digest.update(np.ascontiguousarray(df.to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+class IncrementalImputation:
+    """Imputes only the rows appended to the raw matrix since the last run.
+
+    The previous imputed output is the persisted reference. A small state file
+    records which strategy produced it and a digest of the raw rows it covers.
+    When those raw rows, the sensor columns and the strategy are unchanged,
+    only the new rows are imputed, with the last ``context_days`` raw rows as
+    context. Otherwise the whole matrix is imputed again.
+    """
+
+    def __init__(self, imputer, state_path=STATE_PATH, context_days=CONTEXT_DAYS):
+        self.imputer = imputer
+        self.state_path = state_path
+        self.context_days = context_days
+
+    def read_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def covered_rows(self, raw, previous):
+        """Returns how many leading raw rows ``previous`` already covers, or 0 if it cannot be reused."""
+        state = self.read_state()
+        if state is None or previous is None or state["strategy"] != self.imputer.name:
+            return 0
+        rows = state["rows"]
+        if (rows > len(raw) or len(previous) != rows or list(previous.columns) != list(raw.columns)
+                or frame_digest(raw.iloc[:rows]) != state["raw_digest"]):
+            return 0
+        return rows
+
+    def update(self, raw, previous=None, full=False):
+        """Returns (imputed frame, number of rows imputed in this run)."""
+        covered = 0 if full else self.covered_rows(raw, previous)
+        if covered == 0:
+            imputed = self.imputer.fit_transform(raw)
+        elif covered == len(raw):
+            imputed = previous
+        else:
+            reference = raw.iloc[max(0, covered - self.context_days):covered]
+            new_rows = self.imputer.impute_new(reference, raw.iloc[covered:])
+            imputed = pd.concat([previous, new_rows])
+        return imputed, len(raw) - covered
+
+    def save_state(self, raw):
+        """Records that the output written for ``raw`` covers all its rows; call after saving it."""
+        state = {"strategy": self.imputer.name, "rows": len(raw), "raw_digest": frame_digest(raw)}
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
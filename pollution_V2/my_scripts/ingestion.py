@@ -0,0 +1,236 @@
+import argparse
+import datetime
+import json
+import os
+import time
+import pandas as pd
+import storage
+from data_combining import sensor_files
+from data_handling import OUTPUT_FOLDER, SENSORS_PATH, LocalSource, OpenAQSource, RateLimiter, to_utc
+from regions import DATA_DIR
+from shared_matrix import FileLock
+
+JOURNAL_PATH = os.path.join(DATA_DIR, "live", "journal.jsonl")
+
+
+class Journal:
+    """Append-only JSON-lines file of reading batches, written by the ingestion service.
+
+    Each line is ``{"at": ISO time, "readings": [[sensor_id, "YYYY-MM-DD", value], ...]}``.
+    Every app worker tails the file from the byte offset it last read, so applying
+    a batch costs the size of the batch, not of the journal or the data set.
+    Writers take the lock file next to it, so a compaction never drops a batch
+    appended meanwhile; readers need no lock.
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+
+    def _lock(self):
+        return FileLock(self.path + ".lock")
+
+    def append(self, readings):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        line = json.dumps({"at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                           "readings": [[str(sensor_id), day, value] for sensor_id, day, value in readings]})
+        # One write per batch; readers only consume complete lines
+        with self._lock(), open(self.path, "a") as f:
+            f.write(line + "\n")
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def read(self, offset=0):
+        """Returns (batches, next offset) for the complete lines after ``offset``."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        end = data.rfind(b"\n") + 1
+        batches = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+        return batches, offset + end
+
+    def identity(self):
+        """Returns the inode of the file, which changes when it is compacted or reset; None if missing."""
+        try:
+            return os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+
+    def compact(self, before):
+        """Drops the readings of days before ``before`` (YYYY-MM-DD); returns how many were dropped.
+
+        Called once the batch pipeline has absorbed those days into the matrix,
+        so workers that start over from a new matrix only apply the newer days.
+        The file is rewritten and replaced, which readers notice by its identity.
+        """
+        if not os.path.exists(self.path):
+            return 0
+        with self._lock():
+            batches, _ = self.read(0)
+            kept, dropped = [], 0
+            for batch in batches:
+                readings = [reading for reading in batch["readings"] if reading[1] >= before]
+                dropped += len(batch["readings"]) - len(readings)
+                if readings:
+                    kept.append(dict(batch, readings=readings))
+            if not dropped:
+                return 0
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.writelines(json.dumps(batch) + "\n" for batch in kept)
+            os.replace(tmp_path, self.path)
+        return dropped
+
+    def reset(self):
+        with self._lock():
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def day_of(value):
+    """Returns the local calendar day of an OpenAQ ``datetime_from_local`` as YYYY-MM-DD."""
+    return str(value)[:10]
+
+
+class ReplaySource:
+    """Replays existing sensor files day by day, standing in for live measurements offline.
+
+    Only PM2.5 files are read, once. Each ``poll`` returns the readings of the
+    next ``days_per_batch`` days from ``start`` on, and None once all are sent.
+    """
+
+    def __init__(self, folder=OUTPUT_FOLDER, start=None, days_per_batch=1):
+        frames = []
+        for sensor_id, file_path in sensor_files(folder):
+            df = pd.read_csv(file_path, usecols=["datetime_from_local", "value"])
+            frames.append(pd.DataFrame({"sensor_id": str(sensor_id), "day": df["datetime_from_local"].map(day_of),
+                                        "value": df["value"]}))
+        columns = ["sensor_id", "day", "value"]
+        readings = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+        readings = readings.dropna(subset=["value"])
+        if start is not None:
+            readings = readings[readings["day"] >= str(start)[:10]]
+        self.readings = readings.sort_values("day", kind="stable")
+        self.days = sorted(self.readings["day"].unique())
+        self.days_per_batch = days_per_batch
+        self._cursor = 0
+
+    def poll(self):
+        if self._cursor >= len(self.days):
+            return None
+        days = self.days[self._cursor:self._cursor + self.days_per_batch]
+        self._cursor += len(days)
+        batch = self.readings[self.readings["day"].isin(days)]
+        return list(zip(batch["sensor_id"], batch["day"], batch["value"].astype(float)))
+
+
+class PollingSource:
+    """Asks a measurement source for every sensor's readings since its latest day.
+
+    The latest day is fetched again on each poll since OpenAQ updates the
+    running average of the current day; only readings that changed are returned.
+    """
+
+    def __init__(self, source, sensor_ids, since, requests_per_second=1.0, page_limit=100):
+        self.source = source
+        self.since = {str(sensor_id): to_utc(since) for sensor_id in sensor_ids}
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.page_limit = page_limit
+        self._sent = {}
+
+    def poll(self):
+        now = pd.Timestamp.now(tz="UTC")
+        readings = []
+        for sensor_id, since in self.since.items():
+            self.rate_limiter.wait()
+            try:
+                rows = self.source.fetch_page(sensor_id, since, now, 1, self.page_limit)
+            except Exception as e:
+                print(f"ERROR polling sensor {sensor_id}: {e}")
+                continue
+            for row in rows:
+                if str(row.get("parameter", "pm25")).lower() != "pm25" or pd.isna(row["value"]):
+                    continue
+                day = day_of(row["datetime_from_local"])
+                if self._sent.get((sensor_id, day)) != row["value"]:
+                    self._sent[(sensor_id, day)] = row["value"]
+                    readings.append((sensor_id, day, float(row["value"])))
+                self.since[sensor_id] = max(self.since[sensor_id], to_utc(row["datetime_from_local"]))
+        return readings
+
+
+class IngestionService:
+    """Polls a source every ``interval`` seconds and appends new readings to the journal."""
+
+    def __init__(self, source, journal, interval=60.0):
+        self.source = source
+        self.journal = journal
+        self.interval = interval
+
+    def run(self, max_batches=None):
+        """Runs until the source is exhausted or ``max_batches`` batches were written; returns that count."""
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            started = time.monotonic()
+            readings = self.source.poll()
+            if readings is None:
+                break
+            if readings:
+                self.journal.append(readings)
+                batches += 1
+                print(f"Appended {len(readings)} readings for {len({r[1] for r in readings})} day(s).")
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+        return batches
+
+
+def matrix_end():
+    """Returns the day after the last day of the imputed matrix, where new data starts."""
+    df = storage.read_frame(storage.find_dataset("aligned_filled"), columns=[])
+    return (df.index.max() + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feed new PM2.5 readings to running dashboards.")
+    parser.add_argument("--replay", nargs="?", const=OUTPUT_FOLDER, metavar="FOLDER",
+                        help="replay sensor files day by day instead of polling OpenAQ")
+    parser.add_argument("--offline", metavar="FOLDER", help="poll local sensor files instead of the OpenAQ API")
+    parser.add_argument("--from", dest="start",
+                        help="first day to send (default: the day after the imputed matrix ends)")
+    parser.add_argument("--interval", type=float, help="seconds between polls (default 1 for replay, else 300)")
+    parser.add_argument("--days-per-batch", type=int, default=1, help="days per replayed batch")
+    parser.add_argument("--max-batches", type=int)
+    parser.add_argument("--journal", default=JOURNAL_PATH)
+    parser.add_argument("--reset", action="store_true", help="empty the journal before starting")
+    parser.add_argument("--compact", action="store_true",
+                        help="drop the days the imputed matrix already holds from the journal and exit")
+    args = parser.parse_args()
+
+    journal = Journal(args.journal)
+    if args.reset:
+        journal.reset()
+    if args.compact:
+        print(f"Dropped {journal.compact(matrix_end())} readings from {args.journal}.")
+        return
+    start = args.start or matrix_end()
+    if args.replay:
+        source = ReplaySource(args.replay, start=start, days_per_batch=args.days_per_batch)
+        if not source.days:
+            print(f"No readings in {args.replay} from {start} on; pass an earlier --from to replay older days.")
+            return
+    else:
+        sensor_ids = pd.read_csv(SENSORS_PATH)["sensor_id"].tolist()
+        source = PollingSource(LocalSource(args.offline) if args.offline else OpenAQSource(), sensor_ids, start)
+
+    interval = args.interval if args.interval is not None else (1.0 if args.replay else 300.0)
+    batches = IngestionService(source, journal, interval).run(args.max_batches)
+    print(f"Wrote {batches} batches to {args.journal}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,42 @@
 # -------------------------- #
-from openaq import OpenAQ
 import pandas as pd
+from data_handling import API_KEY, SENSORS_PATH
+from regions import ACTIVE_REGION, get_region
 
-client = OpenAQ("f2ae9f923f46869d0254a8f714b115d8ff9b26ae25178ab506172346f487455b")
-
-locations = client.locations.list(
-    bbox=(44.40, 40.10, 44.65, 40.32),  # The bbox defines a rectangular geographic area to limit the search.
-    limit=100 # sets the maximum number of locations to retrieve.
-)
-
-rows = []
-
-for loc in locations.results:
-    for sensor in loc.sensors:
-        rows.append({
-            "location_id": loc.id,
-            "location_name": loc.name,
-            "sensor_id": sensor.id,
-            "parameter": sensor.parameter.name,
-            "datetime_first": loc.datetime_first.utc,
-            "datetime_last": loc.datetime_last.utc
-        })
-
-df = pd.DataFrame(rows)
-df.to_csv("../data/my_sensors_with_dates.csv", index=False)
-print("Saved", len(df), "rows.")
+BBOX = tuple(get_region(ACTIVE_REGION)["bbox"])  # The bbox defines a rectangular geographic area to limit the search.
+
+
+def fetch_locations(output_path=SENSORS_PATH, bbox=BBOX):
+    """Saves one row per sensor of every OpenAQ location in the bbox; returns the row count."""
+    from openaq import OpenAQ
+
+    client = OpenAQ(api_key=API_KEY)
+
+    locations = client.locations.list(
+        bbox=bbox,
+        limit=100 # sets the maximum number of locations to retrieve.
+    )
+
+    rows = []
+
+    for loc in locations.results:
+        for sensor in loc.sensors:
+            rows.append({
+                "location_id": loc.id,
+                "location_name": loc.name,
+                "sensor_id": sensor.id,
+                "parameter": sensor.parameter.name,
+                # Keep the coordinates so the dashboard map does not have to geocode the name
+                "latitude": loc.coordinates.latitude if loc.coordinates else None,
+                "longitude": loc.coordinates.longitude if loc.coordinates else None,
+                "datetime_first": loc.datetime_first.utc,
+                "datetime_last": loc.datetime_last.utc
+            })
+
+    df = pd.DataFrame(rows)
+    df.to_csv(output_path, index=False)
+    return len(df)
+
+
+if __name__ == "__main__":
+    print("Saved", fetch_locations(), "rows.")
@@ -0,0 +1,201 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+# Upper bounds of the histogram buckets, in seconds and in bytes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+PROFILE_MODE = os.environ.get("AQ_PROFILE", "off")  # off, flag (honour ?profile=1) or all
+PROFILE_DIR = os.environ.get("AQ_PROFILE_DIR", "../data/profiles")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Thread-safe counters, histograms and callback gauges rendered in Prometheus text format.
+
+    Metrics are kept per process; under a multi-worker server every worker
+    answers ``/metrics`` with its own numbers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}  # name -> (type, help, buckets)
+        self._counters = {}  # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: [bucket counts, sum, count]}
+        self._callbacks = {}  # name -> func returning {labels: value}
+
+    def counter(self, name, help_text):
+        self._meta[name] = ("counter", help_text, None)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._meta[name] = ("histogram", help_text, tuple(buckets))
+        self._histograms.setdefault(name, {})
+
+    def callback(self, name, metric_type, help_text, func):
+        """Registers a gauge or counter whose {labels dict as tuple: value} is read at scrape time."""
+        self._meta[name] = (metric_type, help_text, None)
+        self._callbacks[name] = func
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        buckets = self._meta[name][2]
+        with self._lock:
+            series = self._histograms[name].get(key)
+            if series is None:
+                series = self._histograms[name][key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: [list(s[0]), s[1], s[2]] for key, s in series.items()}
+                          for name, series in self._histograms.items()}
+
+        for name, (metric_type, help_text, buckets) in sorted(self._meta.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            if name in self._callbacks:
+                try:
+                    series = self._callbacks[name]()
+                except Exception as e:
+                    print(f"ERROR collecting metric {name}: {e}")
+                    series = {}
+                for key, value in sorted(series.items()):
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            elif metric_type == "counter":
+                for key, value in sorted(counters[name].items()):
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            else:
+                for key, (counts, total, count) in sorted(histograms[name].items()):
+                    for bound, bucket_count in zip(buckets + (float("inf"),), counts + [count]):
+                        labels = key + (("le", _format_value(float(bound))),)
+                        lines.append(f"{name}_bucket{_format_labels(labels)} {bucket_count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.histogram("aq_operation_seconds", "Time spent in data loading, processing, serialization and rendering.")
+registry.histogram("aq_payload_bytes", "Size of built page and JSON payloads before compression.", SIZE_BUCKETS)
+registry.histogram("aq_request_seconds", "Request latency by endpoint.")
+registry.histogram("aq_response_bytes", "Response body size sent, by endpoint.", SIZE_BUCKETS)
+registry.counter("aq_requests_total", "Requests by endpoint and status code.")
+registry.counter("aq_live_readings_total", "Readings applied from the ingestion journal.")
+registry.counter("aq_live_streams_refused_total", "Live update streams refused over the per-worker limit.")
+
+
+@contextmanager
+def timer(operation):
+    """Times the block into aq_operation_seconds{operation=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe("aq_operation_seconds", time.perf_counter() - start, operation=operation)
+
+
+def timed(operation):
+    """Decorator form of ``timer``."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def process_rss_bytes():
+    """Returns the resident set size of this process, or None where it cannot be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class RequestProfiler:
+    """Opt-in cProfile of single requests, dumped as ``.prof`` plus a text summary.
+
+    ``mode`` is ``off``, ``flag`` (profile requests carrying ``?profile=1``) or
+    ``all``; by default it comes from the ``AQ_PROFILE`` environment variable,
+    so a production server never profiles unless explicitly enabled.
+    """
+
+    def __init__(self, mode=PROFILE_MODE, output_dir=PROFILE_DIR, top=40):
+        self.mode = mode
+        self.output_dir = output_dir
+        self.top = top
+
+    def wants(self, request):
+        if self.mode == "all":
+            return True
+        return self.mode == "flag" and request.args.get("profile") in ("1", "true")
+
+    @staticmethod
+    def start():
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def stop(self, profile, request):
+        """Stops the profile and writes it; returns the path of the ``.prof`` file."""
+        profile.disable()
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", request.path).strip("_") or "root"
+        # The random suffix keeps requests to the same path within one second apart
+        base = os.path.join(self.output_dir,
+                            f"{time.strftime('%Y%m%dT%H%M%S')}_{os.getpid()}_{slug}_{uuid.uuid4().hex[:8]}")
+        profile.dump_stats(base + ".prof")
+
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(self.top)
+        with open(base + ".txt", "w") as f:
+            f.write(f"{request.method} {request.full_path}\n")
+            f.write(summary.getvalue())
+        return base + ".prof"
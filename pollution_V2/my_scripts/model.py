@@ -1,104 +1,192 @@
+import argparse
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import MinMaxScaler
+import tensorflow as tf
 from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense
+from tensorflow.keras.layers import Input, LSTM, Dense
 from tensorflow.keras.losses import MeanSquaredError  # Needed for compilation clarity
+import storage
+from model_registry import ModelRegistry
 
 # 1. PARAMETERS
 SEQ_LENGTH = 7  # Past 7 days to predict next day
-FUTURE_DAYS = 7  # Predict the next 30 days
-DATA_PATH = "../data/aligned_sensors_pm25_filled_knn.csv"
-FORECAST_OUTPUT_PATH = "../data/future_pm25_forecast.csv"
+FUTURE_DAYS = 7  # Predict the next 7 days
+EPOCHS = 50
+FINE_TUNE_EPOCHS = 5  # Epochs over the newly arrived days when warm-starting
+BATCH_SIZE = 16
+KEEP_MODELS = 5  # Saved model versions kept in the registry; older ones are deleted
+DATA_PATH = storage.find_dataset("aligned_filled")
+FORECAST_OUTPUT_PATH = storage.dataset_path("forecast")
+
 
 # 2. Load and Prepare Data
-df = pd.read_csv(DATA_PATH, index_col=0, parse_dates=True)
-df = df.round(1)
+def load_data(path=DATA_PATH):
+    """Loads the imputed days x sensors matrix."""
+    return storage.read_frame(path).round(1)
 
-# Initialize scalers and scale data
-scalers = {}
-scaled_data = pd.DataFrame(index=df.index)
 
-for col in df.columns:
+def fit_scaler(df):
+    """Fits one MinMaxScaler over all sensors; it still scales every column independently."""
     scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled_data[col] = scaler.fit_transform(df[[col]])
-    scalers[col] = scaler
+    scaled = scaler.fit_transform(df.to_numpy(dtype=np.float64)).astype(np.float32)
+    return scaler, scaled
 
 
 # 3. Prepare sequences for LSTM
 def create_sequences(data, seq_length=7):
-    """Creates sequences (X) and next-day target (y)."""
-    X, y = [], []
-    for i in range(len(data) - seq_length):
-        X.append(data.iloc[i:i + seq_length].values)
-        y.append(data.iloc[i + seq_length].values)
-    return np.array(X), np.array(y)
-
-
-X, y = create_sequences(scaled_data, seq_length=SEQ_LENGTH)
-
-# 4. Use ALL data for Training
-X_train, y_train = X, y
-num_sensors = df.shape[1]
-
-# 5. Build and Train LSTM model
-print("Building and training new model...")
-
-# Model Definition
-model = Sequential()
-model.add(LSTM(64, input_shape=(SEQ_LENGTH, num_sensors), return_sequences=False))
-model.add(Dense(num_sensors))
-model.compile(optimizer='adam', loss=MeanSquaredError())  # Use the explicit loss function class
-
-# Training
-history = model.fit(
-    X_train,
-    y_train,
-    epochs=50,
-    batch_size=16,
-    verbose=0  
-)
-
-print("Model training complete (50 epochs).")
-
-# 6. Generate Future Predictions
-# Use the last SEQ_LENGTH days of the FULL original dataset as the starting point.
-last_sequence = scaled_data.iloc[-SEQ_LENGTH:].values
-future_predictions = []
-
-for _ in range(FUTURE_DAYS):
-    # Predict the next day (unrolled prediction)
-    pred = model.predict(last_sequence[np.newaxis, :, :], verbose=0)[0]
-    future_predictions.append(pred)
-
-    # Slide the window forward: remove the oldest day, add the new prediction
-    last_sequence = np.vstack([last_sequence[1:], pred])
-
-# 7. Inverse Transform and Create Future DataFrame
-future_predictions = np.array(future_predictions)
-future_predictions_inv = np.zeros_like(future_predictions)
-
-# Inverse transform predictions for each sensor using its respective scaler
-for i, col in enumerate(df.columns):
-    # Retrieve the scaler used for this column
-    scaler = scalers[col]
-
-    # Reshape the column's predictions and inverse transform
-    future_predictions_inv[:, i] = scaler.inverse_transform(
-        future_predictions[:, i].reshape(-1, 1)
-    ).flatten()
-
-future_predictions_inv = future_predictions_inv.round(1)
-
-# 8. Create Future Dates and Save Forecast CSV
-last_date = df.index[-1]
-# Start dates 1 day after the last date in the historical data
-future_dates = pd.date_range(start=last_date + pd.Timedelta(days=1), periods=FUTURE_DAYS, freq='D')
-
-future_df = pd.DataFrame(future_predictions_inv, columns=df.columns, index=future_dates)
-
-future_df.to_csv("../data/new_forecast.csv")
-
-print(f" Generated future PM2.5 data for {FUTURE_DAYS} days and saved to CSV.")
-print("\nFuture DataFrame Head:")
-print(future_df.head())
+    """Creates sequences (X) and next-day target (y).
+
+    X is a zero-copy strided view of shape (samples, seq_length, sensors) over the
+    input array, so no window is materialised until the model consumes it.
+    """
+    values = np.asarray(data)
+    windows = sliding_window_view(values, seq_length, axis=0).transpose(0, 2, 1)
+    return windows[:-1], values[seq_length:]
+
+
+def last_windows(data, seq_length, end_positions):
+    """Returns the seq_length-day windows ending right before each end position."""
+    windows = sliding_window_view(np.asarray(data), seq_length, axis=0).transpose(0, 2, 1)
+    return windows[np.asarray(end_positions) - seq_length]
+
+
+# 4. Model Definition
+def build_model(seq_length, num_sensors):
+    model = Sequential()
+    model.add(Input(shape=(seq_length, num_sensors)))
+    model.add(LSTM(64, return_sequences=False))
+    model.add(Dense(num_sensors))
+    model.compile(optimizer='adam', loss=MeanSquaredError())  # Use the explicit loss function class
+    return model
+
+
+# 5. Batched multi-step forecasting
+def make_rollout(model, steps):
+    """Compiles a function that unrolls the model ``steps`` days ahead for a batch of windows.
+
+    The returned function maps (batch, seq_length, sensors) windows to
+    (batch, steps, sensors) predictions in one graph call, so many start dates or
+    scenarios are forecast together instead of one model.predict per day.
+    """
+    @tf.function(reduce_retracing=True)
+    def rollout(windows):
+        predictions = tf.TensorArray(tf.float32, size=steps)
+        for step in tf.range(steps):
+            pred = model(windows, training=False)
+            predictions = predictions.write(step, pred)
+            # Slide the window forward: remove the oldest day, add the new prediction
+            windows = tf.concat([windows[:, 1:, :], pred[:, tf.newaxis, :]], axis=1)
+        return tf.transpose(predictions.stack(), [1, 0, 2])
+
+    return rollout
+
+
+def rollout_for(model, steps):
+    """Returns the compiled rollout of a model for ``steps`` days, traced once and kept on the model.
+
+    A new ``tf.function`` would be traced again on every call. The cache sits
+    in the model's ``__dict__`` rather than in a global, so it is freed with
+    the model and stays out of Keras attribute tracking and saving.
+    """
+    rollouts = model.__dict__.setdefault("_rollouts", {})
+    if steps not in rollouts:
+        rollouts[steps] = make_rollout(model, steps)
+    return rollouts[steps]
+
+
+def forecast(model, scaler, windows, steps=FUTURE_DAYS):
+    """Forecasts ``steps`` days for every window and returns unscaled (batch, steps, sensors)."""
+    windows = tf.convert_to_tensor(np.asarray(windows, dtype=np.float32))
+    scaled = rollout_for(model, steps)(windows).numpy().astype(np.float64)
+    batch, steps, sensors = scaled.shape
+    return scaler.inverse_transform(scaled.reshape(-1, sensors)).reshape(batch, steps, sensors)
+
+
+def train(df, registry, retrain=False):
+    """Returns (model, scaler, scaled_data, version), warm-starting from the latest saved model.
+
+    A saved model for the same sensor columns is fine-tuned on the days that
+    arrived after it was trained, keeping its scaler; otherwise (or with
+    ``retrain``) a new model is trained from scratch on all the data.
+    """
+    latest = None if retrain else registry.latest()
+    if latest is not None and registry.metadata(latest)["columns"] == list(df.columns):
+        model, scaler, meta = registry.load(latest)
+        scaled_data = scaler.transform(df.to_numpy(dtype=np.float64)).astype(np.float32)
+        trained_until = pd.Timestamp(meta["trained_until"])
+        first_new = int(np.searchsorted(df.index, trained_until, side="right"))
+
+        if first_new >= len(df):
+            print(f"No new days since model {latest}, reusing it.")
+            return model, scaler, scaled_data, latest
+
+        # Samples whose target day is new, with their preceding SEQ_LENGTH days as input
+        X, y = create_sequences(scaled_data, seq_length=SEQ_LENGTH)
+        start = max(first_new - SEQ_LENGTH, 0)
+        print(f"Fine-tuning model {latest} on {len(df) - first_new} new days...")
+        model.fit(X[start:], y[start:], epochs=FINE_TUNE_EPOCHS, batch_size=BATCH_SIZE, verbose=0)
+        epochs, parent = FINE_TUNE_EPOCHS, latest
+    else:
+        scaler, scaled_data = fit_scaler(df)
+        X_train, y_train = create_sequences(scaled_data, seq_length=SEQ_LENGTH)
+
+        print("Building and training new model...")
+        model = build_model(SEQ_LENGTH, df.shape[1])
+        model.fit(X_train, y_train, epochs=EPOCHS, batch_size=BATCH_SIZE, verbose=0)
+        print(f"Model training complete ({EPOCHS} epochs).")
+        epochs, parent = EPOCHS, None
+
+    version = registry.save(model, scaler, df.columns, seq_length=SEQ_LENGTH,
+                            trained_until=df.index[-1].isoformat(), epochs=epochs,
+                            batch_size=BATCH_SIZE, samples=len(df) - SEQ_LENGTH, parent_version=parent)
+    registry.prune(keep=KEEP_MODELS)
+    print(f"Saved model version {version}.")
+    return model, scaler, scaled_data, version
+
+
+def run(predict_only=False, retrain=False, version=None):
+    """Trains (or reuses) the model and writes the forecast of the next FUTURE_DAYS days."""
+    df = load_data()
+    registry = ModelRegistry()
+
+    if predict_only:
+        model, scaler, meta = registry.load(version)
+        # Keep the column order the model was trained with
+        df = df[meta["columns"]]
+        scaled_data = scaler.transform(df.to_numpy(dtype=np.float64)).astype(np.float32)
+    else:
+        model, scaler, scaled_data, _ = train(df, registry, retrain=retrain)
+
+    # 6. Generate Future Predictions from the last SEQ_LENGTH days of the full dataset
+    last_sequence = scaled_data[np.newaxis, -SEQ_LENGTH:, :]
+    future_predictions_inv = forecast(model, scaler, last_sequence)[0].round(1)
+
+    # 7. Create Future Dates and Save Forecast
+    last_date = df.index[-1]
+    # Start dates 1 day after the last date in the historical data
+    future_dates = pd.date_range(start=last_date + pd.Timedelta(days=1), periods=FUTURE_DAYS, freq='D')
+
+    future_df = pd.DataFrame(future_predictions_inv, columns=df.columns, index=future_dates)
+
+    storage.write_frame(future_df, FORECAST_OUTPUT_PATH)
+
+    print(f" Generated future PM2.5 data for {FUTURE_DAYS} days and saved to CSV.")
+    print("\nFuture DataFrame Head:")
+    print(future_df.head())
+    return future_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the LSTM and forecast the next days.")
+    parser.add_argument("--predict-only", action="store_true",
+                        help="forecast with the latest saved model without any training")
+    parser.add_argument("--retrain", action="store_true", help="train a new model from scratch")
+    parser.add_argument("--version", help="saved model version to use with --predict-only")
+    args = parser.parse_args()
+    run(args.predict_only, args.retrain, args.version)
+
+
+if __name__ == "__main__":
+    main()
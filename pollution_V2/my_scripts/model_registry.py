@@ -0,0 +1,84 @@
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+import joblib
+from regions import DATA_DIR
+
+REGISTRY_DIR = os.path.join(DATA_DIR, "models")
+
+
+class ModelRegistry:
+    """Stores trained forecasting models on local disk under version IDs.
+
+    Each version directory holds the Keras model, the fitted scaler and a
+    ``meta.json`` with the sensor column order and training metadata. The
+    ``LATEST`` file points at the most recently saved version.
+    """
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+
+    def save(self, model, scaler, columns, **metadata):
+        """Saves a model with its scaler and metadata; returns the new version ID."""
+        os.makedirs(self.root, exist_ok=True)
+        version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        tmp_dir = os.path.join(self.root, f".{version}.tmp")
+        os.makedirs(tmp_dir)
+
+        model.save(os.path.join(tmp_dir, "model.keras"))
+        joblib.dump(scaler, os.path.join(tmp_dir, "scaler.joblib"))
+        meta = {"version": version, "columns": list(columns),
+                "created_at": datetime.now(timezone.utc).isoformat(), **metadata}
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2, default=str)
+
+        # Publish the complete directory in one step, then move the pointer
+        os.replace(tmp_dir, os.path.join(self.root, version))
+        self._write_latest(version)
+        return version
+
+    def latest(self):
+        """Returns the latest version ID, or None if nothing was saved yet."""
+        try:
+            with open(os.path.join(self.root, "LATEST")) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version if os.path.isdir(os.path.join(self.root, version)) else None
+
+    def versions(self):
+        """Returns all saved version IDs, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if not name.startswith(".") and os.path.isdir(os.path.join(self.root, name)))
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, "meta.json")) as f:
+            return json.load(f)
+
+    def load(self, version=None):
+        """Returns (model, scaler, metadata) for a version, by default the latest one."""
+        from tensorflow.keras.models import load_model
+
+        version = version or self.latest()
+        if version is None:
+            raise FileNotFoundError(f"No saved model in {self.root}")
+        version_dir = os.path.join(self.root, version)
+        model = load_model(os.path.join(version_dir, "model.keras"))
+        scaler = joblib.load(os.path.join(version_dir, "scaler.joblib"))
+        return model, scaler, self.metadata(version)
+
+    def prune(self, keep=5):
+        """Deletes all but the ``keep`` most recent versions."""
+        latest = self.latest()
+        for version in self.versions()[:-keep]:
+            if version != latest:
+                shutil.rmtree(os.path.join(self.root, version))
+
+    def _write_latest(self, version):
+        tmp_path = os.path.join(self.root, "LATEST.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, "LATEST"))
@@ -0,0 +1,407 @@
+import argparse
+import datetime
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from regions import ACTIVE_REGION, DATA_DIR, load_regions
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.path.join(DATA_DIR, ".pipeline_state.json")
+RUNS_LOG_PATH = os.path.join(DATA_DIR, ".pipeline_runs.jsonl")
+HASH_CHUNK = 1 << 20
+# Regions run side by side by default; each also runs --workers stage threads
+REGION_WORKERS = 2
+
+
+class Stage:
+    """One pipeline step with declared inputs and outputs.
+
+    ``inputs`` and ``outputs`` are paths or glob patterns; a stage depends on
+    every stage that declares one of its inputs as an output. ``params`` are
+    hashed together with the input files, so changing e.g. the imputation
+    strategy reruns the stage. External stages talk to a web service and only
+    run when requested (``--fetch``) or when their outputs are missing.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), params=None, external=False, enabled=None,
+                 description=""):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.external = external
+        self.enabled = enabled
+        self.description = description
+
+    def is_enabled(self):
+        return self.enabled is None or self.enabled()
+
+    def outputs_exist(self):
+        return all(glob.glob(pattern) for pattern in self.outputs)
+
+
+class FileHasher:
+    """SHA-1 of file contents, re-hashing a file only when its mtime or size changed."""
+
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+        self._lock = threading.Lock()
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        signature = [stat.st_mtime_ns, stat.st_size]
+        with self._lock:
+            entry = self.known.get(path)
+        if entry is not None and entry[:2] == signature:
+            return entry[2]
+
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+        with self._lock:
+            self.known[path] = signature + [digest.hexdigest()]
+        return digest.hexdigest()
+
+    def digest(self, patterns, params):
+        """Returns (digest of all matching files and params, {path: file hash})."""
+        files = {path: self.file_hash(path)
+                 for pattern in patterns for path in sorted(glob.glob(pattern)) if os.path.isfile(path)}
+        digest = hashlib.sha1(json.dumps([files, params], sort_keys=True, default=str).encode())
+        return digest.hexdigest(), files
+
+
+class Pipeline:
+    """Runs stages in dependency order, in parallel where possible, skipping unchanged ones.
+
+    A stage is skipped when the hash of its input files and params equals the
+    one of its last successful run and its outputs still exist. Stages start
+    as soon as everything they depend on has finished, on up to ``workers``
+    threads. Per-stage timings are kept in the state file and every run is
+    appended to a JSON lines log.
+    """
+
+    def __init__(self, stages, state_path=STATE_PATH, runs_log_path=RUNS_LOG_PATH, workers=4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = state_path
+        self.runs_log_path = runs_log_path
+        self.workers = workers
+        self.state = self._read_state()
+        self.hasher = FileHasher(self.state.get("hashes"))
+        self._lock = threading.Lock()
+
+    def dependencies(self, name):
+        """Returns the names of the stages producing one of the stage's inputs."""
+        inputs = set(self.stages[name].inputs)
+        return {other.name for other in self.stages.values()
+                if other.name != name and inputs & set(other.outputs)}
+
+    def plan(self, selected=None):
+        """Returns the selected stages plus everything they depend on, in dependency order."""
+        wanted, todo = set(), list(selected or self.stages)
+        while todo:
+            name = todo.pop()
+            if name not in wanted:
+                wanted.add(name)
+                todo.extend(self.dependencies(name))
+
+        ordered, done = [], set()
+        while len(ordered) < len(wanted):
+            ready = [name for name in self.stages
+                     if name in wanted and name not in done and self.dependencies(name) & wanted <= done]
+            if not ready:
+                raise ValueError(f"Dependency cycle between stages {sorted(wanted - done)}")
+            ordered.extend(ready)
+            done.update(ready)
+        return ordered
+
+    def should_run(self, stage, force=False, fetch=False):
+        """Returns (run?, reason, input digest, input files)."""
+        if not stage.is_enabled():
+            return False, "disabled", None, None
+        if stage.external and not fetch and stage.outputs_exist():
+            return False, "external, use --fetch", None, None
+
+        digest, files = self.hasher.digest(stage.inputs, stage.params)
+        last = self.state.get("stages", {}).get(stage.name, {})
+        if force:
+            return True, "forced", digest, files
+        if stage.external:
+            return True, "fetch" if stage.outputs_exist() else "outputs missing", digest, files
+        if not stage.outputs_exist():
+            return True, "outputs missing", digest, files
+        if last.get("status") != "ok" or last.get("inputs_digest") != digest:
+            changed = sorted(path for path, sha in files.items() if last.get("files", {}).get(path) != sha)
+            removed = set(last.get("files", {})) - set(files)
+            reason = f"{len(changed)} changed, {len(removed)} removed inputs" if last else "never run"
+            return True, reason, digest, files
+        return False, "unchanged", digest, files
+
+    def run(self, selected=None, force=False, fetch=False, dry_run=False):
+        """Runs the plan; returns {stage: result dict with status, reason and seconds}."""
+        order = self.plan(selected)
+        results = {}
+        started_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            running = {}
+            pending = list(order)
+            while pending or running:
+                for name in list(pending):
+                    dependencies = self.dependencies(name) & set(order)
+                    if not dependencies <= set(results):
+                        continue
+                    pending.remove(name)
+                    failed = [dep for dep in dependencies if results[dep]["status"] in ("failed", "blocked")]
+                    if failed:
+                        results[name] = {"status": "blocked", "reason": f"{', '.join(failed)} failed", "seconds": 0.0}
+                        continue
+                    upstream_ran = any(results[dep]["status"] in ("ok", "would run") for dep in dependencies)
+                    if dry_run:
+                        run, reason, _, _ = self.should_run(self.stages[name], force, fetch)
+                        if upstream_ran and not run and self.stages[name].is_enabled():
+                            run, reason = True, "upstream may change"
+                        results[name] = {"status": "would run" if run else "skipped", "reason": reason,
+                                         "seconds": 0.0}
+                        continue
+                    running[executor.submit(self._run_stage, self.stages[name], force, fetch)] = name
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    results[running.pop(future)] = future.result()
+
+        if not dry_run:
+            self._log_run(started_at, results)
+        return {name: results[name] for name in order}
+
+    def _run_stage(self, stage, force, fetch):
+        run, reason, digest, files = self.should_run(stage, force, fetch)
+        if not run:
+            return {"status": "skipped", "reason": reason, "seconds": 0.0}
+
+        print(f"[{stage.name}] running ({reason})")
+        start = time.perf_counter()
+        try:
+            stage.func(**stage.params)
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            print(f"ERROR stage {stage.name} failed after {seconds:.1f} s: {e!r}")
+            self._record(stage.name, {"status": "failed", "error": repr(e), "seconds": seconds})
+            return {"status": "failed", "reason": repr(e), "seconds": seconds}
+
+        seconds = time.perf_counter() - start
+        if stage.external:
+            # Record what the next offline run compares against
+            digest, files = self.hasher.digest(stage.inputs, stage.params)
+        self._record(stage.name, {"status": "ok", "inputs_digest": digest, "files": files, "seconds": seconds})
+        print(f"[{stage.name}] done in {seconds:.1f} s")
+        return {"status": "ok", "reason": reason, "seconds": seconds}
+
+    def _record(self, name, entry):
+        entry["finished_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        with self._lock:
+            self.state.setdefault("stages", {})[name] = entry
+            self.state["hashes"] = self.hasher.known
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.state, f, indent=1)
+            os.replace(tmp_path, self.state_path)
+
+    def _read_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _log_run(self, started_at, results):
+        with open(self.runs_log_path, "a") as f:
+            f.write(json.dumps({"started_at": started_at, "stages": results}) + "\n")
+
+
+def build_stages(fetch=False, strategy="knn", retrain=False, history_days=365):
+    """Returns the pipeline stages; the step functions are imported only when they run."""
+    import storage
+    from data_combining import data_folder
+    from data_handling import HOURLY_OUTPUT_FOLDER, OUTPUT_FOLDER, SENSORS_PATH
+    from geocoding import GEOCODE_CACHE_PATH
+    from tiers import MANIFEST_NAME, TIERS_DIR
+    from analytics import ANALYTICS_DIR
+
+    daily_files = os.path.join(OUTPUT_FOLDER, "sensor_*.csv")
+    hourly_files = os.path.join(HOURLY_OUTPUT_FOLDER, "sensor_*.csv")
+    aligned_raw = storage.find_dataset("aligned_raw")
+    aligned_filled = storage.find_dataset("aligned_filled")
+    forecast = storage.find_dataset("forecast")
+
+    def fetch_locations():
+        from main import fetch_locations
+        print(f"[locations] saved {fetch_locations()} rows")
+
+    def download(hourly=False):
+        from data_handling import download
+        today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        counts = download(today - datetime.timedelta(days=history_days), today, sync=True, hourly=hourly)
+        print(f"[download] {sum(counts.values())} new measurements for {len(counts)} sensors")
+
+    def geocode(offline):
+        from geocoding import update_cache
+        update_cache(offline=offline)
+
+    def combine():
+        import data_combining
+        data_combining.main(verbose=False)
+
+    def impute(strategy):
+        from data_analysis import impute
+        from ingestion import Journal, matrix_end
+        impute(strategy)
+        # Live readings of the days now in the matrix are not needed any more
+        dropped = Journal().compact(matrix_end())
+        if dropped:
+            print(f"[impute] dropped {dropped} absorbed readings from the live journal")
+
+    def train(retrain):
+        # TensorFlow is loaded in its own process: the other stages run as threads
+        # of this one and start process pools, which must not inherit its state
+        subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, "model.py")] + (["--retrain"] if retrain else []),
+                       cwd=SCRIPT_DIR, check=True)
+
+    def summarize_history():
+        from home import HistoryDataProcessor
+        # Only files whose mtime or size changed are summarized again
+        processor = HistoryDataProcessor(data_folder)
+        try:
+            processor.process_sensor_files()
+        finally:
+            processor.close()
+
+    def update_analytics():
+        from analytics import AnalyticsStore
+        print(f"[analytics] {AnalyticsStore().update(OUTPUT_FOLDER)} new days")
+
+    def update_tiers():
+        from tiers import AggregatePyramid
+        AggregatePyramid().update(HOURLY_OUTPUT_FOLDER)
+
+    hourly_enabled = lambda: os.path.isdir(HOURLY_OUTPUT_FOLDER)
+    return [
+        Stage("locations", fetch_locations, outputs=[SENSORS_PATH], external=True,
+              description="sensor metadata from OpenAQ (main.py)"),
+        Stage("download", download, inputs=[SENSORS_PATH], outputs=[daily_files], external=True,
+              description="new daily measurements of every sensor (data_handling.py --sync)"),
+        Stage("download_hourly", download, inputs=[SENSORS_PATH], outputs=[hourly_files], params={"hourly": True},
+              external=True, enabled=hourly_enabled,
+              description="new hourly measurements, once data/hourly_data exists"),
+        Stage("geocode", geocode, inputs=[SENSORS_PATH], outputs=[GEOCODE_CACHE_PATH],
+              params={"offline": not fetch}, description="map coordinates of new locations (geocoding.py)"),
+        Stage("combine", combine, inputs=[daily_files], outputs=[aligned_raw],
+              description="days x sensors PM2.5 matrix (data_combining.py)"),
+        Stage("impute", impute, inputs=[aligned_raw], outputs=[aligned_filled], params={"strategy": strategy},
+              description="fill missing values, only new days when possible (data_analysis.py)"),
+        Stage("forecast", train, inputs=[aligned_filled], outputs=[forecast], params={"retrain": retrain},
+              description="fine-tune the LSTM and forecast (model.py)"),
+        Stage("history", summarize_history, inputs=[daily_files],
+              outputs=[os.path.join(DATA_DIR, "history_summary.json")],
+              description="per-sensor history summaries for the dashboard"),
+        Stage("analytics", update_analytics, inputs=[daily_files],
+              outputs=[os.path.join(ANALYTICS_DIR, MANIFEST_NAME)],
+              description="rolling means, AQI and WHO exceedances per sensor (analytics.py)"),
+        Stage("tiers", update_tiers, inputs=[hourly_files], outputs=[os.path.join(TIERS_DIR, MANIFEST_NAME)],
+              enabled=hourly_enabled, description="hourly/daily/weekly aggregate tiers (tiers.py)"),
+    ]
+
+
+def run_regions(regions, argv, workers):
+    """Runs the pipeline of every region in its own process, up to ``workers`` regions at a time.
+
+    Each region has its own data directory and state file, so regions never
+    wait on or invalidate each other. Returns {region: (exit code, seconds)}.
+    """
+    def run(region):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), *argv], cwd=SCRIPT_DIR,
+                                   env=dict(os.environ, AQ_REGION=region), capture_output=True, text=True)
+        return completed, time.perf_counter() - start
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run, region): region for region in regions}
+        for future in as_completed(futures):
+            completed, seconds = future.result()
+            region = futures[future]
+            # Printed whole, so the output of regions running side by side does not interleave
+            print(f"===== {region} (exit {completed.returncode}, {seconds:.1f} s)", flush=True)
+            print(completed.stdout + completed.stderr, flush=True)
+            results[region] = (completed.returncode, seconds)
+    return {region: results[region] for region in regions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the data pipeline, skipping stages whose inputs are unchanged.")
+    parser.add_argument("stages", nargs="*", help="stages to run together with their dependencies (default: all)")
+    parser.add_argument("--fetch", action="store_true", help="also run the stages that call OpenAQ and Nominatim")
+    parser.add_argument("--force", action="store_true", help="run the stages even if their inputs are unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="only show which stages would run")
+    parser.add_argument("--list", action="store_true", help="list the stages and their dependencies")
+    parser.add_argument("--workers", type=int, default=4, help="stages run in parallel")
+    parser.add_argument("--strategy", default="knn", help="imputation strategy, see data_analysis.py")
+    parser.add_argument("--retrain", action="store_true", help="train the forecasting model from scratch")
+    parser.add_argument("--region", action="append", dest="regions", metavar="NAME",
+                        help=f"region to run, repeat for several (default: AQ_REGION, now {ACTIVE_REGION})")
+    parser.add_argument("--all-regions", action="store_true", help="run every region of regions.py")
+    parser.add_argument("--region-workers", type=int, default=REGION_WORKERS,
+                        help="regions run in parallel, each with --workers stage threads")
+    args = parser.parse_args()
+
+    # Every step uses paths relative to my_scripts
+    os.chdir(SCRIPT_DIR)
+    pipeline = Pipeline(build_stages(fetch=args.fetch, strategy=args.strategy, retrain=args.retrain),
+                        workers=args.workers)
+
+    if args.list:
+        for name in pipeline.plan():
+            stage = pipeline.stages[name]
+            after = ", ".join(sorted(pipeline.dependencies(name))) or "-"
+            print(f"{name:<16} after {after:<20} {stage.description}")
+        return
+
+    unknown = set(args.stages) - set(pipeline.stages)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    regions = sorted(load_regions()) if args.all_regions else args.regions
+    if regions and regions != [ACTIVE_REGION]:
+        unknown = set(regions) - set(load_regions())
+        if unknown:
+            parser.error(f"unknown regions: {', '.join(sorted(unknown))}, add them with regions.py --add")
+        flags = [flag for flag, on in (("--fetch", args.fetch), ("--force", args.force), ("--dry-run", args.dry_run),
+                                       ("--retrain", args.retrain)) if on]
+        argv = [*args.stages, *flags, f"--workers={args.workers}", f"--strategy={args.strategy}"]
+        results = run_regions(regions, argv, args.region_workers)
+        print(f"\n{'region':<16} {'status':<10} {'seconds':>8}")
+        for region, (code, seconds) in results.items():
+            print(f"{region:<16} {'ok' if code == 0 else 'failed':<10} {seconds:8.1f}")
+        if any(code != 0 for code, _ in results.values()):
+            raise SystemExit(1)
+        return
+
+    results = pipeline.run(args.stages or None, force=args.force, fetch=args.fetch, dry_run=args.dry_run)
+    print(f"\n{'stage':<16} {'status':<10} {'seconds':>8}  reason")
+    for name, result in results.items():
+        print(f"{name:<16} {result['status']:<10} {result['seconds']:8.1f}  {result['reason']}")
+    if any(result["status"] in ("failed", "blocked") for result in results.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
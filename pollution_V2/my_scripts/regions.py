@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import re
+
+BASE_DIR = "../data"
+REGIONS_PATH = os.path.join(BASE_DIR, "regions.json")
+DEFAULT_REGION = "yerevan"
+# The bbox defines a rectangular geographic area (west, south, east, north) to limit the search
+DEFAULT_BBOX = (44.40, 40.10, 44.65, 40.32)
+# Region this process works on, e.g. AQ_REGION=tbilisi python pipeline.py
+ACTIVE_REGION = os.environ.get("AQ_REGION", DEFAULT_REGION)
+NAME_PATTERN = re.compile(r"[a-z0-9][a-z0-9_-]*")
+
+
+def region_dir(name):
+    """Returns the data directory of a region.
+
+    The default region keeps the original layout directly in ``data/``, so
+    existing installations need no migration; every other region gets the same
+    layout under ``data/regions/<name>/``.
+    """
+    return BASE_DIR if name == DEFAULT_REGION else os.path.join(BASE_DIR, "regions", name)
+
+
+# Every data path of the other modules lives in this directory
+DATA_DIR = region_dir(ACTIVE_REGION)
+
+
+def relocate(path, region):
+    """Returns the path of the same file in another region's directory, e.g. for a module's path constant."""
+    return os.path.join(region_dir(region), os.path.relpath(path, DATA_DIR))
+
+
+def load_regions(path=REGIONS_PATH):
+    """Returns {name: {"label", "bbox"}} of every configured region, always including the default one."""
+    regions = {DEFAULT_REGION: {"label": DEFAULT_REGION.title(), "bbox": list(DEFAULT_BBOX)}}
+    try:
+        with open(path) as f:
+            regions.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    return regions
+
+
+def get_region(name, path=REGIONS_PATH):
+    """Returns the configuration of one region; raises KeyError for unknown names."""
+    regions = load_regions(path)
+    if name not in regions:
+        raise KeyError(f"Unknown region {name!r}, expected one of {sorted(regions)}")
+    return regions[name]
+
+
+def add_region(name, bbox, label=None, path=REGIONS_PATH):
+    """Adds or updates a region and creates its data directory; returns that directory."""
+    if not NAME_PATTERN.fullmatch(name):
+        raise ValueError(f"Region names are lowercase letters, digits, '-' and '_', got {name!r}")
+    west, south, east, north = bbox
+    if not (-180 <= west < east <= 180 and -90 <= south < north <= 90):
+        raise ValueError(f"Invalid bbox {bbox}, expected west south east north in degrees")
+
+    try:
+        with open(path) as f:
+            regions = json.load(f)
+    except FileNotFoundError:
+        regions = {}
+    regions[name] = {"label": label or name.replace("_", " ").replace("-", " ").title(), "bbox": list(bbox)}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(regions, f, indent=2)
+    os.replace(tmp_path, path)
+
+    os.makedirs(region_dir(name), exist_ok=True)
+    return region_dir(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or add the regions whose sensors are tracked.")
+    parser.add_argument("--add", metavar="NAME", help="add a region, e.g. --add tbilisi --bbox 44.7 41.6 45.0 41.8")
+    parser.add_argument("--bbox", nargs=4, type=float, metavar=("WEST", "SOUTH", "EAST", "NORTH"))
+    parser.add_argument("--label", help="name shown on the dashboard")
+    args = parser.parse_args()
+
+    if args.add:
+        if args.bbox is None:
+            parser.error("--add needs --bbox")
+        directory = add_region(args.add, args.bbox, args.label)
+        print(f"Added region {args.add} in {directory}. Fetch its sensors with: "
+              f"AQ_REGION={args.add} python pipeline.py --fetch")
+        return
+
+    for name, region in sorted(load_regions().items()):
+        print(f"{name:<16} {region['label']:<20} bbox {region['bbox']}  {region_dir(name)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import copy
+import numpy as np
+import pandas as pd
+
+SENSOR_PREFIX = "sensor_"
+
+
+def epoch_days(index):
+    """Returns the local calendar day of each timestamp as days since 1970-01-01."""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)  # keep the wall-clock date of each reading
+    return index.to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+
+def to_day(value):
+    """Returns a date, timestamp or date string as days since 1970-01-01."""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_localize(None)
+    return int(np.datetime64(timestamp, "D").astype(np.int64))
+
+
+class SensorStore:
+    """Days x sensors PM2.5 matrix as float32 with a validity bitmask and an epoch-day index.
+
+    ``days`` holds the sorted local calendar days present in the data (gaps are
+    not filled), ``values`` one float32 column per sensor with NaN where there
+    is no reading, and ``valid_bits`` the same cells packed eight sensors to a
+    byte. Sensor IDs map to columns through a dict and date ranges to rows by
+    binary search, so lookups never scan the matrix. Instances are read-only
+    and may be backed by memory-mapped arrays, see ``SharedMatrix``.
+    """
+
+    def __init__(self, days, sensor_ids, values, valid_bits=None, tz=None, index_name=None):
+        self.days = np.asarray(days, dtype=np.int64)
+        self.sensor_ids = [str(sensor_id) for sensor_id in sensor_ids]
+        self.values = np.asarray(values, dtype=np.float32)
+        if valid_bits is None:
+            valid_bits = np.packbits(~np.isnan(self.values), axis=1)
+        self.valid_bits = valid_bits
+        self.tz = tz
+        self.index_name = index_name
+        self._positions = {sensor_id: i for i, sensor_id in enumerate(self.sensor_ids)}
+        if self.values.shape != (len(self.days), len(self.sensor_ids)):
+            raise ValueError(f"values of shape {self.values.shape} do not match "
+                             f"{len(self.days)} days x {len(self.sensor_ids)} sensors")
+
+    @classmethod
+    def from_frame(cls, df):
+        """Builds a store from the daily ``sensor_<id>`` columns of a wide frame."""
+        columns = [col for col in df.columns if col.startswith(SENSOR_PREFIX)]
+        days = epoch_days(df.index)
+        if len(days) > 1 and not (np.diff(days) > 0).all():
+            raise ValueError("the frame must hold at most one row per day, in ascending order")
+        return cls(days, [col[len(SENSOR_PREFIX):] for col in columns], df[columns].to_numpy(dtype=np.float32),
+                   tz=df.index.tz, index_name=df.index.name)
+
+    def __len__(self):
+        return len(self.days)
+
+    def __contains__(self, sensor_id):
+        return sensor_id in self._positions
+
+    @property
+    def columns(self):
+        """Returns the ``sensor_<id>`` column names used by the frames on disk."""
+        return [SENSOR_PREFIX + sensor_id for sensor_id in self.sensor_ids]
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.valid_bits.nbytes + self.days.nbytes
+
+    def position(self, sensor_id):
+        """Returns the column of a sensor; raises KeyError for unknown IDs."""
+        return self._positions[sensor_id]
+
+    def rows(self, start=None, end=None):
+        """Returns the slice of rows from day ``start`` to day ``end``, both included."""
+        first = 0 if start is None else int(np.searchsorted(self.days, to_day(start), side="left"))
+        last = len(self.days) if end is None else int(np.searchsorted(self.days, to_day(end), side="right"))
+        return slice(first, max(first, last))
+
+    def recent(self, days):
+        """Returns the slice of rows within ``days`` days of the last day."""
+        if not len(self.days):
+            return slice(0, 0)
+        return slice(int(np.searchsorted(self.days, self.days[-1] - days, side="left")), len(self.days))
+
+    def select(self, sensor_ids=None, start=None, end=None):
+        """Returns a store limited to some sensors and dates; row slices share memory with this one."""
+        rows = self.rows(start, end)
+        if sensor_ids is None:
+            return SensorStore(self.days[rows], self.sensor_ids, self.values[rows], self.valid_bits[rows],
+                               self.tz, self.index_name)
+        positions = [self.position(sensor_id) for sensor_id in sensor_ids]
+        return SensorStore(self.days[rows], sensor_ids, self.values[rows][:, positions],
+                           tz=self.tz, index_name=self.index_name)
+
+    def valid(self, rows=slice(None)):
+        """Returns the boolean validity matrix of the given rows."""
+        return np.unpackbits(self.valid_bits[rows], axis=1, count=len(self.sensor_ids)).astype(bool)
+
+    def valid_counts(self):
+        """Returns the number of readings of each sensor."""
+        return self.valid().sum(axis=0)
+
+    def index(self, rows=slice(None)):
+        """Returns the days of the given rows as a DatetimeIndex in the data's timezone."""
+        index = pd.DatetimeIndex(self.days[rows].astype("datetime64[D]"), name=self.index_name)
+        return index if self.tz is None else index.tz_localize(self.tz)
+
+    def labels(self, rows=slice(None), fmt="%Y-%m-%d"):
+        """Returns the days of the given rows formatted with ``fmt``; ISO dates skip strftime."""
+        if fmt == "%Y-%m-%d":
+            return np.datetime_as_string(self.days[rows].astype("datetime64[D]")).tolist()
+        return self.index(rows).strftime(fmt).tolist()
+
+    def to_frame(self, rows=slice(None)):
+        """Returns the given rows as a wide frame with ``sensor_<id>`` columns."""
+        return pd.DataFrame(self.values[rows], index=self.index(rows), columns=self.columns)
+
+
+class LiveSensorStore:
+    """Writable copy of a ``SensorStore`` that takes new daily readings in place.
+
+    Rows are allocated with spare capacity, so a reading for a new last day costs
+    O(sensors) amortized and a correction of an existing day O(1). ``snapshot``
+    returns a ``SensorStore`` over the rows filled so far; a snapshot never sees
+    rows appended after it was taken. Readings for sensors the store does not
+    have are skipped.
+    """
+
+    def __init__(self, store, spare_days=32):
+        self.base = store
+        self._size = len(store)
+        self._allocate(self._size + spare_days, store.days, store.values, store.valid_bits)
+        self._snapshot = None
+
+    def _allocate(self, capacity, days, values, valid_bits):
+        n_sensors = len(self.base.sensor_ids)
+        self._days = np.zeros(capacity, dtype=np.int64)
+        self._values = np.full((capacity, n_sensors), np.nan, dtype=np.float32)
+        self._bits = np.zeros((capacity, valid_bits.shape[1]), dtype=np.uint8)
+        self._days[:len(days)] = days
+        self._values[:len(days)] = values
+        self._bits[:len(days)] = valid_bits
+
+    def _row(self, day):
+        """Returns the row of ``day``, adding an empty one if the day is new."""
+        n = self._size
+        if n and self._days[n - 1] == day:
+            return n - 1
+        i = int(np.searchsorted(self._days[:n], day))
+        if i < n and self._days[i] == day:
+            return i
+        if i < n or n == len(self._days):
+            # A day inside the data or a full buffer: copy into new buffers so
+            # earlier snapshots keep their rows unchanged
+            days = np.insert(self._days[:n], i, day)
+            values = np.insert(self._values[:n], i, np.nan, axis=0)
+            bits = np.insert(self._bits[:n], i, 0, axis=0)
+            self._allocate(max(2 * len(self._days), n + 1), days, values, bits)
+        else:
+            self._days[i] = day
+        self._size = n + 1
+        return i
+
+    def apply(self, readings):
+        """Writes (sensor_id, epoch day, value) readings; returns the set of updated sensor IDs."""
+        updated = set()
+        for sensor_id, day, value in readings:
+            position = self.base._positions.get(sensor_id)
+            if position is None or value is None or np.isnan(value):
+                continue
+            row = self._row(day)
+            self._values[row, position] = value
+            self._bits[row, position >> 3] |= 0x80 >> (position & 7)
+            updated.add(sensor_id)
+        if updated:
+            self._snapshot = None
+        return updated
+
+    def snapshot(self):
+        """Returns a read-only ``SensorStore`` of the current rows."""
+        if self._snapshot is None:
+            snapshot = copy.copy(self.base)
+            snapshot.days = self._days[:self._size]
+            snapshot.values = self._values[:self._size]
+            snapshot.valid_bits = self._bits[:self._size]
+            self._snapshot = snapshot
+        return self._snapshot
@@ -0,0 +1,73 @@
+import argparse
+import os
+from home import LIVE_UPDATES, MAX_STREAMS, create_app
+
+DEFAULT_BIND = os.environ.get("AQ_BIND", "0.0.0.0:8000")
+DEFAULT_WORKERS = int(os.environ.get("AQ_WORKERS", min(2 * (os.cpu_count() or 1) + 1, 8)))
+DEFAULT_THREADS = int(os.environ.get("AQ_THREADS", 4))
+# Threads a worker keeps for other requests while its live streams are open
+FREE_THREADS = 2
+
+
+def serve_gunicorn(bind, workers, threads, timeout, live):
+    """Runs the app under gunicorn; each worker builds its own app and maps the shared matrix."""
+    from gunicorn.app.base import BaseApplication
+
+    if live and threads < MAX_STREAMS + FREE_THREADS:
+        # Each open stream holds a thread of the gthread worker for as long as the page is open
+        threads = MAX_STREAMS + FREE_THREADS
+        print(f"Live updates keep up to {MAX_STREAMS} streams open per worker, serving with {threads} threads.")
+
+    class DashboardApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", bind)
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("timeout", timeout)
+            self.cfg.set("graceful_timeout", timeout)
+            # No preload: the background watcher thread must start inside each worker
+            self.cfg.set("preload_app", False)
+
+        def load(self):
+            return create_app(live=live)
+
+    DashboardApplication().run()
+
+
+def serve_werkzeug(bind, workers, threads, live):
+    """Fallback without gunicorn (e.g. on Windows): werkzeug with processes or threads, not both."""
+    from werkzeug.serving import run_simple
+
+    host, port = bind.rsplit(":", 1)
+    if workers > 1 and os.name != "posix":
+        print("WARNING multiple processes need fork, serving with threads only.")
+        workers = 1
+    if live and workers > 1:
+        # A process without threads would be blocked by the first open stream
+        print("WARNING live updates need threads, serving with threads only.")
+        workers = 1
+    run_simple(host, int(port), create_app(live=live), use_reloader=False, use_debugger=False,
+               threaded=workers == 1 and (threads > 1 or live), processes=workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard with production settings.")
+    parser.add_argument("--bind", default=DEFAULT_BIND, help="HOST:PORT (env AQ_BIND)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="worker processes (env AQ_WORKERS)")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="threads per worker (env AQ_THREADS)")
+    parser.add_argument("--timeout", type=int, default=60, help="worker timeout in seconds")
+    parser.add_argument("--live", action="store_true", default=LIVE_UPDATES,
+                        help="apply readings from ingestion.py and push them to open pages (env AQ_LIVE=1)")
+    args = parser.parse_args()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("gunicorn is not installed, falling back to the werkzeug server.")
+        serve_werkzeug(args.bind, args.workers, args.threads, args.live)
+    else:
+        serve_gunicorn(args.bind, args.workers, args.threads, args.timeout, args.live)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import json
+import os
+import numpy as np
+from regions import DATA_DIR
+from sensor_store import SensorStore
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking on Windows, conversions may just repeat
+    fcntl = None
+
+SHARED_DIR = os.path.join(DATA_DIR, ".shared")
+# Bumped when the files change shape, so matrices written by older code are converted again
+LAYOUT_VERSION = 2
+
+
+class SharedMatrix:
+    """A ``SensorStore`` kept as memory-mapped ``.npy`` files.
+
+    The first process to need a given version of the source file converts it
+    once; every other process (e.g. each WSGI worker) memory-maps the same
+    files read-only, so the operating system keeps a single copy of the values
+    in its page cache no matter how many workers serve requests.
+    """
+
+    def __init__(self, shared_dir=SHARED_DIR):
+        self.shared_dir = shared_dir
+
+    def load(self, source_path, signature, read_func):
+        """Returns a read-only store backed by the memory-mapped matrix of source_path.
+
+        ``signature`` identifies the source version and ``read_func(path)`` parses
+        the source into a ``SensorStore`` when no matrix exists for that version yet.
+        """
+        os.makedirs(self.shared_dir, exist_ok=True)
+        name = os.path.splitext(os.path.basename(source_path))[0]
+        version = "{}_{}_{}_v{}".format(name, *signature, LAYOUT_VERSION)
+        base = os.path.join(self.shared_dir, version)
+
+        if not os.path.exists(base + ".meta.json"):
+            with self._lock(base):
+                # Another worker may have converted it while we waited for the lock
+                if not os.path.exists(base + ".meta.json"):
+                    self._write(base, read_func(source_path))
+                    self._remove_stale(name, version)
+        return self._read(base)
+
+    def _write(self, base, store):
+        for part, array in (("values", store.values), ("valid", store.valid_bits), ("days", store.days)):
+            np.save(f"{base}.{part}.tmp.npy", array)
+            os.replace(f"{base}.{part}.tmp.npy", f"{base}.{part}.npy")
+        meta = {"sensor_ids": store.sensor_ids, "index_name": store.index_name,
+                "tz": str(store.tz) if store.tz is not None else None}
+        # The metadata file is written last and marks the matrix as complete
+        with open(base + ".meta.tmp.json", "w") as f:
+            json.dump(meta, f)
+        os.replace(base + ".meta.tmp.json", base + ".meta.json")
+
+    def _read(self, base):
+        with open(base + ".meta.json") as f:
+            meta = json.load(f)
+        return SensorStore(np.load(base + ".days.npy"), meta["sensor_ids"],
+                           np.load(base + ".values.npy", mmap_mode="r"),
+                           np.load(base + ".valid.npy", mmap_mode="r"),
+                           tz=meta["tz"], index_name=meta["index_name"])
+
+    def _remove_stale(self, name, current_version):
+        for file in os.listdir(self.shared_dir):
+            if file.startswith(name + "_") and not file.startswith(current_version + "."):
+                try:
+                    os.remove(os.path.join(self.shared_dir, file))
+                except OSError:
+                    pass  # still mapped by a worker on some platforms; retried next time
+
+    def _lock(self, base):
+        return FileLock(base + ".lock")
+
+
+class FileLock:
+    """Exclusive lock on a sidecar file, held across processes (flock) and threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "w")
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
@@ -0,0 +1,97 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def unit_vectors(lat, lon):
+    """Returns points on the unit sphere; straight-line distances between them order like great-circle ones."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+def km_to_chord(km):
+    return 2 * np.sin(min(km / (2 * EARTH_RADIUS_KM), np.pi / 2))
+
+
+class SpatialIndex:
+    """Sensor coordinates in a KD-tree for nearest-sensor, viewport and interpolation queries.
+
+    Sensors are stored as unit vectors, so the tree's Euclidean nearest
+    neighbours are the nearest sensors on the globe and distances convert
+    exactly to kilometres. Viewport queries binary-search a latitude-sorted
+    copy and filter its band by longitude. A query costs O(log n + results)
+    instead of a scan of every sensor. Instances are read-only.
+    """
+
+    def __init__(self, coordinates):
+        self.sensor_ids = sorted(coordinates)
+        self.lat = np.array([coordinates[sensor_id]["lat"] for sensor_id in self.sensor_ids], dtype=np.float64)
+        self.lon = np.array([coordinates[sensor_id]["lon"] for sensor_id in self.sensor_ids], dtype=np.float64)
+        self._positions = {sensor_id: i for i, sensor_id in enumerate(self.sensor_ids)}
+        self._tree = cKDTree(unit_vectors(self.lat, self.lon)) if self.sensor_ids else None
+        self._by_lat = np.argsort(self.lat, kind="stable")
+        self._sorted_lat = self.lat[self._by_lat]
+
+    def __len__(self):
+        return len(self.sensor_ids)
+
+    def __contains__(self, sensor_id):
+        return sensor_id in self._positions
+
+    def point(self, sensor_id):
+        """Returns the (lat, lon) of a sensor; raises KeyError for unknown IDs."""
+        i = self._positions[sensor_id]
+        return float(self.lat[i]), float(self.lon[i])
+
+    def subset(self, sensor_ids):
+        """Returns an index of only the given sensors, e.g. the ones with a current reading."""
+        keep = set(sensor_ids)
+        return SpatialIndex({sensor_id: {"lat": lat, "lon": lon}
+                             for sensor_id, lat, lon in zip(self.sensor_ids, self.lat, self.lon) if sensor_id in keep})
+
+    def nearest(self, lat, lon, k=5, max_km=None):
+        """Returns up to ``k`` (sensor_id, distance in km) pairs, nearest first."""
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+        bound = np.inf if max_km is None else km_to_chord(max_km)
+        chords, positions = self._tree.query(unit_vectors([lat], [lon])[0], k=k, distance_upper_bound=bound)
+        chords, positions = np.atleast_1d(chords), np.atleast_1d(positions)
+        found = np.isfinite(chords)  # missing neighbours beyond max_km come back as inf
+        return [(self.sensor_ids[i], float(km)) for i, km in zip(positions[found], chord_to_km(chords[found]))]
+
+    def within(self, south, west, north, east):
+        """Returns the sensor IDs inside a bounding box; ``west > east`` crosses the antimeridian."""
+        first = np.searchsorted(self._sorted_lat, south, side="left")
+        last = np.searchsorted(self._sorted_lat, north, side="right")
+        band = self._by_lat[first:last]
+        lon = self.lon[band]
+        inside = (lon >= west) & (lon <= east) if west <= east else (lon >= west) | (lon <= east)
+        return [self.sensor_ids[i] for i in np.sort(band[inside])]
+
+    def idw(self, lat, lon, values, k=8, power=2.0, max_km=None):
+        """Estimates a value at a point by inverse-distance weighting of the ``k`` nearest sensors.
+
+        ``values`` maps sensor IDs to readings and must cover every sensor of the
+        index (see ``subset``). Returns (estimate, [(sensor_id, km, value,
+        weight), ...]); the estimate is None when no sensor is within ``max_km``.
+        A sensor closer than a metre gives its own value.
+        """
+        neighbours = self.nearest(lat, lon, k, max_km)
+        if not neighbours:
+            return None, []
+        distances = np.array([km for _, km in neighbours])
+        readings = np.array([values[sensor_id] for sensor_id, _ in neighbours], dtype=np.float64)
+        if distances[0] < 1e-3:
+            weights = (distances == distances[0]).astype(np.float64)
+        else:
+            weights = 1.0 / distances ** power
+        weights /= weights.sum()
+        estimate = float(weights @ readings)
+        return estimate, [(sensor_id, km, float(value), float(weight))
+                          for (sensor_id, km), value, weight in zip(neighbours, readings, weights)]
@@ -0,0 +1,159 @@
+import os
+import sys
+import pandas as pd
+from regions import DATA_DIR
+
+# Logical dataset names used by the pipeline stages and the dashboard
+DATASETS = {
+    "aligned_raw": "aligned_sensors_data_pm25_only",
+    "aligned_filled": "aligned_sensors_pm25_filled_knn",
+    "forecast": "new_forecast",
+}
+
+# Format used for newly written datasets, e.g. AQ_STORAGE_FORMAT=parquet
+DEFAULT_FORMAT = os.environ.get("AQ_STORAGE_FORMAT", "csv")
+
+
+class CSVBackend:
+    """Plain CSV files, readable everywhere but slow to parse."""
+
+    extension = ".csv"
+
+    def write(self, df, path):
+        df.to_csv(path)
+
+    def read(self, path, columns=None, memory_map=True):
+        header = pd.read_csv(path, nrows=0).columns
+        index_col = header[0]
+        usecols = None
+        if columns is not None:
+            usecols = [index_col] + [col for col in columns if col in header]
+
+        df = pd.read_csv(path, usecols=usecols, index_col=0, memory_map=memory_map)
+        df.index = pd.to_datetime(df.index)
+        if index_col.startswith("Unnamed"):
+            df.index.name = None
+        return df
+
+
+class ParquetBackend:
+    """Compressed columnar files with the datetime index stored natively."""
+
+    extension = ".parquet"
+
+    def write(self, df, path):
+        df.to_parquet(path, engine="pyarrow")
+
+    def read(self, path, columns=None, memory_map=True):
+        import pyarrow.parquet as pq
+
+        if columns is not None:
+            available = pq.read_schema(path).names
+            columns = [col for col in columns if col in available]
+        # read_pandas adds the stored index columns back to the projection
+        table = pq.read_pandas(path, columns=columns, memory_map=memory_map)
+        return table.to_pandas()
+
+
+class FeatherBackend:
+    """Arrow IPC files that can be memory-mapped without deserialization."""
+
+    extension = ".feather"
+
+    def write(self, df, path):
+        # Feather has no index support, so keep it as the first column
+        df = df.copy()
+        df.index.name = df.index.name or "index"
+        df.reset_index().to_feather(path, compression="uncompressed")
+
+    def read(self, path, columns=None, memory_map=True):
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        with pa.memory_map(path) as source:
+            schema_names = pa.ipc.open_file(source).schema.names
+        index_col = schema_names[0]
+        if columns is not None:
+            columns = [index_col] + [col for col in columns if col in schema_names]
+        table = feather.read_table(path, columns=columns, memory_map=memory_map)
+
+        df = table.to_pandas().set_index(index_col)
+        if index_col == "index":
+            df.index.name = None
+        return df
+
+
+BACKENDS = {
+    "csv": CSVBackend(),
+    "parquet": ParquetBackend(),
+    "feather": FeatherBackend(),
+}
+
+
+def format_of(path):
+    """Returns the storage format name for a file path based on its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".arrow":
+        return "feather"
+    for name, backend in BACKENDS.items():
+        if backend.extension == extension:
+            return name
+    raise ValueError(f"Unsupported storage format: {path}")
+
+
+def dataset_path(name, fmt=None, data_dir=DATA_DIR):
+    """Returns the path a dataset is written to in the given format."""
+    fmt = fmt or DEFAULT_FORMAT
+    return os.path.join(data_dir, DATASETS[name] + BACKENDS[fmt].extension)
+
+
+def find_dataset(name, fmt=None, data_dir=DATA_DIR):
+    """Returns the path of the most recently written copy of a dataset.
+
+    When several formats exist, e.g. a CSV left behind after the pipeline
+    switched to Parquet, the newest file wins whatever ``AQ_STORAGE_FORMAT``
+    the reader was started with; the given format only breaks ties and names
+    the path returned when there is no copy yet.
+    """
+    preferred = fmt or DEFAULT_FORMAT
+    newest, newest_mtime = None, None
+    for candidate in [preferred] + [f for f in BACKENDS if f != preferred]:
+        path = dataset_path(name, candidate, data_dir)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        if newest is None or mtime > newest_mtime:
+            newest, newest_mtime = path, mtime
+    return newest or dataset_path(name, preferred, data_dir)
+
+
+def write_frame(df, path):
+    """Writes a datetime-indexed frame atomically in the format implied by the path."""
+    tmp_path = f"{path}.tmp"
+    BACKENDS[format_of(path)].write(df, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_frame(path, columns=None, memory_map=True):
+    """Reads a datetime-indexed frame, optionally projecting to a subset of columns."""
+    return BACKENDS[format_of(path)].read(path, columns=columns, memory_map=memory_map)
+
+
+def convert_datasets(fmt, data_dir=DATA_DIR):
+    """One-shot conversion of every existing dataset to the given format."""
+    converted = []
+    for name in DATASETS:
+        source = find_dataset(name, data_dir=data_dir)
+        target = dataset_path(name, fmt, data_dir)
+        if not os.path.exists(source) or source == target:
+            continue
+        write_frame(read_frame(source), target)
+        converted.append(target)
+    return converted
+
+
+if __name__ == "__main__":
+    target_format = sys.argv[1] if len(sys.argv) > 1 else "parquet"
+    for path in convert_datasets(target_format):
+        print("Converted", path)
@@ -0,0 +1,126 @@
+import os
+import numpy as np
+import pandas as pd
+
+TIMEZONE = "+04:00"
+
+
+def daily_index(days, end="2025-11-16"):
+    """Returns ``days`` consecutive local midnights ending at ``end``."""
+    return pd.date_range(end=end, periods=days, freq="D", tz=TIMEZONE)
+
+
+def sensor_values(days, rng):
+    """Returns a seasonal PM2.5-like daily series with noise."""
+    t = np.arange(days)
+    base = rng.uniform(10, 40)
+    seasonal = base * 0.6 * np.cos(2 * np.pi * (t % 365) / 365)
+    noise = rng.gamma(2.0, base / 8, size=days)
+    return np.round(np.clip(base + seasonal + noise, 0.5, None), 2)
+
+
+def hourly_index(days, end="2025-11-16 23:00"):
+    """Returns the hours of ``days`` consecutive days ending at ``end``."""
+    return pd.date_range(end=end, periods=days * 24, freq="h", tz=TIMEZONE)
+
+
+def write_sensor_files(folder, n_sensors, days, missing_ratio=0.1, seed=0, other_parameters=0.05, hourly=False):
+    """Writes synthetic ``sensor_*.csv`` files in the OpenAQ download layout.
+
+    ``missing_ratio`` of the rows are dropped at random from each sensor and a
+    fraction ``other_parameters`` of the files holds a non-PM2.5 parameter, like
+    the real downloads. With ``hourly`` every day has 24 rows, as downloaded by
+    ``data_handling.py --hourly``. Returns the list of sensor IDs written.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    index = hourly_index(days) if hourly else daily_index(days)
+    step = pd.Timedelta(hours=1) if hourly else pd.Timedelta(days=1)
+    starts = index.strftime("%Y-%m-%dT%H:%M:%S") + TIMEZONE
+    ends = (index + step).strftime("%Y-%m-%dT%H:%M:%S") + TIMEZONE
+
+    sensor_ids = []
+    for i in range(n_sensors):
+        sensor_id = 20000000 + i
+        keep = rng.random(len(index)) >= missing_ratio
+        parameter = "pm25" if rng.random() >= other_parameters else "um003"
+        df = pd.DataFrame({
+            "datetime_from_local": starts[keep],
+            "datetime_to_local": ends[keep],
+            "value": sensor_values(len(index), rng)[keep],
+            "parameter": parameter,
+        })
+        df.to_csv(os.path.join(folder, f"sensor_{sensor_id}.csv"), index=False)
+        sensor_ids.append(sensor_id)
+    return sensor_ids
+
+
+def aligned_frame(n_sensors, days, missing_ratio=0.3, seed=0, regional_weight=0.7):
+    """Returns a days x sensors frame in the aligned_raw layout, with correlated sensors.
+
+    Every sensor mixes a shared regional series with its own one, so nearby
+    sensors correlate like the real network. Sensors start reporting at random
+    days and ``missing_ratio`` of the remaining cells are missing.
+    """
+    rng = np.random.default_rng(seed)
+    regional = sensor_values(days, rng)
+    columns = {}
+    for i in range(n_sensors):
+        own = sensor_values(days, rng)
+        values = rng.uniform(0.7, 1.3) * (regional_weight * regional + (1 - regional_weight) * own)
+        values[:rng.integers(0, max(days // 5, 1))] = np.nan
+        values[rng.random(days) < missing_ratio] = np.nan
+        columns[f"sensor_{20000000 + i}"] = np.round(values, 2)
+    index = daily_index(days)
+    return pd.DataFrame(columns, index=index.rename("datetime_from_local"))
+
+
+def write_data_dir(data_dir, n_sensors, days, missing_ratio=0.1, seed=0, forecast_days=7, fmt="csv"):
+    """Writes a complete synthetic ``data`` folder, laid out like ../data.
+
+    It holds the sensor metadata, one ``daily_data/sensor_*.csv`` per sensor,
+    the aligned raw and imputed matrices and a forecast. Scripts run from a
+    sibling folder of ``data_dir`` then work on it through their default
+    relative paths. Returns the aligned raw frame.
+    """
+    import storage
+
+    rng = np.random.default_rng(seed)
+    raw = aligned_frame(n_sensors, days, missing_ratio=missing_ratio, seed=seed)
+    raw = raw[raw.notna().any(axis=1)]  # like data_combining, keep only days with readings
+    filled = raw.interpolate(limit_direction="both").round(1)
+    filled.index.name = None
+
+    folder = os.path.join(data_dir, "daily_data")
+    os.makedirs(folder, exist_ok=True)
+    starts = raw.index.strftime("%Y-%m-%dT%H:%M:%S") + TIMEZONE
+    ends = (raw.index + pd.Timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S") + TIMEZONE
+    for col in raw.columns:
+        keep = raw[col].notna().to_numpy()
+        pd.DataFrame({
+            "datetime_from_local": starts[keep],
+            "datetime_to_local": ends[keep],
+            "value": raw[col].to_numpy()[keep],
+            "parameter": "pm25",
+        }).to_csv(os.path.join(folder, f"{col}.csv"), index=False)
+
+    sensor_ids = [int(col.replace("sensor_", "")) for col in raw.columns]
+    pd.DataFrame({
+        "location_id": [3000000 + i for i in range(n_sensors)],
+        "location_name": [f"Synthetic location {i}" for i in range(n_sensors)],
+        "sensor_id": sensor_ids,
+        "parameter": "pm25",
+        "latitude": np.round(rng.uniform(40.10, 40.32, n_sensors), 5),
+        "longitude": np.round(rng.uniform(44.40, 44.65, n_sensors), 5),
+        "datetime_first": raw.index[0].tz_convert("UTC").strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "datetime_last": raw.index[-1].tz_convert("UTC").strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }).to_csv(os.path.join(data_dir, "my_sensors_with_dates.csv"), index=False)
+
+    future = pd.date_range(start=raw.index[-1] + pd.Timedelta(days=1), periods=forecast_days, freq="D")
+    forecast = pd.DataFrame(filled.iloc[-1].to_numpy() * rng.uniform(0.8, 1.2, (forecast_days, n_sensors)),
+                            index=future, columns=raw.columns).round(1)
+
+    storage.write_frame(raw, storage.dataset_path("aligned_raw", fmt, data_dir))
+    storage.write_frame(filled, storage.dataset_path("aligned_filled", fmt, data_dir))
+    storage.write_frame(forecast, storage.dataset_path("forecast", fmt, data_dir))
+    return raw
@@ -0,0 +1,306 @@
+import argparse
+import copy
+import hashlib
+import json
+import os
+import pandas as pd
+import storage
+from data_combining import DateCache, sensor_files
+from data_handling import HOURLY_OUTPUT_FOLDER
+from regions import DATA_DIR
+
+HOURLY_FOLDER = HOURLY_OUTPUT_FOLDER
+TIERS_DIR = os.path.join(DATA_DIR, "tiers")
+MANIFEST_NAME = "manifest.json"
+FINGERPRINT_BYTES = 256
+
+# Finest first: tier name -> (bucket length, label format)
+TIERS = {
+    "hourly": (pd.Timedelta(hours=1), "%Y-%m-%d %H:%M"),
+    "daily": (pd.Timedelta(days=1), "%Y-%m-%d"),
+    "weekly": (pd.Timedelta(weeks=1), "%Y-%m-%d"),
+}
+STATS = ("min", "mean", "max")
+# Tier files are split by period of their bucket start, so an update rewrites only the recent ones
+SEGMENTS = {"hourly": "%Y-%m", "daily": "%Y", "weekly": "%Y"}
+LAYOUT = 2
+
+
+def bucket_starts(index, tier):
+    """Returns the start of the tier bucket of every timestamp; weeks start on Monday."""
+    if tier == "hourly":
+        return index.floor("h")
+    days = index.floor("D")
+    if tier == "daily":
+        return days
+    return days - pd.to_timedelta(days.dayofweek, unit="D")
+
+
+def segment_keys(index, tier):
+    """Returns the segment of every bucket start, e.g. "2025-03" for an hour in March 2025."""
+    return pd.DatetimeIndex(index).strftime(SEGMENTS[tier])
+
+
+def read_appended(file_path, offset):
+    """Returns the (datetime_from_local, value) rows written after byte ``offset`` and the file size."""
+    with open(file_path, "rb") as f:
+        header_line = f.readline()
+        header = header_line.decode("utf-8").strip().split(",")
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(offset, len(header_line)))
+        if f.tell() >= size:
+            return pd.DataFrame(columns=["datetime_from_local", "value"]), size
+        df = pd.read_csv(f, header=None, names=header, usecols=["datetime_from_local", "value"])
+    return df, size
+
+
+def fingerprint(file_path, offset):
+    """Returns a hash of the bytes right before ``offset``, to tell an appended file from a rewritten one."""
+    with open(file_path, "rb") as f:
+        f.seek(max(0, offset - FINGERPRINT_BYTES))
+        return hashlib.sha1(f.read(min(offset, FINGERPRINT_BYTES))).hexdigest()
+
+
+class AggregatePyramid:
+    """Hourly PM2.5 matrix with precomputed daily and weekly min/mean/max tiers.
+
+    Every tier is a wide time x sensors frame stored through ``storage``, split
+    into segments (hourly by month, daily and weekly by year) under
+    ``<tier>/<segment>``. The manifest records how many bytes of each hourly
+    sensor file were ingested (and a fingerprint of them), so ``update`` only
+    parses appended lines, rewrites only the hourly segments they fall into and
+    re-aggregates only the daily and weekly buckets that received them. Readers
+    load only the segments of the requested range and pick the coarsest detail
+    that still fits the number of points they display, see ``choose_tier``.
+    """
+
+    def __init__(self, root=TIERS_DIR, fmt=None, read_func=storage.read_frame):
+        self.root = root
+        self.fmt = fmt
+        self.read_func = read_func
+        self.start = None
+        self.end = None
+        self._manifest = (None, None)
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def available(self):
+        return os.path.exists(self.manifest_path)
+
+    def manifest(self):
+        """Returns the manifest, re-reading it only when the file changed."""
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if self._manifest[0] != signature:
+            with open(self.manifest_path) as f:
+                self._manifest = (signature, json.load(f))
+        return self._manifest[1]
+
+    def has_sensor(self, col):
+        manifest = self.manifest()
+        return manifest is not None and col in manifest["columns"]
+
+    def path(self, tier, segment, stat="mean", fmt=None):
+        fmt = fmt or (self.manifest() or {}).get("format") or self.fmt or storage.DEFAULT_FORMAT
+        name = "hourly" if tier == "hourly" else f"{tier}_{stat}"
+        return os.path.join(self.root, name, segment + storage.BACKENDS[fmt].extension)
+
+    def bounded(self, start=None, end=None):
+        """Returns a view of the pyramid limited to [start, end] (dates or timestamps)."""
+        view = copy.copy(self)
+        view.start, view.end = start, end
+        return view
+
+    def last_timestamp(self):
+        """Returns the last hour in the pyramid, within the view's end if set."""
+        last = pd.Timestamp(self.manifest()["end"])
+        if self.end is None:
+            return last
+        end = pd.Timestamp(self.end)
+        if end.tzinfo is None:
+            end = end.tz_localize(last.tzinfo)
+        if end == end.normalize():
+            # A date as the end includes that whole day
+            end += pd.Timedelta(days=1) - TIERS["hourly"][0]
+        return min(last, end)
+
+    @staticmethod
+    def choose_tier(start, end, max_points):
+        """Returns the finest tier with at most ``max_points`` buckets between start and end."""
+        for tier, (span, _) in TIERS.items():
+            if (end - start) / span + 1 <= max_points:
+                return tier
+        return tier
+
+    def read(self, tier, stat="mean", columns=None, start=None, end=None):
+        """Returns a tier frame within the view's bounds and the given start/end, reading only their segments."""
+        manifest = self.manifest()
+        segments = manifest["segments"][tier]
+        for lower in (self.start, start):
+            if lower is not None:
+                first = segment_keys(bucket_starts(pd.DatetimeIndex([pd.Timestamp(lower)]), tier), tier)[0]
+                segments = [segment for segment in segments if segment >= first]
+        for upper in (self.end, end):
+            if upper is not None:
+                last = segment_keys(pd.DatetimeIndex([pd.Timestamp(upper)]), tier)[0]
+                segments = [segment for segment in segments if segment <= last]
+
+        frames = [self.read_func(self.path(tier, segment, stat)) for segment in segments]
+        if frames:
+            df = pd.concat(frames) if len(frames) > 1 else frames[0]
+        else:
+            tz = pd.Timestamp(manifest["end"]).tzinfo
+            df = pd.DataFrame(index=pd.DatetimeIndex([], tz=tz, name="datetime_from_local"))
+        df = df.loc[self.start:self.end]
+        df = df.loc[start:end]
+        return df.reindex(columns=manifest["columns"] if columns is None else columns)
+
+    def window(self, days, max_points, stat="mean", columns=None, tier=None):
+        """Returns (frame, tier) for the last ``days`` days, from the tier that fits ``max_points``."""
+        end = self.last_timestamp()
+        start = end - pd.Timedelta(days=days)
+        tier = tier or self.choose_tier(start, end, max_points)
+        return self.read(tier, stat, columns, start=bucket_starts(pd.DatetimeIndex([start]), tier)[0], end=end), tier
+
+    def update(self, folder=HOURLY_FOLDER, rebuild=False):
+        """Ingests lines appended to the hourly sensor files; returns the number of new readings.
+
+        The cost follows the new lines and the segments they touch, not the
+        hours already stored.
+        """
+        manifest = None if rebuild else self.manifest()
+        if manifest is not None and (manifest.get("layout") != LAYOUT
+                                     or (self.fmt is not None and manifest["format"] != self.fmt)):
+            manifest = None  # tiers of an older layout or another format, write everything again
+        ingested = dict(manifest["files"]) if manifest else {}
+        fmt = manifest["format"] if manifest else (self.fmt or storage.DEFAULT_FORMAT)
+
+        files = list(sensor_files(folder))
+        if set(ingested) - {os.path.basename(file_path) for _, file_path in files}:
+            print("Sensor files were removed, rebuilding all tiers.")
+            return self.update(folder, rebuild=True)
+
+        dates = DateCache()
+        new_columns = {}
+        for sensor_id, file_path in files:
+            name = os.path.basename(file_path)
+            size = os.path.getsize(file_path)
+            offset = ingested[name]["offset"] if name in ingested else 0
+            if size < offset or (offset and fingerprint(file_path, offset) != ingested[name]["fingerprint"]):
+                print(f"{name} was rewritten, rebuilding all tiers.")
+                return self.update(folder, rebuild=True)
+            if size == offset:
+                continue
+            df, size = read_appended(file_path, offset)
+            ingested[name] = {"offset": size, "fingerprint": fingerprint(file_path, size)}
+            positions = dates.positions(df["datetime_from_local"])
+            valid = positions >= 0
+            series = pd.Series(df["value"].to_numpy(dtype=float)[valid], index=dates.parsed[positions[valid]])
+            # Keep the latest reading of a repeated hour
+            new_columns[f"sensor_{sensor_id}"] = series[~series.index.duplicated(keep="last")]
+
+        if not new_columns:
+            return 0
+        new = pd.concat(new_columns, axis=1)
+        new.index = bucket_starts(pd.DatetimeIndex(new.index), "hourly")
+        new = new.groupby(level=0).last()
+
+        segments = {tier: set(manifest["segments"][tier]) if manifest else set() for tier in TIERS}
+        columns = sorted(set(manifest["columns"] if manifest else []) | set(new.columns))
+
+        # Hourly segments that received readings: merged with what they held, new values winning
+        hourly = {}
+        for segment, part in new.groupby(segment_keys(new.index, "hourly")):
+            if segment in segments["hourly"]:
+                part = part.combine_first(self.read_func(self.path("hourly", segment, fmt=fmt)))
+            hourly[segment] = self._write(part, columns, self.path("hourly", segment, fmt=fmt))
+            segments["hourly"].add(segment)
+
+        for tier in list(TIERS)[1:]:
+            # Only buckets that received new readings are aggregated again, from the hourly segments they span
+            buckets = bucket_starts(new.index, tier).unique()
+            span = TIERS[tier][0] - TIERS["hourly"][0]
+            needed = sorted(set(segment_keys(buckets, "hourly")) | set(segment_keys(buckets + span, "hourly")))
+            for segment in needed:
+                if segment not in hourly and segment in segments["hourly"]:
+                    hourly[segment] = self.read_func(self.path("hourly", segment, fmt=fmt))
+            source = pd.concat([hourly[segment] for segment in needed if segment in hourly])
+            source = source[bucket_starts(source.index, tier).isin(buckets)]
+            groups = source.groupby(bucket_starts(source.index, tier))
+            for stat in STATS:
+                aggregated = getattr(groups, stat)()
+                for segment, part in aggregated.groupby(segment_keys(aggregated.index, tier)):
+                    path = self.path(tier, segment, stat, fmt=fmt)
+                    if segment in segments[tier]:
+                        previous = self.read_func(path)
+                        part = pd.concat([previous[~previous.index.isin(part.index)], part]).sort_index()
+                    self._write(part, columns, path)
+            segments[tier].update(segment_keys(buckets, tier))
+
+        start, end = new.index.min(), new.index.max()
+        if manifest:
+            start, end = min(start, pd.Timestamp(manifest["start"])), max(end, pd.Timestamp(manifest["end"]))
+        self._write_manifest({
+            "layout": LAYOUT,
+            "format": fmt,
+            "columns": columns,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "segments": {tier: sorted(keys) for tier, keys in segments.items()},
+            "files": ingested,
+        })
+        if not manifest:
+            self._remove_stale(segments, fmt)
+        return int(new.notna().to_numpy().sum())
+
+    @staticmethod
+    def _write(df, columns, path):
+        df = df.reindex(columns=columns)
+        df.index.name = "datetime_from_local"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        storage.write_frame(df, path)
+        return df
+
+    def _remove_stale(self, segments, fmt):
+        """Deletes tier files a rebuild did not write, e.g. of an older layout or format."""
+        keep = {self.path(tier, segment, stat, fmt=fmt) for tier, keys in segments.items()
+                for segment in keys for stat in (STATS if tier != "hourly" else ("mean",))}
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                if name != MANIFEST_NAME and path not in keep:
+                    os.remove(path)
+
+    def _write_manifest(self, manifest):
+        # Written last: readers see the new tiers together with the new version
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the hourly/daily/weekly PM2.5 tiers from hourly sensor files.")
+    parser.add_argument("--folder", default=HOURLY_FOLDER, help="hourly sensor files from data_handling.py --hourly")
+    parser.add_argument("--output", default=TIERS_DIR)
+    parser.add_argument("--format", choices=sorted(storage.BACKENDS), help="storage format of new tiers")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all tiers from scratch")
+    args = parser.parse_args()
+
+    pyramid = AggregatePyramid(args.output, fmt=args.format)
+    added = pyramid.update(args.folder, rebuild=args.rebuild)
+    manifest = pyramid.manifest()
+    if manifest is None:
+        print(f"No hourly sensor files in {args.folder}.")
+        return
+    print(f"Ingested {added} new hourly readings; tiers cover {manifest['start']} to {manifest['end']} "
+          f"for {len(manifest['columns'])} sensors.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""WSGI entry point, e.g. ``gunicorn --workers 4 --threads 4 wsgi:app`` from my_scripts/."""
+from home import create_app
+
+app = create_app()
@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+
+from analytics import AnalyticsStore, SensorAnalytics
+from synthetic_data import write_sensor_files
+
+RANGES = [(None, None), ("2025-03-01", "2025-08-31"), ("2025-10-20", None)]
+
+
+def append_rows(folder, sensor_id, rows):
+    with open(os.path.join(folder, f"sensor_{sensor_id}.csv"), "a") as f:
+        for day, value in rows:
+            f.write(f"{day}T00:00:00+04:00,{day}T23:59:59+04:00,{value},pm25\n")
+
+
+def assert_same(store, rebuilt, sensor_ids):
+    for sensor_id in sensor_ids:
+        incremental, expected = store.load(sensor_id), rebuilt.load(sensor_id)
+        assert np.array_equal(incremental.days, expected.days)
+        assert np.array_equal(incremental.values, expected.values)
+        for start, end in RANGES:
+            assert incremental.summary(start, end) == expected.summary(start, end)
+        assert incremental.current_streak() == expected.current_streak()
+
+
+def test_appended_and_revised_days_match_a_rebuild(tmp_path):
+    folder = str(tmp_path / "sensors")
+    sensor_ids = write_sensor_files(folder, 3, 330, other_parameters=0, seed=5)  # to 2025-11-16
+    store = AnalyticsStore(str(tmp_path / "analytics"))
+    store.update(folder)
+
+    append_rows(folder, sensor_ids[0], [("2025-11-17", 21.5), ("2025-11-18", 40.2)])
+    assert store.update(folder) == 2
+    # OpenAQ revises the running mean of the last day; an earlier day can be revised too
+    append_rows(folder, sensor_ids[0], [("2025-11-18", 12.0)])
+    append_rows(folder, sensor_ids[1], [("2025-11-10", 80.0), ("2025-11-17", 16.0)])
+    assert store.update(folder) == 1
+
+    rebuilt = AnalyticsStore(str(tmp_path / "rebuilt"))
+    rebuilt.update(folder)
+    assert_same(store, rebuilt, [str(sensor_id) for sensor_id in sensor_ids])
+    assert store.load(sensor_ids[0]).values[-1] == 12.0
+
+
+def test_truncate_and_append_again_restore_the_statistics():
+    days = np.arange(19000, 19400)
+    values = np.random.default_rng(1).gamma(2.0, 10.0, len(days)).round(1)
+    analytics = SensorAnalytics()
+    analytics.append(days, values)
+    expected = analytics.summary()
+
+    dropped_days, dropped_values = analytics.truncate(250)
+    assert len(analytics) == 250 and analytics.summary()["last_day"] == str(np.datetime64(int(days[249]), "D"))
+    analytics.append(dropped_days, dropped_values)
+    assert analytics.summary() == expected
+
+
+def test_saved_columns_follow_truncation_and_appends(tmp_path):
+    path = str(tmp_path / "sensor_1" / "meta.json")
+    analytics = SensorAnalytics()
+    analytics.append(np.arange(19000, 19100), np.full(100, 20.0))
+    analytics.save(path)
+
+    with open(path) as f:
+        first_meta = f.read()
+
+    loaded = SensorAnalytics.load(path, spare=2)
+    loaded.truncate(99)
+    loaded.append([19099, 19100], [25.0, 30.0])
+    loaded.save(path)
+
+    reloaded = SensorAnalytics.load(path, spare=1)
+    assert reloaded.values[-3:].tolist() == [20.0, 25.0, 30.0]
+    assert reloaded.summary()["max"] == 30.0
+    # The revised day moved the column to a new file; a reader of the old metadata sees the old rows
+    assert os.path.getsize(tmp_path / "sensor_1" / "values.2.bin") == 101 * 8
+    old_path = str(tmp_path / "sensor_1" / "old_meta.json")
+    with open(old_path, "w") as f:
+        f.write(first_meta)
+    old = SensorAnalytics.load(old_path)
+    assert len(old) == 100 and (old.values == 20.0).all()
+
+    # A plain append stays in the file, and the generation before the previous one is removed
+    reloaded.append([19101], [35.0])
+    reloaded.save(path)
+    assert os.path.getsize(tmp_path / "sensor_1" / "values.2.bin") == 102 * 8
+    assert not os.path.exists(tmp_path / "sensor_1" / "values.1.bin")
+    assert SensorAnalytics.load(path).values[-1] == 35.0
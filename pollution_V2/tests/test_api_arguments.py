@@ -0,0 +1,46 @@
+import pytest
+
+import regions
+from analytics import AnalyticsStore
+from home import AirQualityApp
+from synthetic_data import write_data_dir
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory, request):
+    data_dir = tmp_path_factory.mktemp("data")
+    raw = write_data_dir(str(data_dir), 3, 60, seed=7)
+    AnalyticsStore(str(data_dir / "analytics")).update(str(data_dir / "daily_data"))
+    patch = pytest.MonkeyPatch()
+    request.addfinalizer(patch.undo)
+    patch.setattr(regions, "BASE_DIR", str(data_dir))  # the default region now reads the synthetic data
+    client = AirQualityApp().app.test_client()
+    client.sensor_id = raw.columns[0].replace("sensor_", "")
+    return client
+
+
+@pytest.mark.parametrize("route", ["trend", "heatmap", "records", "history"])
+@pytest.mark.parametrize("query", ["start=garbage", "start=2025-13-01", "end=2025-02-30", "max_points=abc",
+                                   "max_points=0"])
+def test_malformed_ranges_are_rejected(client, route, query):
+    response = client.get(f"/api/sensors/{client.sensor_id}/{route}?{query}")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+@pytest.mark.parametrize("route", ["trend", "heatmap", "analytics", "forecast"])
+@pytest.mark.parametrize("days", ["-5", "0", "abc", "1.5"])
+def test_days_must_be_positive(client, route, days):
+    assert client.get(f"/api/sensors/{client.sensor_id}/{route}?days={days}").status_code == 400
+
+
+def test_valid_arguments_are_served(client):
+    sensor_id = client.sensor_id
+    trend = client.get(f"/api/sensors/{sensor_id}/trend?days=5")
+    assert trend.status_code == 200 and trend.get_json()["values"]
+    assert client.get(f"/api/sensors/{sensor_id}/heatmap?start=2025-10-01&end=2025-11-16").status_code == 200
+    history = client.get(f"/api/sensors/{sensor_id}/history?start=2025-11-01&max_points=10")
+    assert history.status_code == 200
+    assert len(history.get_json()["dates"]) <= 10 and history.get_json()["dates"][0] >= "2025-11-01"
+    analytics = client.get(f"/api/sensors/{sensor_id}/analytics?start=2025-10-01&end=2025-11-16&rolling=7")
+    assert analytics.status_code == 200 and analytics.get_json()["summary"]["first_day"] >= "2025-10-01"
@@ -0,0 +1,27 @@
+import numpy as np
+
+from backtest import backtest, make_configs, origins, training_sets
+from imputation import make_imputer
+from synthetic_data import aligned_frame
+
+
+def test_training_rows_are_imputed_without_later_days():
+    raw = aligned_frame(12, 200, seed=4)
+    cutoffs = origins(len(raw), 7, 3, 7)
+    training = training_sets(raw, cutoffs, make_imputer("knn"))
+    assert [len(rows) for rows in training] == cutoffs
+    assert not any(np.isnan(rows).any() for rows in training)
+
+    # Changing the days after the first cut-off does not change what is trained on before it
+    changed = raw.copy()
+    changed.iloc[cutoffs[0]:] *= 5
+    assert np.array_equal(training_sets(changed, cutoffs[:1], make_imputer("knn"))[0], training[0])
+
+
+def test_backtest_scores_only_actual_readings():
+    raw = aligned_frame(12, 200, seed=4)
+    report = backtest(raw, make_configs(["snaive", "ses"], ["global"]), n_origins=3, workers=1,
+                      imputer=make_imputer("knn"))
+    targets = raw.to_numpy()[len(raw) - 3 * 7:]
+    assert report["evaluated_cells"] == np.count_nonzero(~np.isnan(targets))
+    assert [result["name"] for result in report["results"]] == ["ses", "snaive"]
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from home import DashboardDataProcessor
+from sensor_store import SensorStore
+
+
+def baseline_heatmap(df_pm25, sensor_columns, days=30):
+    """The per-cell loop the vectorized version replaced."""
+    df_heatmap_data = df_pm25.loc[df_pm25.index.max() - pd.Timedelta(f'{days}D'):].copy()
+
+    time_diff = df_heatmap_data.index.date - df_heatmap_data.index.date.min()
+    df_heatmap_data['day_index'] = (time_diff.astype('timedelta64[D]')).astype(int)
+    df_heatmap_data['day_of_week'] = df_heatmap_data.index.dayofweek
+
+    heatmap_matrix_data = {}
+    for col in sensor_columns:
+        sensor_id = col.replace('sensor_', '')
+        sensor_data = []
+        for index, row in df_heatmap_data.iterrows():
+            pm25_value = row[col]
+            pm25_value = round(pm25_value, 1) if pd.notna(pm25_value) else None
+            sensor_data.append({
+                'x': int(row['day_index']),
+                'y': int(row['day_of_week']),
+                'v': pm25_value,
+                'd': index.strftime('%Y-%m-%d')
+            })
+        heatmap_matrix_data[sensor_id] = sensor_data
+    return heatmap_matrix_data
+
+
+def baseline_records(df_pm25, sensor_columns):
+    """The per-column idxmin/idxmax loop the vectorized version replaced."""
+    historical_records = {}
+    df_daily_avg = df_pm25.resample('D').mean()
+    for col in sensor_columns:
+        sensor_id = col.replace('sensor_', '')
+        valid_data = df_daily_avg[col].dropna()
+        if not valid_data.empty:
+            historical_records[sensor_id] = {
+                'best_v': round(valid_data.min(), 1),
+                'best_d': valid_data.idxmin().strftime('%Y-%m-%d'),
+                'worst_v': round(valid_data.max(), 1),
+                'worst_d': valid_data.idxmax().strftime('%Y-%m-%d')
+            }
+        else:
+            historical_records[sensor_id] = {'best_v': None, 'best_d': None, 'worst_v': None, 'worst_d': None}
+    return historical_records
+
+
+@pytest.fixture(params=[None, 'Asia/Yerevan'], ids=['naive', 'tz-aware'])
+def df_pm25(request):
+    rng = np.random.default_rng(3)
+    index = pd.date_range('2025-01-01', periods=90, freq='D', tz=request.param, name='datetime')
+    index = index.delete([20, 21, 75])  # days without any row
+    values = rng.gamma(2.0, 12.0, size=(len(index), 5)).round(2)
+    values[rng.random(values.shape) < 0.2] = np.nan  # scattered gaps
+    values[-10:, 1] = np.nan  # a sensor that stopped reporting
+    values[:, 3] = np.nan  # a sensor without any reading
+    df = pd.DataFrame(values, index=index, columns=[f'sensor_{i}' for i in (11, 22, 33, 44, 55)])
+    # The store holds float32, so compare against the values it actually serves
+    return df.astype(np.float32).astype(np.float64)
+
+
+def test_heatmap_matches_loop(df_pm25):
+    processor = DashboardDataProcessor(SensorStore.from_frame(df_pm25))
+    assert processor.get_heatmap_data() == baseline_heatmap(df_pm25, list(df_pm25.columns))
+
+
+def test_historical_records_match_loop(df_pm25):
+    processor = DashboardDataProcessor(SensorStore.from_frame(df_pm25))
+    records = processor.get_historical_records()
+    assert records == baseline_records(df_pm25, list(df_pm25.columns))
+    assert records['44'] == {'best_v': None, 'best_d': None, 'worst_v': None, 'worst_d': None}
@@ -0,0 +1,184 @@
+import datetime
+import os
+
+import pandas as pd
+import pytest
+
+from data_handling import Downloader
+
+DATE_FROM = datetime.datetime(2025, 1, 1)
+DATE_TO = datetime.datetime(2025, 3, 1)
+
+
+class RateLimitError(Exception):
+    """Named like the OpenAQ client's exception, which is how the downloader recognizes it."""
+
+
+class FakeSource:
+    """Stands in for the OpenAQ measurements API: a fixed number of daily rows per sensor, served in pages."""
+
+    def __init__(self, days, start="2025-01-01T00:00:00+04:00"):
+        self.days = days  # {sensor_id: number of days}
+        self.start = pd.Timestamp(start)
+        self.calls = []
+        self.failures = {}  # (sensor_id, page) -> exceptions to raise before answering
+        self.revisions = {}  # (sensor_id, day index) -> value served instead
+
+    def rows(self, sensor_id):
+        start = self.start
+        return [{"datetime_from_local": (start + pd.Timedelta(days=i)).isoformat(),
+                 "datetime_to_local": (start + pd.Timedelta(days=i + 1)).isoformat(),
+                 "value": self.revisions.get((sensor_id, i), float(i % 17) + 0.5),
+                 "parameter": "pm25"} for i in range(self.days.get(sensor_id, 0))]
+
+    def fetch_page(self, sensor_id, datetime_from, datetime_to, page, limit):
+        self.calls.append((sensor_id, page))
+        failures = self.failures.get((sensor_id, page))
+        if failures:
+            raise failures.pop(0)
+        return self.rows(sensor_id)[(page - 1) * limit:page * limit]
+
+
+def make_downloader(source, folder, **kwargs):
+    kwargs = {"max_workers": 2, "page_limit": 10, "requests_per_second": 0, "backoff": 0.0, **kwargs}
+    return Downloader(source, output_folder=str(folder), **kwargs)
+
+
+def read_sensor(folder, sensor_id):
+    return pd.read_csv(os.path.join(folder, f"sensor_{sensor_id}.csv"))
+
+
+def test_pages_are_streamed_into_one_file(tmp_path):
+    source = FakeSource({1: 25, 2: 10, 3: 3})
+    counts = make_downloader(source, tmp_path).run([1, 2, 3], DATE_FROM, DATE_TO)
+
+    assert counts == {1: 25, 2: 10, 3: 3}
+    assert sorted(page for sensor_id, page in source.calls if sensor_id == 1) == [1, 2, 3]
+    # A full last page needs one more, empty, page to know it was the last
+    assert sorted(page for sensor_id, page in source.calls if sensor_id == 2) == [1, 2]
+    assert read_sensor(tmp_path, 1).to_dict("records") == source.rows(1)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+    assert not os.path.exists(tmp_path / ".download_checkpoint.json")
+
+
+def test_sensor_without_measurements_gets_no_file(tmp_path):
+    counts = make_downloader(FakeSource({1: 5}), tmp_path).run([1, 2], DATE_FROM, DATE_TO)
+
+    assert counts == {1: 5, 2: 0}
+    assert os.path.exists(tmp_path / "sensor_1.csv")
+    assert not os.path.exists(tmp_path / "sensor_2.csv")
+    assert not os.path.exists(tmp_path / "sensor_2.csv.part")
+
+
+def test_failed_requests_are_retried_with_backoff(tmp_path, monkeypatch):
+    clock, sleeps = [0.0], []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr("data_handling.time.monotonic", lambda: clock[0])
+    monkeypatch.setattr("data_handling.time.sleep", sleep)
+    source = FakeSource({1: 15})
+    source.failures[(1, 2)] = [RateLimitError("429"), ConnectionError("reset")]
+    downloader = make_downloader(source, tmp_path, backoff=1.0, max_retries=3)
+
+    assert downloader.run([1], DATE_FROM, DATE_TO) == {1: 15}
+    assert source.calls == [(1, 1), (1, 2), (1, 2), (1, 2)]
+    # Exponential backoff with jitter: the n-th retry waits between 2**n and 2 * 2**n seconds
+    assert len(sleeps) == 2 and 1.0 <= sleeps[0] <= 2.0 and 2.0 <= sleeps[1] <= 4.0
+    # The rate limit also pushed back the shared schedule of every worker
+    assert downloader.rate_limiter._next_time >= sleeps[0]
+
+
+def test_sensor_fails_after_max_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr("data_handling.time.sleep", lambda seconds: None)
+    source = FakeSource({1: 5, 2: 5})
+    source.failures[(2, 1)] = [ConnectionError("down")] * 3
+    counts = make_downloader(source, tmp_path, max_retries=2).run([1, 2], DATE_FROM, DATE_TO)
+
+    assert counts == {1: 5}
+    assert not os.path.exists(tmp_path / "sensor_2.csv")
+
+
+def test_interrupted_run_resumes_from_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr("data_handling.time.sleep", lambda seconds: None)
+    source = FakeSource({1: 35, 2: 12})
+    source.failures[(1, 3)] = [ConnectionError("interrupted")]
+    assert make_downloader(source, tmp_path, max_retries=0).run([1, 2], DATE_FROM, DATE_TO) == {2: 12}
+    assert os.path.exists(tmp_path / "sensor_1.csv.part")
+
+    source.calls.clear()
+    counts = make_downloader(source, tmp_path).run([1, 2], DATE_FROM, DATE_TO)
+
+    # Sensor 2 is done and pages 1-2 of sensor 1 are already on disk
+    assert counts == {1: 35}
+    assert source.calls == [(1, 3), (1, 4)]
+    assert read_sensor(tmp_path, 1).to_dict("records") == source.rows(1)
+    assert not os.path.exists(tmp_path / ".download_checkpoint.json")
+
+
+def test_checkpoint_of_another_window_starts_over(tmp_path, monkeypatch):
+    monkeypatch.setattr("data_handling.time.sleep", lambda seconds: None)
+    source = FakeSource({1: 25})
+    source.failures[(1, 2)] = [ConnectionError("interrupted")]
+    make_downloader(source, tmp_path, max_retries=0).run([1], DATE_FROM, DATE_TO)
+
+    source.calls.clear()
+    assert make_downloader(source, tmp_path).run([1], DATE_FROM, DATE_TO + pd.Timedelta(days=1)) == {1: 25}
+    assert source.calls == [(1, 1), (1, 2), (1, 3)]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_concurrency_does_not_change_the_files(tmp_path, workers):
+    source = FakeSource({sensor_id: 5 * sensor_id for sensor_id in range(1, 9)})
+    make_downloader(source, tmp_path, max_workers=workers).run(list(range(1, 9)), DATE_FROM, DATE_TO)
+
+    for sensor_id in range(1, 9):
+        assert read_sensor(tmp_path, sensor_id).to_dict("records") == source.rows(sensor_id)
+
+
+def test_sync_follows_a_full_download(tmp_path):
+    source = FakeSource({1: 20})
+    downloader = make_downloader(source, tmp_path)
+    downloader.run([1], DATE_FROM, DATE_TO)
+    source.days[1] = 30
+    assert downloader.sync({1: "2025-02-01"}, DATE_TO, DATE_FROM) == {1: 10}
+
+    # A full download of a shorter history replaces the file; the next sync fills the gap
+    source.days[1] = 15
+    make_downloader(source, tmp_path).run([1], DATE_FROM, DATE_TO)
+    source.days[1] = 40
+    assert make_downloader(source, tmp_path).sync({1: "2025-02-10"}, DATE_TO, DATE_FROM) == {1: 25}
+    assert read_sensor(tmp_path, 1).to_dict("records") == source.rows(1)
+
+    # And after a longer one, nothing already on disk is appended again
+    source.days[1] = 45
+    make_downloader(source, tmp_path).run([1], DATE_FROM, DATE_TO)
+    assert make_downloader(source, tmp_path).sync({1: "2025-02-15"}, DATE_TO, DATE_FROM) == {1: 0}
+    assert read_sensor(tmp_path, 1).to_dict("records") == source.rows(1)
+
+    # The stored days had all ended, so nothing newer on OpenAQ means no request
+    source.calls.clear()
+    assert make_downloader(source, tmp_path).sync({1: "2025-02-14"}, DATE_TO, DATE_FROM) == {}
+    assert source.calls == []
+
+
+def test_sync_appends_revisions_of_a_running_day(tmp_path):
+    today = pd.Timestamp.now(tz="UTC").tz_convert("+04:00").floor("D")
+    source = FakeSource({1: 5}, start=today - pd.Timedelta(days=4))
+    downloader = make_downloader(source, tmp_path)
+    downloader.run([1], DATE_FROM, DATE_TO)
+
+    # Today's mean was stored while it was running; OpenAQ revises it later the same day
+    source.revisions[(1, 4)] = 42.5
+    now = pd.Timestamp.now(tz="UTC")
+    assert downloader.sync({1: now}, DATE_TO, DATE_FROM) == {1: 1}
+    df = read_sensor(tmp_path, 1)
+    assert len(df) == 6
+    assert df.drop_duplicates("datetime_from_local", keep="last")["value"].tolist() == [
+        row["value"] for row in source.rows(1)]
+
+    # Asked again while unchanged, the day is not appended twice
+    assert make_downloader(source, tmp_path).sync({1: now}, DATE_TO, DATE_FROM) == {1: 0}
+    assert len(read_sensor(tmp_path, 1)) == 6
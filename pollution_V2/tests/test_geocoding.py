@@ -0,0 +1,107 @@
+import json
+import urllib.error
+
+import pandas as pd
+
+import geocoding
+from geocoding import GeocodeCache, StubGeocoder, resolve, sensor_coordinates, update_cache
+from home import DataLoader, DatasetCache
+
+NAMES = {
+    "22/1 Isakov street, Yerevan, Armenia": (40.1626, 44.4981),
+    "61 Davtashen 1-st street, Yerevan, Armenia": (40.2250, 44.4930),
+}
+
+
+class StubLocator:
+    """Answers OpenAQ location lookups from a fixed {location_id: (lat, lon)} mapping."""
+
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+        self.queries = []
+
+    def locate(self, location_id):
+        self.queries.append(location_id)
+        return self.known.get(location_id)
+
+
+class FailingGeocoder:
+    def geocode(self, query):
+        raise urllib.error.URLError("offline")
+
+
+def locations_frame():
+    """Two sensors at one address, one sensor at another, one the geocoder does not know and one with coordinates."""
+    return pd.DataFrame([
+        {"location_id": 1, "location_name": "22/1 Isakov street, Yerevan, Armenia", "sensor_id": 11},
+        {"location_id": 1, "location_name": "22/1 Isakov street, Yerevan, Armenia", "sensor_id": 12},
+        {"location_id": 2, "location_name": "61 Davtashen 1-st street, Yerevan, Armenia", "sensor_id": 21},
+        {"location_id": 3, "location_name": "Nowhere", "sensor_id": 31},
+        {"location_id": 4, "location_name": "Yerevan", "sensor_id": 41, "latitude": 40.18, "longitude": 44.51},
+    ], columns=geocoding.LOCATION_COLUMNS)
+
+
+def test_openaq_coordinates_win_without_lookups(tmp_path):
+    cache, geocoder = GeocodeCache(str(tmp_path / "cache.json")), StubGeocoder(NAMES)
+    resolve(locations_frame(), cache, geocoder)
+
+    assert "Yerevan" not in geocoder.queries
+    assert cache.get(4, "Yerevan") == {"lat": 40.18, "lon": 44.51, "source": "openaq"}
+    # A cached entry never overrides the metadata
+    entries = {geocoding.location_key(4, "Yerevan"): {"lat": 1.0, "lon": 2.0, "source": "nominatim"}}
+    assert sensor_coordinates(locations_frame(), entries)["41"]["lat"] == 40.18
+
+
+def test_each_address_is_geocoded_once(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache, geocoder = GeocodeCache(path), StubGeocoder(NAMES)
+    assert resolve(locations_frame(), cache, geocoder) == 4
+    assert sorted(geocoder.queries) == sorted(list(NAMES) + ["Nowhere"])
+    cache.save()
+
+    # Addresses already resolved, or already not found, are not looked up again
+    geocoder = StubGeocoder(NAMES)
+    assert resolve(locations_frame(), GeocodeCache(path), geocoder) == 0
+    assert geocoder.queries == []
+    assert resolve(locations_frame(), GeocodeCache(path), geocoder, retry_missing=True) == 1
+    assert geocoder.queries == ["Nowhere"]
+
+
+def test_coordinates_are_served_per_sensor(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "cache.json"))
+    resolve(locations_frame(), cache, StubGeocoder(NAMES))
+    coordinates = sensor_coordinates(locations_frame(), cache.entries)
+
+    assert sorted(coordinates) == ["11", "12", "21", "41"]  # "Nowhere" gets no marker
+    assert coordinates["12"] == {"lat": 40.1626, "lon": 44.4981, "source": "nominatim"}
+
+
+def test_openaq_location_lookup_comes_before_geocoding(tmp_path):
+    cache, geocoder = GeocodeCache(str(tmp_path / "cache.json")), StubGeocoder(NAMES)
+    locator = StubLocator({1: (40.16, 44.50)})
+    resolve(locations_frame(), cache, geocoder, locator=locator)
+
+    assert locator.queries == [1, 2, 3]
+    assert cache.get(1, "22/1 Isakov street, Yerevan, Armenia") == {"lat": 40.16, "lon": 44.50, "source": "openaq"}
+    assert "22/1 Isakov street, Yerevan, Armenia" not in geocoder.queries
+    assert cache.get(2, "61 Davtashen 1-st street, Yerevan, Armenia")["source"] == "nominatim"
+
+
+def test_geocoder_errors_are_skipped_and_retried_later(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "cache.json"))
+    assert resolve(locations_frame(), cache, FailingGeocoder()) == 1  # only the OpenAQ coordinates
+    assert cache.get(1, "22/1 Isakov street, Yerevan, Armenia") is None
+
+
+def test_update_cache_offline_and_data_loader(tmp_path):
+    locations_path, cache_path = str(tmp_path / "sensors.csv"), str(tmp_path / "cache.json")
+    locations_frame().to_csv(locations_path, index=False)
+    with open(cache_path, "w") as f:
+        json.dump({geocoding.location_key(2, "61 Davtashen 1-st street, Yerevan, Armenia"):
+                   {"lat": 40.225, "lon": 44.493, "source": "nominatim"}}, f)
+
+    assert update_cache(offline=True, locations_path=locations_path, cache_path=cache_path) == (1, 2, 5)
+
+    loader = DataLoader(locations_path=locations_path, geocode_path=cache_path, cache=DatasetCache())
+    assert sorted(loader.sensor_coordinates()) == ["21", "41"]
+    assert [sensor_id for sensor_id, _ in loader.spatial_index().nearest(40.18, 44.51, k=2)] == ["41", "21"]
@@ -0,0 +1,102 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from home import AirQualityApp, LiveFeed
+from ingestion import IngestionService, Journal, ReplaySource
+from sensor_store import SensorStore
+from synthetic_data import write_sensor_files
+
+
+def matrix(sensor_ids, first_day, last_day):
+    """An imputed matrix that holds 0 everywhere, so applied readings stand out."""
+    index = pd.date_range(first_day, last_day, freq='D', name='datetime')
+    return SensorStore.from_frame(pd.DataFrame(0.0, index=index, columns=[f'sensor_{i}' for i in sensor_ids]))
+
+
+def file_values(folder, sensor_id):
+    df = pd.read_csv(os.path.join(folder, f'sensor_{sensor_id}.csv'))
+    return dict(zip(df['datetime_from_local'].str[:10], df['value']))
+
+
+def test_replayed_readings_reach_the_store_and_compaction_drops_absorbed_days(tmp_path):
+    folder = str(tmp_path / 'sensors')
+    sensor_ids = write_sensor_files(folder, 3, 10, missing_ratio=0, other_parameters=0, seed=1)  # to 2025-11-16
+    journal = Journal(str(tmp_path / 'journal.jsonl'))
+
+    source = ReplaySource(folder, start='2025-11-13', days_per_batch=2)
+    assert source.days == ['2025-11-13', '2025-11-14', '2025-11-15', '2025-11-16']
+    assert IngestionService(source, journal, interval=0).run() == 2
+
+    base = [matrix(sensor_ids, '2025-11-08', '2025-11-12')]
+    feed = LiveFeed(lambda: base[0], journal.path, poll_interval=0)
+    assert feed.poll() == 12
+    frame = feed.store(base[0]).to_frame()
+    assert list(frame.index.strftime('%Y-%m-%d')[-4:]) == source.days
+    expected = file_values(folder, sensor_ids[0])
+    assert frame[f'sensor_{sensor_ids[0]}'].iloc[-1] == np.float32(expected['2025-11-16'])
+    assert feed.current_readings()[str(sensor_ids[1])]['timestamp'] == '2025-11-16 00:00'
+
+    # The pipeline absorbed two days into a new matrix and compacted the journal
+    base[0] = matrix(sensor_ids, '2025-11-08', '2025-11-14')
+    assert journal.compact('2025-11-15') == 6
+    assert {reading[1] for batch in journal.read()[0] for reading in batch['readings']} == {'2025-11-15', '2025-11-16'}
+    assert feed.poll() == 6
+    frame = feed.store(base[0]).to_frame()
+    assert (frame.loc['2025-11-13':'2025-11-14'] == 0).all().all()
+    assert (frame.loc['2025-11-15':] > 0).all().all()
+    assert feed.revision == journal.size()
+    assert journal.compact('2025-11-15') == 0
+
+
+def test_a_compacted_journal_is_applied_again_from_the_start(tmp_path):
+    folder = str(tmp_path / 'sensors')
+    sensor_ids = write_sensor_files(folder, 2, 6, missing_ratio=0, other_parameters=0, seed=2)
+    journal = Journal(str(tmp_path / 'journal.jsonl'))
+    IngestionService(ReplaySource(folder, start='2025-11-13'), journal, interval=0).run()
+
+    base = matrix(sensor_ids, '2025-11-10', '2025-11-16')
+    feed = LiveFeed(lambda: base, journal.path, poll_interval=0)
+    assert feed.poll() == 8
+    # Same matrix, but the journal file was replaced by a shorter one
+    assert journal.compact('2025-11-16') == 6
+    assert feed.poll() == 2
+    assert feed.poll() == 0
+
+
+def test_batches_appended_during_compaction_are_kept(tmp_path):
+    journal = Journal(str(tmp_path / 'journal.jsonl'))
+
+    def append():
+        for i in range(300):
+            journal.append([('1', '2025-11-01', 1.0)])  # absorbed, dropped by every compaction
+            journal.append([(str(i), '2025-11-20', float(i))])
+
+    writer = threading.Thread(target=append)
+    writer.start()
+    while writer.is_alive():
+        journal.compact('2025-11-15')
+    writer.join()
+    journal.compact('2025-11-15')
+
+    readings = [reading for batch in journal.read()[0] for reading in batch['readings']]
+    assert sorted(int(sensor_id) for sensor_id, _, _ in readings) == list(range(300))
+
+
+def test_streams_beyond_the_limit_are_refused():
+    client = AirQualityApp(live=True, max_streams=1).app.test_client()
+    first = client.get('/api/stream', buffered=False)
+    assert first.status_code == 200
+    assert next(first.response).startswith(b'retry: 5000')
+
+    refused = client.get('/api/stream', buffered=False)
+    assert refused.status_code == 503
+    assert refused.headers['Retry-After'] == '60'
+
+    # Closing a page frees its slot
+    first.close()
+    again = client.get('/api/stream', buffered=False)
+    assert again.status_code == 200
+    again.close()